@@ -0,0 +1,65 @@
+import argparse
+import random
+import time
+
+import scrap
+from config.utils import ACTION_CODES
+from benchmarks.parse_play_by_play import load_raw_plays
+
+# Micro-benchmark del clasificador de acciones de clean_play_by_plays
+#
+#   python -m benchmarks.classify_actions --games 400
+
+
+def legacy_classify(action):
+    # Camino antiguo: reordenar las claves y buscar subcadenas en cada jugada
+    for key in sorted(ACTION_CODES.keys(), key=len, reverse=True):
+        if key in action:
+            return ACTION_CODES[key]
+    return "UNKNOWN"
+
+
+def season_actions(games, seed=0):
+    raw = load_raw_plays()
+    actions = [play["action"] or "" for play in raw]
+    per_game = len(actions) / max(1, len({(p["local"], p["visitor"]) for p in raw}))
+    rng = random.Random(seed)
+    return [rng.choice(actions) for _ in range(int(per_game * games))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=400, help="partidos de la temporada simulada")
+    args = parser.parse_args()
+
+    actions = season_actions(args.games)
+    print(f"{len(actions):,} acciones ({len(set(actions)):,} distintas)")
+
+    start = time.perf_counter()
+    expected = [legacy_classify(a) for a in actions]
+    legacy = time.perf_counter() - start
+
+    scrap.classify_action.cache_clear()
+    start = time.perf_counter()
+    got = [scrap.classify_action(a) for a in actions]
+    compiled = time.perf_counter() - start
+    cache_info = scrap.classify_action.cache_info()
+
+    scrap.classify_action.cache_clear()
+    start = time.perf_counter()
+    for a in actions:
+        scrap.classify_action.__wrapped__(a)
+    no_memo = time.perf_counter() - start
+
+    print(f"antiguo:           {legacy * 1000:8.1f} ms  ({len(actions) / legacy:,.0f} acciones/s)")
+    print(f"regex sin memo:    {no_memo * 1000:8.1f} ms  ({len(actions) / no_memo:,.0f} acciones/s)")
+    print(f"regex + LRU:       {compiled * 1000:8.1f} ms  ({len(actions) / compiled:,.0f} acciones/s)  x{legacy / compiled:.1f}")
+    print(cache_info)
+
+    mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+    if mismatches:
+        print(f"⚠️ {mismatches} acciones clasificadas distinto")
+
+
+if __name__ == "__main__":
+    main()
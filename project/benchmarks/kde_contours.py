@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+from matplotlib.ticker import MaxNLocator
+
+import density
+import player_stats
+
+# Benchmark de los contornos KDE de cluster_and_plot_players_with_kde: gaussian_kde exacto
+# frente a binning + FFT, con la bolsa de jugadores creciendo hasta varios torneos
+#
+#   python -m benchmarks.kde_contours --players 250 1000 5000 20000 --grid-size 100
+
+PLAYERS_CSV = "files/players_total_box_score.csv"
+
+
+def season_embedding(players, seed=0):
+    # Jugadores sintéticos: puntos reales del embedding remuestreados con un poco de ruido
+    embedding = player_stats.fit_player_embedding(player_stats.load_player_table(PLAYERS_CSV), kde="binned")
+    df = embedding["players"]
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(df), size=players)
+    points = df[["pca1", "pca2"]].to_numpy()[rows] + rng.normal(scale=0.15, size=(players, 2))
+    return points, df["cluster"].to_numpy()[rows], embedding["n_clusters"]
+
+
+def contour_levels(f, levels=3):
+    # Los mismos niveles que elige contour(levels=3)
+    return MaxNLocator(levels + 1).tick_values(f.min(), f.max())
+
+
+def time_method(points, clusters, n_clusters, method, grid_size):
+    start = time.perf_counter()
+    grids = [
+        density.kde_grid(points[clusters == c, 0], points[clusters == c, 1], method=method, grid_size=grid_size)
+        for c in range(n_clusters)
+    ]
+    return grids, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[250, 1000, 2500, 5000, 10000])
+    parser.add_argument("--grid-size", type=int, default=100)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="error máximo relativo al pico de densidad")
+    args = parser.parse_args()
+
+    print(f"rejilla {args.grid_size}×{args.grid_size}")
+    print(f"{'jugadores':>10} {'exacto':>10} {'binned':>10} {'speedup':>8} {'error máx':>10}  niveles")
+    for players in args.players:
+        points, clusters, n_clusters = season_embedding(players)
+        exact, exact_time = time_method(points, clusters, n_clusters, "exact", args.grid_size)
+        binned, binned_time = time_method(points, clusters, n_clusters, "binned", args.grid_size)
+
+        error = max(np.abs(fe - fb).max() / fe.max() for (_, _, fe), (_, _, fb) in zip(exact, binned))
+        same_levels = all(
+            np.allclose(contour_levels(fe), contour_levels(fb)) for (_, _, fe), (_, _, fb) in zip(exact, binned)
+        )
+        print(
+            f"{players:>10,} {exact_time * 1000:>8.1f}ms {binned_time * 1000:>8.1f}ms "
+            f"{exact_time / binned_time:>7.1f}x {error:>10.4f}  {'iguales' if same_levels else 'distintos'}"
+        )
+        if error > args.tolerance:
+            print(f"⚠️ error {error:.4f} por encima de la tolerancia {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
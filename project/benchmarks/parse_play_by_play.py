@@ -0,0 +1,127 @@
+import argparse
+import csv
+import glob
+import html
+import os
+import tempfile
+import time
+
+import scrap
+
+# Benchmark de extracción de filas de jugada a jugada: snapshot + BeautifulSoup frente a WebElements
+#
+#   python -m benchmarks.parse_play_by_play               (solo motor soup, sin navegador)
+#   python -m benchmarks.parse_play_by_play --selenium    (compara ambos motores con Chrome)
+
+RAW_FOLDER = "files/play_by_plays_raw"
+
+
+def load_raw_plays(folder=RAW_FOLDER):
+    plays = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            plays.extend(csv.DictReader(f))
+    return plays
+
+
+def _text_block(play):
+    side_css = "right" if play["side"] == play["visitor"] else "left"
+    return (
+        f'<div class="play-by-play-info-text_textBlock_{side_css}__X1">'
+        f'<p class="play-by-play-info-text_name__dTOhQ">{html.escape(play["player"] or "")}</p>'
+        f'<p class="play-by-play-info-text_stat__vapMZ">{html.escape(play["action"] or "")}</p>'
+        "</div>"
+    )
+
+
+def render_play_by_play_html(plays):
+    # Reproduce el marcado del game-center para un cuarto
+    items = []
+    for play in plays:
+        if play["score_home"] or play["score_away"]:
+            items.append(
+                '<li><div class="play-by-play-content-list-item-extensive_block__ZBIPh">'
+                f'<p class="play-by-play-score-stats_statsItemText__NKUQq">{play["score_home"]}</p>'
+                f'<p class="play-by-play-score-stats_statsItemText__NKUQq">{play["score_away"]}</p>'
+                f'<span class="play-by-play-content-list-item-extensive_timeText__3qSiy">{play["time"]}</span>'
+                f"{_text_block(play)}</div></li>"
+            )
+        else:
+            items.append(
+                '<li><div class="play-by-play-content-list-item_block__zk9Ab">'
+                f'<span class="play-by-play-content-list-item_timeText__Ye2xJ">{play["time"]}</span>'
+                f"{_text_block(play)}</div></li>"
+            )
+    return (
+        "<html><body><main>"
+        '<ul class="play-by-play-content-list_list__IAELd">' + "".join(items) + "</ul>"
+        "</main></body></html>"
+    )
+
+
+def bench_soup(page_html, period, home, visitor, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        plays = scrap.parse_play_by_play_html(page_html, period, home, visitor)
+    elapsed = time.perf_counter() - start
+    return plays, len(plays) * repeat / elapsed
+
+
+def bench_selenium(page_html, period, home, visitor, repeat):
+    from selenium.webdriver.common.by import By
+    from drivers import launch_driver
+
+    with tempfile.NamedTemporaryFile("w", suffix=".html", delete=False, encoding="utf-8") as f:
+        f.write(page_html)
+        path = f.name
+
+    driver = launch_driver(headless=True)
+    try:
+        driver.get("file://" + path)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            rows = driver.find_elements(By.CSS_SELECTOR, scrap.PLAY_ROWS_SELECTOR)
+            plays = scrap.parse_play_by_play_elements(rows, period, home, visitor)
+        elapsed = time.perf_counter() - start
+
+        # El camino nuevo incluye la lectura de page_source, que es lo que pagaría en producción
+        start = time.perf_counter()
+        for _ in range(repeat):
+            scrap.parse_play_by_play_html(driver.page_source, period, home, visitor)
+        soup_live = time.perf_counter() - start
+    finally:
+        driver.quit()
+        os.remove(path)
+    return plays, len(plays) * repeat / elapsed, len(plays) * repeat / soup_live
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=120, help="filas por cuarto")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--selenium", action="store_true", help="medir también el camino con WebElements")
+    args = parser.parse_args()
+
+    raw = load_raw_plays()
+    if not raw:
+        print(f"⚠️ No hay jugadas en {RAW_FOLDER}")
+        return
+
+    plays = (raw * (args.rows // len(raw) + 1))[:args.rows]
+    home, visitor = plays[0]["local"], plays[0]["visitor"]
+    period = plays[0]["period"]
+    page_html = render_play_by_play_html(plays)
+
+    parsed, soup_rate = bench_soup(page_html, period, home, visitor, args.repeat)
+    print(f"soup:     {len(parsed)} filas, {soup_rate:,.0f} filas/s")
+
+    if args.selenium:
+        parsed_sel, sel_rate, soup_live_rate = bench_selenium(page_html, period, home, visitor, max(1, args.repeat // 10))
+        print(f"selenium: {len(parsed_sel)} filas, {sel_rate:,.0f} filas/s")
+        print(f"soup (page_source en vivo): {soup_live_rate:,.0f} filas/s  ->  x{soup_live_rate / sel_rate:.1f}")
+        if parsed_sel != parsed:
+            print("⚠️ Los dos motores no devuelven las mismas jugadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import export
+import player_stats
+import scrap
+import synthetic
+import team_stats
+from event_store import EventStore
+from game_index import GameIndex
+
+# Benchmark del pipeline sobre torneos sintéticos (sin navegador ni web): limpieza del jugada a
+# jugada, funciones de export, box score defensivo (desde CSV y desde el event store) y los dos
+# scout_team. Todo se escribe en un directorio temporal; files/ del proyecto no se toca.
+#
+#   python -m benchmarks.pipeline --games 1 28 280 --repeat 3
+#   python -m benchmarks.pipeline --games 2800 --skip-scout
+#
+# Cada ejecución se añade a files/benchmarks/pipeline.json. Cada etapa se compara con la mediana
+# de las últimas ejecuciones a la misma escala y se avisa si es más lenta que la tolerancia
+# (con --fail-on-regression el proceso acaba con código 1, para usarlo en CI).
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "files", "benchmarks", "pipeline.json")
+STAGES = [
+    "generate",
+    "clean_play_by_plays",
+    "export_play_by_plays",
+    "export_box_scores",
+    "defensive_csv",
+    "defensive_store",
+    "team_scout_team",
+    "player_scout_team",
+]
+BASELINE_RUNS = 5
+NOISE_SECONDS = 0.05
+
+
+@contextlib.contextmanager
+def timer(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] += time.perf_counter() - start
+
+
+def run_scale(games, seed=0, scout=True):
+    # Una pasada completa en un directorio de trabajo nuevo; devuelve (tiempos, filas, comprobaciones)
+    work_dir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    cwd = os.getcwd()
+    timings = defaultdict(float)
+    try:
+        os.chdir(work_dir)
+        for folder in ("play_by_plays", "play_by_plays_raw"):
+            os.makedirs(os.path.join("files", folder))
+        store = EventStore(root=os.path.join(work_dir, "files", "event_store"))
+        index = GameIndex(path=os.path.join(work_dir, "files", "games_index.json"))
+
+        tournament = synthetic.SyntheticTournament(games=games, seed=seed)
+        tid = tournament.tournament_id
+        plays_count = 0
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for i in range(games):
+                with timer(timings, "generate"):
+                    plays = tournament.game(i)
+                game_name = tournament.game_name(i)
+                plays_count += len(plays)
+
+                with timer(timings, "clean_play_by_plays"):
+                    cleaned = scrap.clean_play_by_plays(plays)
+
+                with timer(timings, "export_play_by_plays"):
+                    export.save_csv_play_by_plays_raw(game_name=game_name, game_plays=plays)
+                    export.save_csv_play_by_plays_clean(
+                        game_name=game_name,
+                        game_plays=cleaned,
+                        tournament_id=tid,
+                        store=store,
+                        index=index,
+                        home=plays[0]["local"],
+                        visitor=plays[0]["visitor"],
+                    )
+
+            with timer(timings, "generate"):
+                players_box_scores, team_box_scores = tournament.box_scores()
+            with timer(timings, "export_box_scores"):
+                export.save_csv_players_total_box_score(players_box_scores, tournament_id=tid)
+                export.save_csv_team_total_box_score(team_box_scores, tournament_id=tid)
+
+            tournament_dir = os.path.join(work_dir, "files", "tournaments", tid)
+            offensive_csv = os.path.join(tournament_dir, "team_total_box_score.csv")
+            defensive_csv = os.path.join(tournament_dir, "team_total_box_scores_defensive.csv")
+            players_csv = os.path.join(tournament_dir, "players_total_box_score.csv")
+            play_by_play_folder = os.path.join(work_dir, "files", "play_by_plays")
+
+            with timer(timings, "defensive_csv"):
+                df_def = team_stats.get_team_defensive_stats_from_play_by_plays(
+                    play_by_play_folder=play_by_play_folder, team_list_csv=offensive_csv, tournaments=[tid], index=index
+                )
+            with timer(timings, "defensive_store"):
+                df_def_store = team_stats.get_team_defensive_stats_from_play_by_plays(
+                    play_by_play_folder=play_by_play_folder, team_list_csv=offensive_csv, store=store, tournaments=[tid],
+                    index=index,
+                )
+            export.save_csv_team_defensive_box_score(df_def, tournament_id=tid)
+
+            if scout:
+                team_name = tournament.team_names[0]
+                plots_dir = os.path.join(work_dir, "files", "plots")
+                with timer(timings, "team_scout_team"):
+                    team_stats.scout_team(team_name, offensive_csv, defensive_csv, plots_dir=plots_dir)
+                with timer(timings, "player_scout_team"):
+                    player_stats.scout_team(team_name, offensive_csv, defensive_csv, players_csv, plots_dir=plots_dir)
+
+        # Los datos sintéticos cuadran: puntos recibidos (jugada a jugada) = puntos anotados (box score)
+        points = sum(int(item["stats"][4]) for item in team_box_scores)
+        checks = {
+            "defensive_points_match": int(df_def["PTSr"].sum()) == points,
+            "store_matches_csv": df_def.equals(df_def_store),
+        }
+        return dict(timings), plays_count, checks
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def best_of(runs):
+    return {stage: min(run[stage] for run in runs) for stage in runs[0]}
+
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(results, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def baseline(history, games):
+    # Mediana por etapa de las últimas ejecuciones a la misma escala
+    previous = [run["stages"] for run in history if run["games"] == games][-BASELINE_RUNS:]
+    stages = {stage for run in previous for stage in run}
+    return {
+        stage: statistics.median(run[stage] for run in previous if stage in run)
+        for stage in stages
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, nargs="+", default=[1, 28, 280], help="partidos del torneo sintético")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por escala (se queda la mejor)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-scout", action="store_true", help="no medir los scout_team (gráficos)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="margen sobre la mediana anterior antes de avisar")
+    parser.add_argument("--results", default=RESULTS_PATH, help="historial de resultados")
+    parser.add_argument("--no-save", action="store_true", help="no añadir esta ejecución al historial")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    new_runs = []
+    regressions = []
+
+    for games in args.games:
+        runs = []
+        for _ in range(args.repeat):
+            timings, plays_count, checks = run_scale(games, seed=args.seed, scout=not args.skip_scout)
+            runs.append(timings)
+        stages = best_of(runs)
+        reference = baseline(history, games)
+
+        print(f"\n{games:,} partidos · {plays_count:,} jugadas · mejor de {args.repeat}")
+        print(f"   {'etapa':<22} {'tiempo':>10} {'por partido':>12} {'referencia':>11} {'Δ':>8}")
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            seconds = stages[stage]
+            line = f"   {stage:<22} {seconds * 1000:>8.1f}ms {seconds / games * 1000:>10.2f}ms"
+            if stage in reference:
+                change = seconds / reference[stage] - 1 if reference[stage] else 0.0
+                line += f" {reference[stage] * 1000:>9.1f}ms {change * 100:>+7.1f}%"
+                if change > args.tolerance and seconds - reference[stage] > NOISE_SECONDS:
+                    line += "  ⚠️"
+                    regressions.append((games, stage, change))
+            print(line)
+        print(f"   limpieza: {plays_count / stages['clean_play_by_plays']:,.0f} jugadas/s")
+        for name, ok in checks.items():
+            if not ok:
+                print(f"⚠️ Comprobación fallida: {name}")
+
+        new_runs.append({
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "games": games,
+            "plays": plays_count,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "stages": stages,
+            "checks": checks,
+        })
+
+    if not args.no_save:
+        save_results(history + new_runs, args.results)
+        print(f"\n💾 Resultados añadidos a {args.results}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} etapas más lentas que la referencia (+{args.tolerance * 100:.0f}%):")
+        for games, stage, change in regressions:
+            print(f"   {games:,} partidos · {stage}: {change * 100:+.1f}%")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
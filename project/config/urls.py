@@ -1,4 +1,11 @@
 ANGT_GAMES = "https://www.euroleaguebasketball.net/es/ngt/game-center/?round={round}&season={tournament}"
 ANGT_TEAMS = "https://www.euroleaguebasketball.net/es/ngt/teams/"
 BOX_SCORE_ENDPOINT = "phase=All%20phases#accumulated"
-PLAY_BY_PLAY_ENDPOINT = "jugada-a-jugada"
\ No newline at end of file
+PLAY_BY_PLAY_ENDPOINT = "jugada-a-jugada"
+
+# API en vivo de la que tira el propio game-center (backend HTTP sin navegador)
+LIVE_API_BASE = "https://live.euroleague.net/api"
+LIVE_API_HEADER = "/Header?gamecode={game_code}&seasoncode={season_code}"
+LIVE_API_BOX_SCORE = "/Boxscore?gamecode={game_code}&seasoncode={season_code}"
+LIVE_API_PLAY_BY_PLAY = "/PlaybyPlay?gamecode={game_code}&seasoncode={season_code}"
+ANGT_GAME = "https://www.euroleaguebasketball.net/es/ngt/game-center/game/{tournament}/{game_code}/"
@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import tracing
+from render_cache import _feed, output_paths
+
+# Orquestador del pipeline: un pequeño DAG de etapas con caché por etapa.
+#
+#   pipeline = Pipeline()
+#   pipeline.add("defensive", func, inputs=["files/play_by_plays", "files/team_total_box_score.csv"],
+#                outputs=["files/team_total_box_scores_defensive.csv"], params={...})
+#   pipeline.run(workers=4)            # solo las etapas desactualizadas, las independientes a la vez
+#   pipeline.run(dry_run=True)         # qué se ejecutaría y por qué, sin ejecutar nada
+#
+# Entradas y salidas son ficheros o carpetas (también los .py de los que depende la etapa, así un
+# cambio de código la invalida). Las dependencias salen solas: una etapa depende de la que produce
+# alguna de sus entradas. En files/cache/pipeline.json se guarda, por etapa, el hash del contenido
+# de cada entrada y salida y de los parámetros; una etapa se vuelve a ejecutar si falta o cambió
+# alguna salida, si cambió alguna entrada o parámetro, o si es una fuente remota (scraping).
+# Si una etapa se ejecuta pero sus salidas quedan iguales, las siguientes no se repiten.
+#
+# La función de una etapa puede devolver rutas (str o dicts anidados, como los scout_team):
+# se guardan como salidas además de las declaradas.
+
+PIPELINE_STATE_PATH = os.path.join(os.path.dirname(__file__), "files", "cache", "pipeline.json")
+CHUNK_SIZE = 1024 * 1024
+
+
+class Stage:
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, volatile=False):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.params = params or {}
+        # volatile: la etapa lee de fuera (web) y no se puede saber si está al día sin ejecutarla
+        self.volatile = volatile
+        self.deps = set()
+
+
+class Pipeline:
+
+    def __init__(self, state_path=PIPELINE_STATE_PATH):
+        self.state_path = state_path
+        self._lock = threading.RLock()
+        self.stages = {}
+        self.state = self._load()
+        self.state.setdefault("stages", {})
+        self.state.setdefault("files", {})
+
+    def add(self, name, func, inputs=(), outputs=(), params=None, volatile=False):
+        if name in self.stages:
+            raise ValueError(f"Etapa duplicada: {name}")
+        self.stages[name] = Stage(name, func, inputs, outputs, params, volatile)
+        return self.stages[name]
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Estado del pipeline corrupto, se vuelven a ejecutar todas las etapas")
+            return {}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+
+    ## HASHES
+
+    def _file_digest(self, path):
+        # Se rehashea solo si cambió el tamaño o la fecha de modificación
+        stat = os.stat(path)
+        with self._lock:
+            memo = self.state["files"].get(path)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self.state["files"][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path):
+        # Hash del contenido de un fichero o de una carpeta (rutas relativas + hash de cada fichero)
+        if os.path.isfile(path):
+            return self._file_digest(path)
+        if not os.path.isdir(path):
+            return None
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.endswith(".tmp"):
+                    continue
+                file_path = os.path.join(root, filename)
+                h.update(os.path.relpath(file_path, path).encode("utf-8"))
+                h.update(self._file_digest(file_path).encode("ascii"))
+        return h.hexdigest()
+
+    @staticmethod
+    def params_digest(params):
+        h = hashlib.sha256()
+        _feed(h, params)
+        return h.hexdigest()
+
+    ## GRAFO
+
+    def _link(self):
+        # Cada entrada producida por otra etapa (misma ruta o dentro de una carpeta de salida) es una dependencia
+        self.producers = {}
+        for stage in self.stages.values():
+            for path in stage.outputs:
+                if path in self.producers:
+                    raise ValueError(f"{path} lo producen {self.producers[path]} y {stage.name}")
+                self.producers[path] = stage.name
+        for stage in self.stages.values():
+            stage.deps = {
+                producer
+                for path in stage.inputs
+                for output, producer in self.producers.items()
+                if producer != stage.name and (path == output or path.startswith(output + os.sep))
+            }
+        return self._order()
+
+    def missing_sources(self, stage):
+        # Entradas que no produce ninguna etapa y no existen: la etapa no puede ejecutarse
+        return [
+            path for path in stage.inputs
+            if not os.path.exists(path)
+            and not any(path == output or path.startswith(output + os.sep) for output in self.producers)
+        ]
+
+    def _order(self):
+        order, done = [], set()
+        while len(order) < len(self.stages):
+            ready = [
+                name for name, stage in self.stages.items()
+                if name not in done and stage.deps <= done
+            ]
+            if not ready:
+                cycle = sorted(set(self.stages) - done)
+                raise ValueError(f"Dependencias circulares entre: {', '.join(cycle)}")
+            order += ready
+            done.update(ready)
+        return order
+
+    def staleness(self, stage, force=(), pending=()):
+        # Motivo por el que la etapa debe ejecutarse, o None si está al día
+        if stage.name in force:
+            return "forzada"
+        waiting = sorted(stage.deps & set(pending))
+        if waiting:
+            return f"pendiente de {', '.join(waiting)}"
+        if stage.volatile:
+            return "fuente remota"
+        with self._lock:
+            record = self.state["stages"].get(stage.name)
+        if record is None:
+            return "sin ejecución previa"
+        if record.get("params") != self.params_digest(stage.params):
+            return "parámetros cambiados"
+        for path, digest in record.get("outputs", {}).items():
+            current = self.digest(path)
+            if current is None:
+                return f"falta {path}"
+            if current != digest:
+                return f"{path} modificado"
+        for path in stage.inputs:
+            if self.digest(path) != record.get("inputs", {}).get(path):
+                return f"{path} cambió"
+        return None
+
+    def _record(self, stage, result, seconds):
+        # Las salidas declaradas se guardan aunque no existan (así la etapa sigue pendiente)
+        outputs = {path: self.digest(path) for path in stage.outputs}
+        for path in output_paths(result):
+            path = os.path.normpath(path)
+            if path not in outputs and os.path.exists(path):
+                outputs[path] = self.digest(path)
+        record = {
+            "params": self.params_digest(stage.params),
+            "inputs": {path: self.digest(path) for path in stage.inputs},
+            "outputs": outputs,
+            "seconds": round(seconds, 3),
+            "finished_at": time.time(),
+        }
+        with self._lock:
+            self.state["stages"][stage.name] = record
+        self.save()
+
+    ## EJECUCIÓN
+
+    def plan(self, force=()):
+        # Simulación: qué etapas se ejecutarían y por qué (las posteriores a una que se ejecuta, en espera)
+        order = self._link()
+        force = self._forced(force)
+        plan, running = {}, set()
+        for name in order:
+            missing = self.missing_sources(self.stages[name])
+            reason = f"falta {missing[0]}" if missing else self.staleness(self.stages[name], force, running)
+            plan[name] = reason
+            if reason is not None:
+                running.add(name)
+        return plan
+
+    def _forced(self, force):
+        # force: nombres de etapas o True (todas)
+        if force is True:
+            return set(self.stages)
+        unknown = sorted(set(force) - set(self.stages))
+        if unknown:
+            raise ValueError(f"Etapas desconocidas: {', '.join(unknown)} (opciones: {', '.join(self.stages)})")
+        return set(force)
+
+    def _run_stage(self, stage):
+        print(f"▶️ Etapa {stage.name}")
+        start = time.perf_counter()
+        with tracing.stage(f"pipeline.{stage.name}", "pipeline"):
+            result = stage.func()
+        seconds = time.perf_counter() - start
+        self._record(stage, result, seconds)
+        return seconds
+
+    def run(self, workers=1, force=(), dry_run=False):
+        # Ejecuta en orden de dependencias; las etapas listas e independientes van a la vez
+        if dry_run:
+            plan = self.plan(force)
+            self.print_plan(plan)
+            return plan
+
+        order = self._link()
+        force = self._forced(force)
+        self.results = {}
+        remaining = set(self.stages)
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            running = {}
+            while remaining or running:
+                # En orden topológico: las etapas al día se resuelven en la misma pasada y todo lo
+                # que queda listo se lanza antes de esperar a las que están en marcha
+                for name in [name for name in order if name in remaining]:
+                    stage = self.stages[name]
+                    if not stage.deps <= set(self.results):
+                        continue
+                    remaining.discard(name)
+                    failed = sorted(dep for dep in stage.deps if self.results[dep][0] in ("failed", "skipped"))
+                    if failed:
+                        self.results[name] = ("skipped", f"falló {', '.join(failed)}", 0.0)
+                        continue
+                    missing = self.missing_sources(stage)
+                    if missing:
+                        print(f"❌ Etapa {name}: falta {', '.join(missing)}")
+                        self.results[name] = ("failed", f"falta {missing[0]}", 0.0)
+                        errors[name] = FileNotFoundError(missing[0])
+                        continue
+                    # Las dependencias ya terminaron: si sus salidas no cambiaron, esta sigue al día
+                    reason = self.staleness(stage, force)
+                    if reason is None:
+                        self.results[name] = ("fresh", None, 0.0)
+                        continue
+                    running[executor.submit(self._run_stage, stage)] = (name, reason)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, reason = running.pop(future)
+                    try:
+                        self.results[name] = ("ran", reason, future.result())
+                    except Exception as e:
+                        print(f"❌ Etapa {name} fallida: {e}")
+                        errors[name] = e
+                        self.results[name] = ("failed", str(e), 0.0)
+
+        self.report()
+        if errors:
+            raise RuntimeError(f"Etapas fallidas: {', '.join(errors)}") from next(iter(errors.values()))
+        return self.results
+
+    ## INFORMES
+
+    def print_plan(self, plan):
+        pending = [name for name, reason in plan.items() if reason is not None]
+        print(f"\n🧪 Simulación del pipeline: {len(pending)} de {len(plan)} etapas se ejecutarían")
+        for name, reason in plan.items():
+            deps = ", ".join(sorted(self.stages[name].deps))
+            status = f"▶️ {reason}" if reason is not None else "✅ al día"
+            print(f"   {name:<16} {status:<56} {'← ' + deps if deps else ''}")
+
+    def report(self):
+        icons = {"ran": "▶️", "fresh": "✅", "skipped": "⏭️", "failed": "❌"}
+        counts = {status: 0 for status in icons}
+        for status, _, _ in self.results.values():
+            counts[status] += 1
+        print(
+            f"\n🧩 Pipeline: {counts['ran']} etapas ejecutadas, {counts['fresh']} al día, "
+            f"{counts['skipped']} saltadas, {counts['failed']} fallidas"
+        )
+        for name in self._order():
+            status, reason, seconds = self.results[name]
+            detail = f"{reason} · {seconds:.2f}s" if status == "ran" else (reason or "al día")
+            print(f"   {icons[status]} {name:<16} {detail}")
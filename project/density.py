@@ -0,0 +1,81 @@
+import numpy as np
+from scipy.signal import fftconvolve
+from scipy.stats import gaussian_kde
+
+# Densidad KDE 2D evaluada en una rejilla regular (para dibujar contornos).
+#
+#   exact:  gaussian_kde evaluado punto a punto en la rejilla, O(puntos × celdas)
+#   binned: los puntos se reparten en la rejilla (binning lineal) y se convolucionan con el
+#           núcleo gaussiano por FFT, O(puntos + celdas · log celdas). Usa el mismo ancho de
+#           banda (regla de Scott) que gaussian_kde, así los contornos coinciden.
+
+KDE_METHODS = ("exact", "binned")
+
+
+def kde_grid_bounds(x, y, pad=1.0):
+    return x.min() - pad, x.max() + pad, y.min() - pad, y.max() + pad
+
+
+def kde_grid_exact(x, y, grid_size=100, pad=1.0):
+    xmin, xmax, ymin, ymax = kde_grid_bounds(x, y, pad)
+    kde = gaussian_kde(np.vstack([x, y]))
+    xx, yy = np.mgrid[xmin:xmax:grid_size * 1j, ymin:ymax:grid_size * 1j]
+    positions = np.vstack([xx.ravel(), yy.ravel()])
+    f = np.reshape(kde(positions).T, xx.shape)
+    return xx, yy, f
+
+
+def _linear_binning(x, y, xmin, ymin, dx, dy, grid_size):
+    # Cada punto reparte su peso entre las 4 celdas que lo rodean
+    fx = (x - xmin) / dx
+    fy = (y - ymin) / dy
+    i = np.clip(np.floor(fx).astype(int), 0, grid_size - 2)
+    j = np.clip(np.floor(fy).astype(int), 0, grid_size - 2)
+    wx = fx - i
+    wy = fy - j
+
+    counts = np.zeros(grid_size * grid_size)
+    for di, dj, weight in (
+        (0, 0, (1 - wx) * (1 - wy)),
+        (1, 0, wx * (1 - wy)),
+        (0, 1, (1 - wx) * wy),
+        (1, 1, wx * wy),
+    ):
+        counts += np.bincount((i + di) * grid_size + (j + dj), weights=weight, minlength=grid_size * grid_size)
+    return counts.reshape(grid_size, grid_size)
+
+
+def kde_grid_binned(x, y, grid_size=100, pad=1.0, truncate=4.0):
+    xmin, xmax, ymin, ymax = kde_grid_bounds(x, y, pad)
+    xx, yy = np.mgrid[xmin:xmax:grid_size * 1j, ymin:ymax:grid_size * 1j]
+    dx = (xmax - xmin) / (grid_size - 1)
+    dy = (ymax - ymin) / (grid_size - 1)
+
+    # Mismo núcleo que gaussian_kde: covarianza de los datos × factor de Scott²
+    data = np.vstack([x, y])
+    n = data.shape[1]
+    factor = n ** (-1.0 / 6)
+    covariance = np.atleast_2d(np.cov(data)) * factor ** 2
+    inverse = np.linalg.inv(covariance)
+    norm = 2 * np.pi * np.sqrt(np.linalg.det(covariance))
+
+    # Núcleo en desplazamientos de la rejilla, cortado a `truncate` desviaciones
+    lx = min(grid_size - 1, int(np.ceil(truncate * np.sqrt(covariance[0, 0]) / dx)))
+    ly = min(grid_size - 1, int(np.ceil(truncate * np.sqrt(covariance[1, 1]) / dy)))
+    ox, oy = np.mgrid[-lx:lx + 1, -ly:ly + 1]
+    ux, uy = ox * dx, oy * dy
+    kernel = np.exp(-0.5 * (inverse[0, 0] * ux * ux + 2 * inverse[0, 1] * ux * uy + inverse[1, 1] * uy * uy)) / norm
+
+    counts = _linear_binning(x, y, xmin, ymin, dx, dy, grid_size)
+    f = fftconvolve(counts, kernel, mode="same") / n
+    return xx, yy, np.maximum(f, 0)
+
+
+def kde_grid(x, y, method="exact", grid_size=100, pad=1.0):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if method == "binned":
+        return kde_grid_binned(x, y, grid_size=grid_size, pad=pad)
+    if method == "exact":
+        return kde_grid_exact(x, y, grid_size=grid_size, pad=pad)
+    raise ValueError(f"Método KDE desconocido: {method} (opciones: {', '.join(KDE_METHODS)})")
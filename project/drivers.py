@@ -0,0 +1,158 @@
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from contextlib import contextmanager
+import threading
+import time
+
+import tracing
+
+CHROMEDRIVER_PATH = "./config/chromedriver.exe"
+
+
+def launch_driver(headless=False):
+    service = Service(CHROMEDRIVER_PATH)
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    return webdriver.Chrome(service=service, options=options)
+
+
+class PooledDriver:
+    # Envuelve el WebDriver real para contar cuántas páginas ha cargado
+
+    def __init__(self, driver, launch_seconds):
+        self._driver = driver
+        self.launch_seconds = launch_seconds
+        self.pages = 0
+
+    def get(self, url):
+        self.pages += 1
+        tracing.count("browser.pages")
+        return self._driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class DriverPool:
+    # Pool de navegadores calientes reutilizables entre llamadas de scrap.py
+    #
+    #   with DriverPool(size=1, max_pages=50) as pool:
+    #       with pool.driver() as driver:
+    #           scrap.scrap_urls_teams(tournament, driver=driver)
+
+    def __init__(self, size=1, max_pages=50, headless=True, launcher=launch_driver):
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self.launcher = launcher
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+        self.launches = 0
+        self.reuses = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.launch_seconds = 0.0
+
+    def _launch(self):
+        start = time.perf_counter()
+        driver = self.launcher(headless=self.headless)
+        elapsed = time.perf_counter() - start
+        tracing.record("browser.launch", "browser", elapsed)
+        with self._lock:
+            self.launches += 1
+            self.launch_seconds += elapsed
+        return PooledDriver(driver, elapsed)
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _is_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("DriverPool cerrado")
+
+        self._slots.acquire()
+        with self._lock:
+            driver = self._idle.pop() if self._idle else None
+            if driver is not None:
+                self.reuses += 1
+
+        if driver is None:
+            try:
+                driver = self._launch()
+            except Exception:
+                self._slots.release()
+                raise
+        return driver
+
+    def release(self, driver, crashed=False):
+        try:
+            # Las funciones de scrap capturan sus propios errores, así que comprobamos el navegador
+            if crashed or not self._is_alive(driver):
+                with self._lock:
+                    self.crashes += 1
+                self._discard(driver)
+            elif driver.pages >= self.max_pages:
+                with self._lock:
+                    self.recycles += 1
+                self._discard(driver)
+            elif self._closed:
+                self._discard(driver)
+            else:
+                with self._lock:
+                    self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self):
+        driver = self.acquire()
+        try:
+            yield driver
+        except Exception:
+            self.release(driver, crashed=True)
+            raise
+        self.release(driver)
+
+    def saved_launch_seconds(self):
+        if not self.launches:
+            return 0.0
+        return self.reuses * (self.launch_seconds / self.launches)
+
+    def report(self):
+        print(
+            f"🚗 Navegadores lanzados: {self.launches} ({self.launch_seconds:.1f}s), "
+            f"reutilizados: {self.reuses}, reciclados: {self.recycles}, caídos: {self.crashes}, "
+            f"tiempo de arranque ahorrado: ~{self.saved_launch_seconds():.1f}s"
+        )
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        self.report()
+        return False
@@ -0,0 +1,148 @@
+import os
+import shutil
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Almacén columnar (Parquet) del jugada a jugada limpio, particionado por torneo y partido:
+#
+#   files/event_store/tournament=<id>/game=<partido>/part-<n>.parquet
+#
+# Jugadores, equipos, códigos de acción y periodos se guardan con codificación de
+# diccionario (en pandas llegan como Categorical). Los lectores piden solo las columnas
+# y partidos que necesitan: el resto de ficheros y columnas ni se abren.
+
+EVENT_STORE_DIR = os.path.join(os.path.dirname(__file__), "files", "event_store")
+UNKNOWN_TOURNAMENT = "unknown"
+
+_players = [f"homeplayer{i}" for i in range(1, 6)] + [f"awayplayer{i}" for i in range(1, 6)]
+
+EVENT_SCHEMA = pa.schema(
+    [
+        ("period", pa.dictionary(pa.int8(), pa.string())),
+        ("time", pa.string()),
+        ("player", pa.dictionary(pa.int16(), pa.string())),
+        ("action_code", pa.dictionary(pa.int8(), pa.string())),
+        ("side", pa.dictionary(pa.int8(), pa.string())),
+        ("score_home", pa.int16()),
+        ("score_away", pa.int16()),
+    ]
+    + [(column, pa.dictionary(pa.int16(), pa.string())) for column in _players]
+)
+
+# tournament y game también llegan como diccionario (una entrada por partición, no por fila)
+PARTITIONING = ds.HivePartitioning.discover(infer_dictionary=True)
+
+
+def _score(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    return None if value is None or value == "" else str(value)
+
+
+class EventStore:
+
+    def __init__(self, root=EVENT_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def game_dir(self, tournament_id, game):
+        return os.path.join(self.root, f"tournament={tournament_id or UNKNOWN_TOURNAMENT}", f"game={game}")
+
+    def _table(self, rows):
+        # rows: filas con el formato del CSV limpio (homeplayer1..5 / awayplayer1..5)
+        columns = {
+            "period": [_text(row["period"]) for row in rows],
+            "time": [_text(row["time"]) for row in rows],
+            "player": [_text(row["player"]) for row in rows],
+            "action_code": [_text(row["action_code"]) for row in rows],
+            "side": [_text(row["side"]) for row in rows],
+            "score_home": [_score(row["score_home"]) for row in rows],
+            "score_away": [_score(row["score_away"]) for row in rows],
+        }
+        for column in _players:
+            columns[column] = [_text(row[column]) for row in rows]
+        return pa.Table.from_pydict(columns, schema=EVENT_SCHEMA)
+
+    def append(self, tournament_id, game, rows):
+        # Un fichero nuevo por bloque (p. ej. un cuarto en modo streaming)
+        if not rows:
+            return None
+        game_dir = self.game_dir(tournament_id, game)
+        with self._lock:
+            os.makedirs(game_dir, exist_ok=True)
+            part = len([f for f in os.listdir(game_dir) if f.endswith(".parquet")])
+            path = os.path.join(game_dir, f"part-{part:03d}.parquet")
+            # Los ficheros que empiezan por "_" no los ve el lector mientras se escriben
+            tmp_path = os.path.join(game_dir, f"_part-{part:03d}.parquet.tmp")
+            pq.write_table(self._table(rows), tmp_path)
+            os.replace(tmp_path, path)
+        return path
+
+    def clear_game(self, tournament_id, game):
+        shutil.rmtree(self.game_dir(tournament_id, game), ignore_errors=True)
+
+    def replace(self, tournament_id, game, rows):
+        self.clear_game(tournament_id, game)
+        return self.append(tournament_id, game, rows)
+
+    def games(self, tournaments=None):
+        # [(torneo, partido)] guardados
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for tournament_dir in sorted(os.listdir(self.root)):
+            if not tournament_dir.startswith("tournament="):
+                continue
+            tournament_id = tournament_dir.split("=", 1)[1]
+            if tournaments is not None and tournament_id not in tournaments:
+                continue
+            for game_dir in sorted(os.listdir(os.path.join(self.root, tournament_dir))):
+                if game_dir.startswith("game="):
+                    found.append((tournament_id, game_dir.split("=", 1)[1]))
+        return found
+
+    def split_coverage(self, game_ids, tournaments=None):
+        # Partidos seleccionados que ya están en el store y los que faltan (se leen de sus CSV)
+        stored = {game for _, game in self.games(tournaments)}
+        covered = [gid for gid in game_ids if gid in stored]
+        missing = [gid for gid in game_ids if gid not in stored]
+        if covered and missing:
+            print(f"⚠️ Event store incompleto: {len(missing)} de {len(game_ids)} partidos se leen de los CSV")
+        return covered, missing
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+
+    def read_table(self, columns=None, tournaments=None, games=None):
+        # Proyección de columnas y filtro de particiones: solo se leen los ficheros necesarios
+        if not self.games(tournaments):
+            return None
+        dataset = self.dataset()
+
+        condition = None
+        if tournaments is not None:
+            condition = ds.field("tournament").isin(list(tournaments))
+        if games is not None:
+            game_condition = ds.field("game").isin(list(games))
+            condition = game_condition if condition is None else condition & game_condition
+
+        return dataset.to_table(columns=columns, filter=condition)
+
+    def read(self, columns=None, tournaments=None, games=None):
+        start = time.perf_counter()
+        table = self.read_table(columns=columns, tournaments=tournaments, games=games)
+        if table is None:
+            return None
+        # Los diccionarios pasan a Categorical sin materializar las cadenas de cada fila
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        print(f"📦 Event store: {len(df)} jugadas, {len(df.columns)} columnas en {time.perf_counter() - start:.2f}s")
+        return df
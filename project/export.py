@@ -2,11 +2,19 @@ import pandas as pd
 import csv
 import os
 
-def save_csv_players_total_box_score(box_scores):
-    if not box_scores:
-        print("⚠️ No hay datos para guardar.")
-        return
+from event_store import EventStore
+from game_index import game_id, teams_from_game_id
+import tracing
+
+TOURNAMENTS_DIR = "./files/tournaments"
+
+def tournament_path(filename, tournament_id):
+    # Salidas particionadas por torneo: files/tournaments/<torneo>/<fichero>
+    out_dir = os.path.join(TOURNAMENTS_DIR, tournament_id)
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, filename)
 
+def players_box_score_frame(box_scores):
     rows = []
     for item in box_scores:
         if item["player_name"] == "UNKNOWN":
@@ -81,15 +89,22 @@ def save_csv_players_total_box_score(box_scores):
         "PIR",
     ]
 
-    df = pd.DataFrame(rows, columns=columns)
-    df.to_csv("./files/players_total_box_score.csv", index=False, encoding="utf-8-sig")
-    print("✅ Archivo guardado: total_box_score.csv")
+    return pd.DataFrame(rows, columns=columns)
 
-def save_csv_team_total_box_score(box_scores):
+@tracing.traced("export")
+def save_csv_players_total_box_score(box_scores, tournament_id=None, warehouse=None):
     if not box_scores:
         print("⚠️ No hay datos para guardar.")
         return
 
+    df = players_box_score_frame(box_scores)
+    path = tournament_path("players_total_box_score.csv", tournament_id) if tournament_id else "./files/players_total_box_score.csv"
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    if warehouse is not None:
+        warehouse.upsert_player_box_scores(df, tournament_id)
+    print(f"✅ Archivo guardado: {path}")
+
+def team_box_score_frame(box_scores):
     rows = []
     for item in box_scores:
         if item["player_name"] == "UNKNOWN":
@@ -160,73 +175,370 @@ def save_csv_team_total_box_score(box_scores):
         "PIR",
     ]
 
-    df = pd.DataFrame(rows, columns=columns)
-    df.to_csv("./files/team_total_box_score.csv", index=False, encoding="utf-8-sig")
-    print("✅ Archivo guardado: total_box_score.csv")
+    return pd.DataFrame(rows, columns=columns)
 
-def save_csv_team_defensive_box_score(df_defensive_stats: pd.DataFrame):
-    
-    filename = "team_total_box_scores_defensive.csv"
+@tracing.traced("export")
+def save_csv_team_total_box_score(box_scores, tournament_id=None, warehouse=None):
+    if not box_scores:
+        print("⚠️ No hay datos para guardar.")
+        return
+
+    df = team_box_score_frame(box_scores)
+    path = tournament_path("team_total_box_score.csv", tournament_id) if tournament_id else "./files/team_total_box_score.csv"
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    if warehouse is not None:
+        warehouse.upsert_team_box_scores(df, tournament_id)
+    print(f"✅ Archivo guardado: {path}")
+
+def _replace_team_rows(path, df_new):
+    # Sustituye solo las filas de los equipos que llegan, manteniendo el orden del CSV existente
+    if not os.path.exists(path):
+        return df_new
+
+    df_old = pd.read_csv(path, encoding="utf-8-sig")
+    team_order = list(dict.fromkeys(df_old["team_name"].tolist() + df_new["team_name"].tolist()))
+    df = pd.concat([df_old[~df_old["team_name"].isin(df_new["team_name"])], df_new], ignore_index=True)
+    df["_order"] = df["team_name"].map({team: i for i, team in enumerate(team_order)})
+    return df.sort_values("_order", kind="stable").drop(columns="_order")
+
+@tracing.traced("export")
+def update_csv_players_total_box_score(box_scores, warehouse=None):
+    if not box_scores:
+        print("⚠️ No hay datos para actualizar.")
+        return
+
+    path = "./files/players_total_box_score.csv"
+    df_new = players_box_score_frame(box_scores)
+    if warehouse is not None:
+        warehouse.upsert_player_box_scores(df_new)
+    df = _replace_team_rows(path, df_new)
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    print(f"✅ Archivo actualizado: players_total_box_score.csv ({df['team_name'].nunique()} equipos)")
+
+@tracing.traced("export")
+def update_csv_team_total_box_score(box_scores, warehouse=None):
+    if not box_scores:
+        print("⚠️ No hay datos para actualizar.")
+        return
+
+    path = "./files/team_total_box_score.csv"
+    df_new = team_box_score_frame(box_scores)
+    if warehouse is not None:
+        warehouse.upsert_team_box_scores(df_new)
+    df = _replace_team_rows(path, df_new)
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    print(f"✅ Archivo actualizado: team_total_box_score.csv ({len(df)} equipos)")
+
+@tracing.traced("export")
+def save_csv_possessions(df_possessions: pd.DataFrame):
+
+    filename = "possessions.csv"
     base_dir = os.path.dirname(__file__)
     out_path = os.path.join(base_dir, "files", filename)
-    df_defensive_stats.to_csv(out_path, index=False)
+    df_possessions.to_csv(out_path, index=False)
+    print(f"✅ Archivo guardado: {filename} ({len(df_possessions)} posesiones)")
 
+@tracing.traced("export")
+def save_csv_lineups(report):
+    # report: tablas de lineups.lineup_report → files/lineups/<tabla>.csv
 
+    base_dir = os.path.dirname(__file__)
+    out_dir = os.path.join(base_dir, "files", "lineups")
+    os.makedirs(out_dir, exist_ok=True)
+    for name, df in report.items():
+        df.to_csv(os.path.join(out_dir, f"{name}.csv"), index=False)
+    print(f"✅ Quintetos guardados en files/lineups ({', '.join(f'{name}: {len(df)}' for name, df in report.items())})")
+
+@tracing.traced("export")
+def save_csv_team_defensive_box_score(df_defensive_stats: pd.DataFrame, tournament_id=None, warehouse=None):
+    
+    filename = "team_total_box_scores_defensive.csv"
+    if tournament_id:
+        out_path = tournament_path(filename, tournament_id)
+    else:
+        base_dir = os.path.dirname(__file__)
+        out_path = os.path.join(base_dir, "files", filename)
+    df_defensive_stats.to_csv(out_path, index=False)
+    if warehouse is not None:
+        warehouse.upsert_defensive_box_scores(df_defensive_stats, tournament_id)
+
+
+RAW_PLAY_BY_PLAY_COLUMNS = ["local", "visitor", "period", "time", "player", "action", "side", "score_home", "score_away"]
+
+# Columnas base + 10 columnas para jugadores en pista
+CLEAN_PLAY_BY_PLAY_COLUMNS = [
+    "period",
+    "time",
+    "player",
+    "action_code",
+    "side",
+    "score_home",
+    "score_away",
+] + [f"homeplayer{i}" for i in range(1, 6)] + [f"awayplayer{i}" for i in range(1, 6)]
+
+
+def _game_file_name(game_name):
+    return game_id(game_name) + ".csv"
+
+
+def _clean_csv_row(play):
+    home_players = sorted(play["players_on_court_home"])[:5]
+    away_players = sorted(play["players_on_court_away"])[:5]
+
+    row = {
+        "period": play["period"],
+        "time": play["time"],
+        "player": play["player"],
+        "action_code": play["action_code"],
+        "side": play["side"],
+        "score_home": play["score_home"],
+        "score_away": play["score_away"],
+    }
+
+    # Añadir jugadores de home y away, rellena vacíos si hay menos de 5
+    for i in range(5):
+        row[f"homeplayer{i+1}"] = home_players[i] if i < len(home_players) else ""
+        row[f"awayplayer{i+1}"] = away_players[i] if i < len(away_players) else ""
+    return row
+
+
+class PlayByPlayCsvSink:
+    # CSV que se escribe por bloques (un cuarto cada vez) y se vuelca a disco tras cada
+    # bloque: si el proceso cae, los cuartos ya escritos no se pierden.
+    # El fichero se crea con el primer bloque no vacío (un partido sin jugadas no deja CSV).
+
+    def __init__(self, path, fieldnames, encoding="utf-8", lineterminator="\r\n", to_row=None):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.encoding = encoding
+        self.lineterminator = lineterminator
+        self.to_row = to_row
+        self.rows = 0
+        self._file = None
+        self._writer = None
+
+    @tracing.traced("export", name="export.csv_write")
+    def write(self, plays):
+        if not plays:
+            return
+        if self._file is None:
+            self._file = open(self.path, mode="w", newline="", encoding=self.encoding)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore", lineterminator=self.lineterminator)
+            self._writer.writeheader()
+        self._writer.writerows(map(self.to_row, plays) if self.to_row else plays)
+        self._file.flush()
+        self.rows += len(plays)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PlayByPlayStoreSink:
+    # Mismo interfaz que PlayByPlayCsvSink pero escribe en el event store (un parquet por bloque).
+    # El primer bloque sustituye lo que hubiera guardado del partido.
+
+    def __init__(self, store, tournament_id, game, to_row=None):
+        self.store = store
+        self.tournament_id = tournament_id
+        self.game = game
+        self.to_row = to_row
+        self.rows = 0
+
+    @tracing.traced("export", name="export.store_write")
+    def write(self, plays):
+        if not plays:
+            return
+        rows = [self.to_row(play) for play in plays] if self.to_row else plays
+        if not self.rows:
+            self.store.clear_game(self.tournament_id, self.game)
+        self.store.append(self.tournament_id, self.game, rows)
+        self.rows += len(rows)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameIndexSink:
+    # Cuenta las filas limpias que se escriben y al cerrar da de alta el partido en el índice
+
+    def __init__(self, index, game_name, tournament_id=None, home=None, visitor=None, date=None, csv_path=None, store_partition=None):
+        self.index = index
+        self.gid = game_id(game_name)
+        self.tournament_id = tournament_id
+        self.home = home
+        self.visitor = visitor
+        self.date = date
+        self.csv_path = csv_path
+        self.store_partition = store_partition
+        self.rows = 0
+        self._last = None
+
+    def write(self, plays):
+        if plays:
+            self.rows += len(plays)
+            self._last = plays[-1]
+
+    def close(self, complete=True):
+        if self.index is None or not self.rows:
+            return
+        home, visitor = self.home, self.visitor
+        if not home or not visitor:
+            home, visitor = teams_from_game_id(self.gid) or (home, visitor)
+        self.index.record(
+            self.gid,
+            tournament=self.tournament_id,
+            home=home,
+            visitor=visitor,
+            date=self.date,
+            final_score=[self._last["score_home"], self._last["score_away"]],
+            rows=self.rows,
+            csv_path=self.csv_path,
+            store_partition=self.store_partition,
+            complete=complete,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # Si el scraping se cortó a mitad, el partido queda marcado como incompleto
+        self.close(complete=exc_type is None)
+
+
+class WarehouseSink:
+    # Mismo interfaz que los otros sinks: jugadas limpias a la tabla events del warehouse y, al
+    # cerrar, el partido a games. El primer bloque sustituye las jugadas que hubiera del partido.
+
+    def __init__(self, warehouse, game_name, tournament_id=None, home=None, visitor=None, to_row=None):
+        self.warehouse = warehouse
+        self.gid = game_id(game_name)
+        self.tournament_id = tournament_id
+        self.home = home
+        self.visitor = visitor
+        self.to_row = to_row
+        self.rows = 0
+        self._last = None
+
+    @tracing.traced("export", name="export.warehouse_write")
+    def write(self, plays):
+        if self.warehouse is None or not plays:
+            return
+        rows = [self.to_row(play) for play in plays] if self.to_row else plays
+        if not self.rows:
+            self.warehouse.clear_events(self.gid)
+        self.warehouse.append_events(self.gid, rows, first_seq=self.rows)
+        self.rows += len(rows)
+        self._last = rows[-1]
+
+    def close(self):
+        if self.warehouse is None or not self.rows:
+            return
+        home, visitor = self.home, self.visitor
+        if not home or not visitor:
+            home, visitor = teams_from_game_id(self.gid) or (home, visitor)
+        self.warehouse.upsert_game(
+            self.gid,
+            tournament_id=self.tournament_id,
+            home=home,
+            visitor=visitor,
+            score_home=self._last["score_home"],
+            score_away=self._last["score_away"],
+            rows=self.rows,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play_by_plays_raw_sink(game_name):
+    # Mismo formato que escribía pandas (BOM utf-8 y saltos de línea "\n")
+    path = f"./files/play_by_plays_raw/{_game_file_name(game_name)}"
+    return PlayByPlayCsvSink(path, RAW_PLAY_BY_PLAY_COLUMNS, encoding="utf-8-sig", lineterminator="\n")
+
+
+def play_by_plays_clean_sink(game_name):
+    path = f"./files/play_by_plays/{_game_file_name(game_name)}"
+    return PlayByPlayCsvSink(path, CLEAN_PLAY_BY_PLAY_COLUMNS, to_row=_clean_csv_row)
+
+
+def play_by_plays_store_sink(game_name, tournament_id=None, store=None):
+    # Partición del partido = nombre del CSV sin extensión (de ahí se sacan los equipos)
+    return PlayByPlayStoreSink(store or EventStore(), tournament_id, _game_file_name(game_name)[:-4], to_row=_clean_csv_row)
+
+
+@tracing.traced("export")
 def save_csv_play_by_plays_raw(game_name, game_plays):
     if not game_plays:
         print("⚠️ No hay jugadas para guardar.")
         return
 
-    df = pd.DataFrame(game_plays, columns=["local", "visitor", "period", "time", "player", "action", "side", "score_home", "score_away"])
+    with play_by_plays_raw_sink(game_name) as sink:
+        sink.write(game_plays)
+    print(f"✅ Archivo guardado: {_game_file_name(game_name)}")
 
-    file_name = game_name.replace(" ", "_").replace("/", "-") + ".csv"
-    path = f"./files/play_by_plays_raw/{file_name}"
+def game_index_sink(game_name, clean_sink, store_sink, index=None, tournament_id=None, home=None, visitor=None, date=None):
+    store_partition = os.path.relpath(store_sink.store.game_dir(tournament_id, store_sink.game), store_sink.store.root)
+    return GameIndexSink(index, game_name, tournament_id, home, visitor, date, csv_path=clean_sink.path, store_partition=store_partition)
+
+
+def warehouse_sink(game_name, warehouse=None, tournament_id=None, home=None, visitor=None):
+    return WarehouseSink(warehouse, game_name, tournament_id, home, visitor, to_row=_clean_csv_row)
 
-    df.to_csv(path, index=False, encoding="utf-8-sig")
-    print(f"✅ Archivo guardado: {file_name}")
 
-def save_csv_play_by_plays_clean(game_name, game_plays):
+@tracing.traced("export")
+def save_csv_play_by_plays_clean(game_name, game_plays, tournament_id=None, store=None, index=None, home=None, visitor=None, date=None,
+                                 warehouse=None):
     if not game_plays:
         print("⚠️ No hay jugadas limpias para guardar.")
         return
 
-    # Columnas base + 10 columnas para jugadores en pista
-    fieldnames = [
-        "period",
-        "time",
-        "player",
-        "action_code",
-        "side",
-        "score_home",
-        "score_away",
-    ] + [f"homeplayer{i}" for i in range(1, 6)] + [f"awayplayer{i}" for i in range(1, 6)]
-
-    file_name = game_name.replace(" ", "_").replace("/", "-") + ".csv"
-    path = f"./files/play_by_plays/{file_name}"
-
-    with open(path, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for play in game_plays:
-            home_players = sorted(play["players_on_court_home"])[:5]
-            away_players = sorted(play["players_on_court_away"])[:5]
-
-            row = {
-                "period": play["period"],
-                "time": play["time"],
-                "player": play["player"],
-                "action_code": play["action_code"],
-                "side": play["side"],
-                "score_home": play["score_home"],
-                "score_away": play["score_away"],
-            }
-
-            # Añadir jugadores de home y away, rellena vacíos si hay menos de 5
-            for i in range(5):
-                row[f"homeplayer{i+1}"] = home_players[i] if i < len(home_players) else ""
-                row[f"awayplayer{i+1}"] = away_players[i] if i < len(away_players) else ""
-
-            writer.writerow(row)
-
-    print(f"✅ Archivo CSV guardado en: {path}")
+    with play_by_plays_clean_sink(game_name) as sink, play_by_plays_store_sink(game_name, tournament_id, store) as store_sink, \
+            game_index_sink(game_name, sink, store_sink, index, tournament_id, home, visitor, date) as index_sink, \
+            warehouse_sink(game_name, warehouse, tournament_id, home, visitor) as db_sink:
+        sink.write(game_plays)
+        store_sink.write(game_plays)
+        index_sink.write(game_plays)
+        db_sink.write(game_plays)
+    print(f"✅ Archivo CSV guardado en: {sink.path}")
+
+@tracing.traced("export")
+def save_csv_play_by_plays_stream(game_name, periods, tournament_id=None, store=None, index=None, date=None, warehouse=None):
+    # Consume (cuarto, jugadas en bruto, jugadas limpias) y escribe ambos CSV (y el event store)
+    # cuarto a cuarto; en memoria solo hay un cuarto a la vez. Devuelve el número de filas limpias.
+    with play_by_plays_raw_sink(game_name) as raw_sink, play_by_plays_clean_sink(game_name) as clean_sink, \
+            play_by_plays_store_sink(game_name, tournament_id, store) as store_sink, \
+            game_index_sink(game_name, clean_sink, store_sink, index, tournament_id, date=date) as index_sink, \
+            warehouse_sink(game_name, warehouse, tournament_id) as db_sink:
+        for period, raw_plays, cleaned_plays in periods:
+            if raw_plays and index_sink.home is None:
+                index_sink.home, index_sink.visitor = raw_plays[0]["local"], raw_plays[0]["visitor"]
+                db_sink.home, db_sink.visitor = index_sink.home, index_sink.visitor
+            raw_sink.write(raw_plays)
+            clean_sink.write(cleaned_plays)
+            store_sink.write(cleaned_plays)
+            index_sink.write(cleaned_plays)
+            db_sink.write(cleaned_plays)
+            print(f"💾 {game_name} · {period}: {len(raw_plays)} jugadas, {len(cleaned_plays)} limpias")
+
+    if not raw_sink.rows:
+        print(f"⚠️ No hay jugadas para guardar en {game_name}.")
+    else:
+        print(f"✅ Archivos guardados: {_game_file_name(game_name)} ({raw_sink.rows} jugadas, {clean_sink.rows} limpias)")
+    return clean_sink.rows
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Índice persistente de partidos (files/games_index.json), escrito por las funciones de
+# export al guardar cada partido. Por id de partido (nombre del CSV sin extensión) guarda
+# torneo, local, visitante, fecha, marcador final, filas y dónde están sus datos, y mantiene
+# en memoria los partidos de cada equipo y torneo para seleccionarlos sin listar carpetas.
+
+GAME_INDEX_PATH = os.path.join(os.path.dirname(__file__), "files", "games_index.json")
+
+
+def game_id(game_name):
+    return game_name.replace(" ", "_").replace("/", "-")
+
+
+def tournament_game_name(tournament_id, game_name):
+    # "JTB24 game A vs B" → id "JTB24_game_A_vs_B" (teams_from_game_id sigue funcionando)
+    return f"{tournament_id} {game_name}"
+
+
+def teams_from_game_id(gid):
+    # Respaldo para partidos sin índice: "game_<equipo>_vs_<equipo>[.csv]"
+    try:
+        team1_raw = gid.split("game_")[1].split("_vs_")[0].replace("_", " ")
+        team2_raw = gid.split("_vs_")[1].replace(".csv", "").replace("_", " ")
+    except IndexError:
+        return None
+    return [team1_raw, team2_raw]
+
+
+class GameIndex:
+
+    def __init__(self, path=GAME_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self.games = self._load()
+        self._by_team = defaultdict(set)
+        self._by_tournament = defaultdict(set)
+        for gid, entry in self.games.items():
+            self._link(gid, entry)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Índice de partidos corrupto, se empieza de cero")
+            return {}
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.games, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def _link(self, gid, entry):
+        for team in (entry.get("home"), entry.get("visitor")):
+            if team:
+                self._by_team[team].add(gid)
+        self._by_tournament[entry.get("tournament")].add(gid)
+
+    def _unlink(self, gid, entry):
+        for team in (entry.get("home"), entry.get("visitor")):
+            self._by_team.get(team, set()).discard(gid)
+        self._by_tournament.get(entry.get("tournament"), set()).discard(gid)
+
+    def record(self, gid, save=True, **fields):
+        # Crea o actualiza la entrada del partido (solo los campos que se pasan)
+        with self._lock:
+            entry = self.games.get(gid, {})
+            self._unlink(gid, entry)
+            entry.update(fields)
+            entry["updated_at"] = time.time()
+            self.games[gid] = entry
+            self._link(gid, entry)
+            if save:
+                self.save()
+        return entry
+
+    def claim(self, game_name, tournament_id=None):
+        # Nombre con el que se exporta el partido. El id sale del cruce de equipos, que se puede
+        # repetir en otro torneo de la temporada: si el id ya es de un partido de otro torneo se
+        # usa "<torneo> <partido>" (CSV, índice, event store y warehouse van por ese id).
+        # El id queda reservado al momento para que dos hilos no se lo queden a la vez.
+        gid = game_id(game_name)
+        with self._lock:
+            entry = self.games.get(gid)
+            if entry is None:
+                self.record(gid, save=False, tournament=tournament_id, complete=False)
+                return game_name
+            if tournament_id is None or entry.get("tournament") in (None, tournament_id):
+                return game_name
+        return tournament_game_name(tournament_id, game_name)
+
+    def get(self, gid):
+        return self.games.get(gid)
+
+    def teams(self, gid):
+        entry = self.games.get(gid)
+        if not entry or not entry.get("home") or not entry.get("visitor"):
+            return None
+        return [entry["home"], entry["visitor"]]
+
+    def select(self, team=None, tournament=None):
+        # Ids de partido de un equipo y/o torneo (sin filtros: todos)
+        with self._lock:
+            selected = None
+            if team is not None:
+                selected = set(self._by_team.get(team, ()))
+            if tournament is not None:
+                in_tournament = self._by_tournament.get(tournament, set())
+                selected = set(in_tournament) if selected is None else selected & in_tournament
+            if selected is None:
+                selected = set(self.games)
+            return sorted(selected)
+
+    def backfill_from_csv(self, folder, tournament=None):
+        # Migración: da de alta los CSV limpios guardados antes de existir el índice
+        added = 0
+        with self._lock:
+            for gid in self.unindexed(folder):
+                teams = teams_from_game_id(gid)
+                if teams is None:
+                    print(f"⚠️ No se pueden deducir los equipos de {gid}.csv, no se indexa")
+                    continue
+                with open(os.path.join(folder, gid + ".csv"), encoding="utf-8") as f:
+                    rows = list(csv.DictReader(f))
+                self.record(
+                    gid,
+                    save=False,
+                    tournament=tournament,
+                    home=teams[0],
+                    visitor=teams[1],
+                    date=None,
+                    final_score=[rows[-1]["score_home"], rows[-1]["score_away"]] if rows else None,
+                    rows=len(rows),
+                    csv_path=os.path.join(folder, gid + ".csv"),
+                    complete=True,
+                )
+                added += 1
+            if added:
+                self.save()
+                print(f"🗂️ Índice de partidos: {added} partidos existentes añadidos")
+        return added
+
+    def unindexed(self, folder):
+        # Ids de los CSV limpios de la carpeta que aún no están en el índice
+        if not os.path.isdir(folder):
+            return []
+        with self._lock:
+            return sorted(
+                filename[:-4] for filename in os.listdir(folder)
+                if filename.endswith(".csv") and filename[:-4] not in self.games
+            )
+
+    def __len__(self):
+        return len(self.games)
+
+    def __contains__(self, gid):
+        return gid in self.games
+
+
+def select_games(folder, index=None, tournaments=None):
+    # Partidos a leer de la carpeta: los del índice para esos torneos; sin índice, todos los CSV.
+    # Si el índice no tiene ninguno de esos torneos (p. ej. solo partidos de otra temporada) se
+    # usan los CSV que aún no están indexados en vez de devolver una selección vacía.
+    if index is None or not len(index):
+        return sorted(filename[:-4] for filename in os.listdir(folder) if filename.endswith(".csv"))
+    if tournaments is None:
+        return index.select()
+    selected = sorted({gid for tournament in tournaments for gid in index.select(tournament=tournament)})
+    if not selected:
+        selected = index.unindexed(folder)
+        print(f"⚠️ Ningún partido de {', '.join(map(str, tournaments))} en el índice; se usan {len(selected)} CSV sin indexar")
+    return selected
@@ -0,0 +1,368 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import defaultdict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import json
+import os
+import re
+
+from config.urls import ANGT_GAME, LIVE_API_BASE, LIVE_API_HEADER, LIVE_API_BOX_SCORE, LIVE_API_PLAY_BY_PLAY
+
+# Backend de ingesta por HTTP: lee la API en vivo de la que se alimenta el game-center
+# y devuelve las mismas estructuras que scrap_box_scores / scrap_play_by_plays.
+
+API_QUARTERS = [
+    ("FirstQuarter", "1er Cuarto"),
+    ("SecondQuarter", "2º Cuarto"),
+    ("ThirdQuarter", "3er Cuarto"),
+    ("ForthQuarter", "4º Cuarto"),
+    ("ExtraTime", "Prórroga"),
+]
+
+# PLAYTYPE de la API -> texto que muestra la web (lo que entiende ACTION_CODES)
+API_PLAY_TYPES = {
+    "3FGA": "Missed Three Pointer",
+    "3FGM": "Three Pointer",
+    "2FGA": "Missed Two Pointer",
+    "2FGM": "Two Pointer",
+    "FTA": "Missed Free Throw",
+    "FTM": "Free Throw",
+    "RV": "Foul Drawn",
+    "CM": "Foul",
+    "CMU": "Foul",
+    "CMT": "Foul",
+    "CMTI": "Foul",
+    "OF": "Foul",
+    "TO": "Turnover",
+    "AS": "Assist",
+    "O": "Off Rebound",
+    "D": "Def Rebound",
+    "AG": "Shot Rejected",
+    "FV": "Block",
+    "ST": "Steal",
+    "TOUT": "Time Out",
+    "TOUT_TV": "TV Time Out",
+    "IN": "In",
+    "OUT": "Out",
+}
+
+# Marcas de inicio/fin de periodo que la web no muestra como jugada
+API_SKIPPED_PLAY_TYPES = {"BP", "EP", "EG", "JB"}
+
+
+def parse_game_url(game_url):
+    # .../{tournament}/{game_code}/ -> (tournament, game_code)
+    parts = [p for p in urlsplit(game_url).path.split("/") if p]
+    return parts[-2], int(parts[-1])
+
+
+def _fixture_name(url):
+    parts = urlsplit(url)
+    key = parts.path + ("?" + "&".join(sorted(parts.query.split("&"))) if parts.query else "")
+    return re.sub(r"[^A-Za-z0-9]+", "_", key).strip("_") + ".json"
+
+
+class HttpBackend:
+
+    def __init__(self, base_url=LIVE_API_BASE, pool_size=8, timeout=10, retries=3, record_dir=None, cache=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.record_dir = record_dir
+        self.cache = cache
+
+        retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "application/json"
+
+    def get_json(self, path, tournament_id=None):
+        url = self.base_url + path
+        headers = {}
+        entry = None
+
+        if self.cache is not None:
+            body = self.cache.get(url, tournament_id)
+            if body is not None:
+                return json.loads(body)
+            if self.cache.offline:
+                print(f"⚠️ Sin copia en caché (offline): {url}")
+                return None
+
+            # Copia caducada: revalidamos con el servidor en lugar de descargar de nuevo
+            entry = self.cache.lookup(url, tournament_id)
+            if entry and entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry:
+            body = self.cache.get_stale(url, tournament_id)
+            if body is not None:
+                self.cache.refresh(url, tournament_id)
+                return json.loads(body)
+            response = self.session.get(url, timeout=self.timeout)
+
+        if response.status_code == 404 or not response.content.strip():
+            return None
+        response.raise_for_status()
+
+        if self.cache is not None:
+            self.cache.put(
+                url,
+                response.content,
+                tournament_id=tournament_id,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, _fixture_name(url)), "wb") as f:
+                f.write(response.content)
+        return response.json()
+
+    def pin(self, path, tournament_id=None):
+        if self.cache is not None:
+            self.cache.pin(self.base_url + path, tournament_id)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+_default_backend = None
+
+
+def get_backend():
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = HttpBackend()
+    return _default_backend
+
+
+def fetch_games_urls(tournament_id, backend=None, max_missing=3):
+    # Recorre los códigos de partido hasta encontrar varios huecos seguidos
+    backend = backend or get_backend()
+    results = []
+    game_code, missing = 1, 0
+
+    while missing < max_missing:
+        header = backend.get_json(LIVE_API_HEADER.format(game_code=game_code, season_code=tournament_id), tournament_id)
+        if not header or not header.get("TeamA"):
+            missing += 1
+        else:
+            missing = 0
+            title = f"game_{header['TeamA'].strip()}_vs_{header['TeamB'].strip()}"
+            href = ANGT_GAME.format(tournament=tournament_id, game_code=game_code)
+            results.append((title, href))
+            print((title, href))
+        game_code += 1
+
+    print(f"Encontrados {len(results)} partidos en {tournament_id}.")
+    return results
+
+
+def fetch_play_by_plays(game_url, backend=None):
+    backend = backend or get_backend()
+    tournament_id, game_code = parse_game_url(game_url)
+    path = LIVE_API_PLAY_BY_PLAY.format(game_code=game_code, season_code=tournament_id)
+    data = backend.get_json(path, tournament_id)
+    if not data:
+        print(f"❌ Sin jugada a jugada para {game_url}")
+        return []
+    if data.get("Live") is False:
+        backend.pin(path, tournament_id)
+
+    home = (data.get("TeamA") or "home").strip()
+    visitor = (data.get("TeamB") or "visitor").strip()
+    home_code = (data.get("CodeTeamA") or "").strip()
+
+    plays = []
+    for quarter_key, period in API_QUARTERS:
+        # La web lista las jugadas de la más reciente a la más antigua
+        for item in reversed(data.get(quarter_key) or []):
+            play_type = (item.get("PLAYTYPE") or "").strip()
+            if play_type in API_SKIPPED_PLAY_TYPES:
+                continue
+
+            team_code = (item.get("CODETEAM") or "").strip()
+            player = (item.get("PLAYER") or "").strip() or None
+            points_a, points_b = item.get("POINTS_A"), item.get("POINTS_B")
+
+            plays.append({
+                "local": home,
+                "visitor": visitor,
+                "period": period,
+                "time": (item.get("MARKERTIME") or "").strip() or None,
+                "player": player,
+                "action": API_PLAY_TYPES.get(play_type, (item.get("PLAYINFO") or "").strip()),
+                "side": (home if team_code == home_code else visitor) if team_code else None,
+                "score_home": "" if points_a is None else str(points_a),
+                "score_away": "" if points_b is None else str(points_b),
+            })
+    return plays
+
+
+def _minutes_to_seconds(value):
+    try:
+        minutes, seconds = str(value).split(":")
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+def _api_player_name(name):
+    # "DRAGICEVIC, STRAHINJA" -> "STRAHINJA DRAGICEVIC" como en la página de estadísticas
+    if "," in name:
+        surname, first = name.split(",", 1)
+        return f"{first.strip()} {surname.strip()}"
+    return name.strip()
+
+
+_BOX_FIELDS = [
+    "Points", "FieldGoalsMade2", "FieldGoalsAttempted2", "FieldGoalsMade3", "FieldGoalsAttempted3",
+    "FreeThrowsMade", "FreeThrowsAttempted", "OffensiveRebounds", "DefensiveRebounds", "TotalRebounds",
+    "Assistances", "Steals", "Turnovers", "BlocksFavour", "BlocksAgainst", "FoulsCommited",
+    "FoulsReceived", "Valuation",
+]
+
+
+def _stats_list(dorsal, totals):
+    # Mismo orden que la tabla de la web:
+    # ['#', 'GP', 'GS', 'Min', 'PTS', '2PM/A', '3PM/A', 'FTM/A', 'OR', 'DR', 'TR', 'AST', 'STL', 'TO', 'BLK', 'BLKA', 'FC', 'FD', 'PIR']
+    seconds = totals["seconds"]
+    return [
+        str(dorsal),
+        str(totals["GP"]),
+        str(totals["GS"]),
+        f"{seconds // 60}:{seconds % 60:02d}",
+        str(totals["Points"]),
+        f"{totals['FieldGoalsMade2']}/{totals['FieldGoalsAttempted2']}",
+        f"{totals['FieldGoalsMade3']}/{totals['FieldGoalsAttempted3']}",
+        f"{totals['FreeThrowsMade']}/{totals['FreeThrowsAttempted']}",
+        str(totals["OffensiveRebounds"]),
+        str(totals["DefensiveRebounds"]),
+        str(totals["TotalRebounds"]),
+        str(totals["Assistances"]),
+        str(totals["Steals"]),
+        str(totals["Turnovers"]),
+        str(totals["BlocksFavour"]),
+        str(totals["BlocksAgainst"]),
+        str(totals["FoulsCommited"]),
+        str(totals["FoulsReceived"]),
+        str(totals["Valuation"]),
+    ]
+
+
+def _accumulate(totals, line, starter=False):
+    seconds = _minutes_to_seconds(line.get("Minutes"))
+    if seconds is None:
+        return
+    totals["GP"] += 1
+    totals["GS"] += 1 if starter else 0
+    totals["seconds"] += seconds
+    for field in _BOX_FIELDS:
+        totals[field] += int(line.get(field) or 0)
+
+
+def fetch_box_scores(tournament_id, teams=None, backend=None, games_urls=None):
+    # Acumula los box scores de cada partido igual que la vista "accumulated" de la web
+    backend = backend or get_backend()
+    games_urls = games_urls if games_urls is not None else fetch_games_urls(tournament_id, backend=backend)
+    teams = set(teams) if teams else None
+
+    players = defaultdict(lambda: defaultdict(int))
+    dorsals = {}
+    team_totals = defaultdict(lambda: defaultdict(int))
+
+    for _, game_url in games_urls:
+        season_code, game_code = parse_game_url(game_url)
+        path = LIVE_API_BOX_SCORE.format(game_code=game_code, season_code=season_code)
+        data = backend.get_json(path, season_code)
+        if not data:
+            continue
+        if data.get("Live") is False:
+            backend.pin(path, season_code)
+
+        for team in data.get("Stats") or []:
+            team_name = (team.get("Team") or "").strip()
+            if teams and team_name not in teams:
+                continue
+            for line in team.get("PlayersStats") or []:
+                key = (team_name, _api_player_name(line.get("Player") or ""))
+                dorsals[key] = line.get("Dorsal") or ""
+                _accumulate(players[key], line, starter=bool(line.get("IsStarter")))
+            if team.get("totr"):
+                _accumulate(team_totals[team_name], team["totr"])
+
+    players_all_stats = [
+        {"team_name": team_name, "player_name": player_name, "stats": _stats_list(dorsals[(team_name, player_name)], totals)}
+        for (team_name, player_name), totals in players.items()
+        if totals["GP"]
+    ]
+    team_all_stats = [
+        {"team_name": team_name, "player_name": "TOTALS", "stats": _stats_list("", totals)}
+        for team_name, totals in team_totals.items()
+    ]
+    return players_all_stats, team_all_stats
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = os.path.join(self.server.fixtures_dir, _fixture_name(self.path))
+        if not os.path.exists(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    # Servidor local que sirve respuestas grabadas con HttpBackend(record_dir=...) para trabajar sin red
+    #
+    #   with ReplayServer("files/fixtures/live_api") as server:
+    #       backend = HttpBackend(base_url=server.base_url)
+
+    def __init__(self, fixtures_dir, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.httpd.fixtures_dir = fixtures_dir
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}" + urlsplit(LIVE_API_BASE).path
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+
+def record_fixture(fixtures_dir, path, data):
+    # Guarda una respuesta a mano (p. ej. para preparar casos sin conexión)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(os.path.join(fixtures_dir, _fixture_name(LIVE_API_BASE + path)), "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
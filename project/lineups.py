@@ -0,0 +1,196 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from possessions import encode_plays
+
+# Quintetos y on/off a partir del jugada a jugada limpio.
+#
+# Primero se construye un índice de stints (tramos en los que un equipo mantiene el mismo
+# quinteto dentro de un periodo) con su marcador parcial y sus posesiones. Cada jugador
+# tiene un hash de 64 bits y la clave de un grupo de jugadores es la suma de sus hashes, así
+# que no depende del orden y sirve igual para quintetos, parejas y tríos. Las estadísticas
+# salen de group-bys sobre esas claves: cada stint aporta C(5, k) combinaciones (10 parejas,
+# 10 tríos), nunca todas las combinaciones posibles de la plantilla.
+
+LINEUP_PLAYERS = [f"player{i}" for i in range(1, 6)]
+
+STINT_COLUMNS = [
+    "game", "period", "team", "opponent", "lineup_key", "lineup", *LINEUP_PLAYERS,
+    "start_time", "end_time", "seconds", "plays", "points_for", "points_against", "plus_minus",
+    "off_poss", "def_poss",
+]
+
+TOTAL_COLUMNS = ["seconds", "points_for", "points_against", "plus_minus", "off_poss", "def_poss"]
+
+COMBO_SIZES = {"pairs": 2, "trios": 3}
+
+
+def player_hashes(players):
+    # Hash estable por nombre (el mismo en todas las ejecuciones); la última posición es el
+    # hueco (código -1), que no suma nada a la clave
+    hashes = pd.util.hash_array(np.asarray(players, dtype=object).astype(str))
+    return np.append(hashes, np.uint64(0))
+
+
+def group_keys(codes, hashes):
+    # codes: matriz (filas, jugadores) de códigos → clave de 64 bits por fila
+    return hashes[codes].sum(axis=1, dtype=np.uint64).view(np.int64)
+
+
+def _group_names(keys, codes, players, sep="|"):
+    # Nombre "A|B|C" calculado una sola vez por clave distinta
+    unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    names = np.array([sep.join(sorted(players[c] for c in codes[i] if c >= 0)) for i in first], dtype=object)
+    return names[inverse]
+
+
+def _side_stints(plays, lineup_codes, team, opponent, points_for, points_against, hashes):
+    segment = plays["segment"]
+    keys = group_keys(lineup_codes, hashes)
+
+    # Un stint nuevo al cambiar el quinteto o el periodo
+    new_stint = np.r_[True, (segment[1:] != segment[:-1]) | (keys[1:] != keys[:-1])]
+    stint = np.cumsum(new_stint) - 1
+    starts = np.flatnonzero(new_stint)
+
+    new_possession = plays["new_possession"]
+    offense = plays["offense"]
+    frame = pd.DataFrame({
+        "stint": stint,
+        "seconds": plays["seconds"],
+        "points_for": points_for,
+        "points_against": points_against,
+        "off_poss": new_possession & (offense == team),
+        "def_poss": new_possession & (offense == opponent),
+    })
+    grouped = frame.groupby("stint", sort=True)
+    totals = grouped[["points_for", "points_against", "off_poss", "def_poss"]].sum()
+    clock = grouped["seconds"].agg(["first", "size"])
+
+    # El stint termina cuando empieza el siguiente del mismo periodo (o al final del periodo, 0:00)
+    start_seconds = clock["first"].to_numpy()
+    stint_segment = segment[starts]
+    same_period = np.r_[stint_segment[1:] == stint_segment[:-1], False]
+    end_seconds = np.where(same_period, np.r_[start_seconds[1:], np.nan], 0.0)
+    ends = np.r_[starts[1:] - 1, len(stint) - 1]
+
+    df = plays["df"]
+    players = plays["players"]
+    game = plays["game"][starts]
+    teams = plays["teams"]
+    lineups = lineup_codes[starts]
+    result = pd.DataFrame({
+        "game": plays["games"][game],
+        "period": plays["periods"][plays["period"][starts]],
+        "team": np.where(team[starts] >= 0, teams[team[starts]], None),
+        "opponent": np.where(opponent[starts] >= 0, teams[opponent[starts]], None),
+        "lineup_key": keys[starts],
+        "lineup": _group_names(keys[starts], lineups, players),
+    })
+    sorted_players = np.sort(np.where(lineups >= 0, players[lineups].astype(str), "~"), axis=1)
+    for i, column in enumerate(LINEUP_PLAYERS):
+        result[column] = np.where(sorted_players[:, i] == "~", None, sorted_players[:, i])
+    result["start_time"] = df["time"].to_numpy(dtype=object)[starts]
+    result["end_time"] = df["time"].to_numpy(dtype=object)[ends]
+    result["seconds"] = start_seconds - end_seconds
+    result["plays"] = clock["size"].to_numpy()
+    result["points_for"] = totals["points_for"].to_numpy().astype(int)
+    result["points_against"] = totals["points_against"].to_numpy().astype(int)
+    result["plus_minus"] = result["points_for"] - result["points_against"]
+    result["off_poss"] = totals["off_poss"].to_numpy().astype(int)
+    result["def_poss"] = totals["def_poss"].to_numpy().astype(int)
+    return result
+
+
+def build_stint_index(df):
+    # df: jugadas limpias de la temporada (load_season_plays) → una fila por stint y equipo
+    if df is None or df.empty:
+        return pd.DataFrame(columns=STINT_COLUMNS)
+
+    plays = encode_plays(df)
+    hashes = player_hashes(plays["players"])
+    game = plays["game"]
+    home, away = plays["home"][game], plays["away"][game]
+
+    stints = pd.concat([
+        _side_stints(plays, plays["home_players"], home, away, plays["home_points"], plays["away_points"], hashes),
+        _side_stints(plays, plays["away_players"], away, home, plays["away_points"], plays["home_points"], hashes),
+    ], ignore_index=True)
+    stints = stints[stints["team"].notna()]
+    return stints.sort_values(["game", "period", "team"], kind="stable").reset_index(drop=True)[STINT_COLUMNS]
+
+
+def _ratings(df):
+    # Puntos por 100 posesiones a favor, en contra y neto
+    df["ORtg"] = 100 * df["points_for"] / df["off_poss"].where(df["off_poss"] > 0)
+    df["DRtg"] = 100 * df["points_against"] / df["def_poss"].where(df["def_poss"] > 0)
+    df["NetRtg"] = df["ORtg"] - df["DRtg"]
+    df["minutes"] = df["seconds"] / 60
+    return df
+
+
+def lineup_stats(stints, min_seconds=0):
+    # Quintetos: net rating por clave de quinteto
+    grouped = stints.groupby(["team", "lineup_key"], sort=False)
+    result = grouped[TOTAL_COLUMNS].sum()
+    result["lineup"] = grouped["lineup"].first()
+    result["stints"] = grouped.size()
+    result["games"] = grouped["game"].nunique()
+    result = _ratings(result.reset_index())
+    result = result[result["seconds"] >= min_seconds]
+    return result.sort_values(["team", "seconds"], ascending=[True, False]).reset_index(drop=True)
+
+
+def combo_stats(stints, size, min_seconds=0):
+    # Parejas (size=2) o tríos (size=3) dentro de cada stint, agregados por clave de grupo
+    player_codes, players = pd.factorize(pd.concat([stints[c] for c in LINEUP_PLAYERS], ignore_index=True))
+    player_codes = player_codes.reshape(len(LINEUP_PLAYERS), len(stints)).T
+    players = np.asarray(players, dtype=object)
+    hashes = player_hashes(players)
+
+    index = np.array(list(combinations(range(len(LINEUP_PLAYERS)), size)))
+    # (stints × combinaciones, size): cada stint repetido C(5, size) veces
+    codes = player_codes[:, index].reshape(-1, size)
+    rows = np.repeat(np.arange(len(stints)), len(index))
+    complete = (codes >= 0).all(axis=1)
+    codes, rows = codes[complete], rows[complete]
+
+    keys = group_keys(codes, hashes)
+    combos = stints[["team"] + TOTAL_COLUMNS].iloc[rows].reset_index(drop=True)
+    combos["combo_key"] = keys
+    combos["game"] = stints["game"].to_numpy()[rows]
+    combos["players"] = _group_names(keys, codes, players)
+
+    grouped = combos.groupby(["team", "combo_key"], sort=False)
+    result = grouped[TOTAL_COLUMNS].sum()
+    result["players"] = grouped["players"].first()
+    result["games"] = grouped["game"].nunique()
+    result = _ratings(result.reset_index())
+    result = result[result["seconds"] >= min_seconds]
+    return result.sort_values(["team", "seconds"], ascending=[True, False]).reset_index(drop=True)
+
+
+def on_off_stats(stints):
+    # Con cada jugador en pista (on) y el resto del tiempo de su equipo (off)
+    on = pd.concat(
+        [stints[["team", column] + TOTAL_COLUMNS].rename(columns={column: "player"}) for column in LINEUP_PLAYERS],
+        ignore_index=True,
+    )
+    on = on[on["player"].notna()].groupby(["team", "player"], sort=False)[TOTAL_COLUMNS].sum()
+    team = stints.groupby("team")[TOTAL_COLUMNS].sum()
+    off = team.reindex(on.index.get_level_values("team")).set_axis(on.index) - on
+
+    result = _ratings(on.copy()).join(_ratings(off.copy()), lsuffix="_on", rsuffix="_off")
+    result["NetRtg_diff"] = result["NetRtg_on"] - result["NetRtg_off"]
+    return result.reset_index().sort_values(["team", "seconds_on"], ascending=[True, False]).reset_index(drop=True)
+
+
+def lineup_report(stints, min_seconds=0):
+    # Todas las tablas de quintetos a partir del índice de stints
+    report = {"stints": stints, "lineups": lineup_stats(stints, min_seconds=min_seconds)}
+    for name, size in COMBO_SIZES.items():
+        report[name] = combo_stats(stints, size, min_seconds=min_seconds)
+    report["on_off"] = on_off_stats(stints)
+    return report
@@ -1,58 +1,306 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
 from config.utils import TOURNAMENT_IDENTIFIERS
+from dag import Pipeline
+from drivers import DriverPool
+from event_store import EventStore
+from game_index import GameIndex
+from page_cache import PageCache
+from player_model import PlayerEmbeddingModel
+from render_cache import RenderCache
+from warehouse import Warehouse
 import export
 import scrap
 import team_stats
 import player_stats
+import possessions
+import lineups
+import density
+import rendering
+import reports
+import season
+import sync
+import tracing
+import waits
 
-def main():
+def main(workers=4, offline=False, incremental=False, stream=False, all_teams=False, render_profile=None, kde="exact",
+         refit_embedding=False, season_keys=None, dry_run=False, force=()):
 
     tournament = TOURNAMENT_IDENTIFIERS["ANGT_2025_BELGRADE"]
 
+    # Caché de páginas: los partidos finalizados no se vuelven a descargar
+    cache = PageCache(offline=offline)
+
+    # Jugada a jugada limpio en formato columnar (además de los CSV por partido)
+    store = EventStore()
+
+    # Índice de partidos (torneo, equipos, marcador...) que rellenan las funciones de export
+    index = GameIndex()
+
+    # Warehouse SQLite (equipos, jugadores, partidos, jugadas y box scores) que rellena export
+    warehouse = Warehouse(default_tournament=tournament)
+
+    ## TEMPORADA (varios torneos en una sola cola de trabajos)
+
+    if season_keys is not None:
+        # Los CSV limpios de antes del índice son de este torneo: se reservan sus ids antes de
+        # que otro torneo de la temporada con el mismo cruce los pise
+        index.backfill_from_csv("./files/play_by_plays", tournament)
+        with DriverPool(size=workers, max_pages=50) as pool:
+            season.refresh_season(season_keys or None, pool, cache=cache, store=store, index=index, workers=workers,
+                                  warehouse=warehouse)
+        waits.wait_report()
+        cache.report()
+        warehouse.report()
+        return
+
+    # Etapas del pipeline con sus entradas y salidas: solo se ejecutan las desactualizadas
+    # (files/cache/pipeline.json) y las independientes (informes de equipo y jugadores) a la vez
+    pipeline = Pipeline()
+
+    # Navegadores calientes compartidos por todas las etapas de scraping (se abren al usarlos)
+    pool = DriverPool(size=workers, max_pages=50)
+
+    ## SINCRONIZACIÓN INCREMENTAL (solo partidos nuevos o modificados)
+
+    def sync_stage():
+        sync.sync_tournament(tournament, pool, cache=cache, workers=workers, store=store, index=index,
+                             warehouse=warehouse)
+
     ## BOX SCORE SRAPING
 
-    teams_urls = scrap.scrap_urls_teams(tournament)
-    players_box_scores, team_box_scores = scrap.scrap_box_scores(teams_urls)
-    export.save_csv_players_total_box_score(players_box_scores)
-    export.save_csv_team_total_box_score(team_box_scores)
+    def box_scores_stage():
+        with pool.driver() as driver:
+            teams_urls = scrap.scrap_urls_teams(tournament, driver=driver)
+        with pool.driver() as driver:
+            players_box_scores, team_box_scores = scrap.scrap_box_scores(teams_urls, driver=driver)
+        export.save_csv_players_total_box_score(players_box_scores, warehouse=warehouse)
+        export.save_csv_team_total_box_score(team_box_scores, warehouse=warehouse)
 
     ## PLAY BY PLAY SCRAPING
-    
-    games_urls = scrap.scrap_urls_games(tournament)
-    for game_name, game_url in games_urls:
-        play_by_plays = scrap.scrap_play_by_plays(game_url=game_url)
-        export.save_csv_play_by_plays_raw(game_name= game_name, game_plays=play_by_plays)
-        
-        print("----")
-
-        cleaned_play_by_plays = scrap.clean_play_by_plays(play_by_plays)
-        export.save_csv_play_by_plays_clean(game_name=game_name,game_plays=cleaned_play_by_plays)
-    
+
+    def play_by_plays_stage():
+        if offline:
+            games_urls = scrap.scrap_urls_games(tournament, cache=cache)
+        else:
+            with pool.driver() as driver:
+                games_urls = scrap.scrap_urls_games(tournament, driver=driver, cache=cache)
+
+        if stream:
+            # Cada cuarto se limpia y se escribe en cuanto se lee: memoria acotada a un cuarto
+            def stream_game(game):
+                game_name, game_url = game
+                game_name = index.claim(game_name, tournament)
+                if scrap.play_by_plays_cached(game_url, cache):
+                    periods = scrap.stream_play_by_plays(game_url, cache=cache)
+                    return export.save_csv_play_by_plays_stream(game_name, periods, tournament_id=tournament, store=store, index=index,
+                                                                warehouse=warehouse)
+                with pool.driver() as driver:
+                    periods = scrap.stream_play_by_plays(game_url, driver=driver, cache=cache)
+                    return export.save_csv_play_by_plays_stream(game_name, periods, tournament_id=tournament, store=store, index=index,
+                                                                warehouse=warehouse)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(stream_game, games_urls))
+        else:
+            games_play_by_plays, _ = scrap.scrap_play_by_plays_parallel(games_urls, pool, workers=workers, cache=cache)
+            for game_name, play_by_plays in games_play_by_plays:
+                # El mismo cruce puede estar ya guardado para otro torneo (ejecuciones --season)
+                game_name = index.claim(game_name, tournament)
+                export.save_csv_play_by_plays_raw(game_name= game_name, game_plays=play_by_plays)
+
+                print("----")
+
+                cleaned_play_by_plays = scrap.clean_play_by_plays(play_by_plays)
+                home, visitor = (play_by_plays[0]["local"], play_by_plays[0]["visitor"]) if play_by_plays else (None, None)
+                export.save_csv_play_by_plays_clean(
+                    game_name=game_name,
+                    game_plays=cleaned_play_by_plays,
+                    tournament_id=tournament,
+                    store=store,
+                    index=index,
+                    home=home,
+                    visitor=visitor,
+                    warehouse=warehouse,
+                )
+
+    play_by_play_outputs = ["files/play_by_plays", "files/play_by_plays_raw"]
+    box_score_outputs = ["files/players_total_box_score.csv", "files/team_total_box_score.csv"]
+
+    if incremental and not offline:
+        # En modo incremental el CSV defensivo se actualiza desde el manifiesto
+        pipeline.add("sync", sync_stage, outputs=box_score_outputs + ["files/team_total_box_scores_defensive.csv"]
+                     + play_by_play_outputs, volatile=True)
+    else:
+        if offline:
+            print("📴 Modo offline: se reutilizan los box scores ya exportados")
+        else:
+            pipeline.add("box_scores", box_scores_stage, outputs=box_score_outputs, volatile=True)
+        # Sin conexión el jugada a jugada sale de la caché de páginas: solo cambia si cambia la caché
+        pipeline.add(
+            "play_by_plays", play_by_plays_stage,
+            inputs=["files/cache/blobs", scrap.__file__, export.__file__] if offline else [],
+            outputs=play_by_play_outputs,
+            params={"tournament": tournament, "stream": stream},
+            volatile=not offline,
+        )
 
     ## BOX SCORE AGAINST ME
-    
-    team_box_scores_defensive = team_stats.get_team_defensive_stats_from_play_by_plays(
-        play_by_play_folder="files/play_by_plays",
-        team_list_csv="files/team_total_box_score.csv"
+
+    # Los CSV limpios guardados antes de existir el índice se dan de alta en este torneo
+    # (aunque el índice ya tenga partidos de otros torneos, p. ej. tras una ejecución --season)
+    def index_legacy_games():
+        index.backfill_from_csv("./files/play_by_plays", tournament)
+
+    def defensive_stage():
+        index_legacy_games()
+        team_box_scores_defensive = team_stats.get_team_defensive_stats_from_play_by_plays(
+            play_by_play_folder="files/play_by_plays",
+            team_list_csv="files/team_total_box_score.csv",
+            store=store,
+            tournaments=[tournament],
+            index=index,
+        )
+        export.save_csv_team_defensive_box_score(team_box_scores_defensive, warehouse=warehouse)
+
+    if not incremental or offline:
+        pipeline.add(
+            "defensive", defensive_stage,
+            inputs=["files/play_by_plays", "files/team_total_box_score.csv", team_stats.__file__],
+            outputs=["files/team_total_box_scores_defensive.csv"],
+            params={"tournament": tournament},
+        )
+
+    ## POSSESSIONS
+
+    def load_season_plays():
+        index_legacy_games()
+        with tracing.stage("possessions.load_season_plays", "possessions"):
+            return possessions.load_season_plays("./files/play_by_plays", store=store, index=index, tournaments=[tournament])
+
+    # Posesiones reales (una fila por posesión) a partir del jugada a jugada limpio
+    def possessions_stage():
+        season_plays = load_season_plays()
+        with tracing.stage("possessions.segment_possessions", "possessions"):
+            df_possessions = possessions.segment_possessions(season_plays)
+        export.save_csv_possessions(df_possessions)
+
+    pipeline.add(
+        "possessions", possessions_stage,
+        inputs=["files/play_by_plays", possessions.__file__],
+        outputs=["files/possessions.csv"],
+        params={"tournament": tournament},
     )
-    export.save_csv_team_defensive_box_score(team_box_scores_defensive)
-    
+
+    ## LINEUPS
+
+    # Índice de stints (quinteto en pista) → quintetos, parejas, tríos y on/off
+    def lineups_stage():
+        season_plays = load_season_plays()
+        with tracing.stage("lineups.lineup_report", "lineups"):
+            lineup_tables = lineups.lineup_report(lineups.build_stint_index(season_plays))
+        export.save_csv_lineups(lineup_tables)
+
+    pipeline.add(
+        "lineups", lineups_stage,
+        inputs=["files/play_by_plays", possessions.__file__, lineups.__file__],
+        outputs=["files/lineups"],
+        params={"tournament": tournament},
+    )
+
 
     # REPORT GENERATING
 
+    # Solo se redibujan los gráficos cuyos datos cambiaron desde la última ejecución
+    render_cache = RenderCache()
+
+    # Embedding de jugadores guardado: los jugadores nuevos se asignan sin reajustar KMeans/PCA
+    embedding_model = PlayerEmbeddingModel()
+
     team_name = "U18 EA7 Emporio Armani Milan"
+    report_code = [rendering.__file__]
 
-    team_stats.scout_team(
-        team_name=team_name,
-        offensive_csv_path="files/team_total_box_score.csv",
-        defensive_csv_path="files/team_total_box_scores_defensive.csv"
-    )
-    
-    player_stats.scout_team(
-        team_name=team_name,
-        offensive_csv_path="files/team_total_box_score.csv",
-        defensive_csv_path="files/team_total_box_scores_defensive.csv",
-        players_csv_path="files/players_total_box_score.csv"
-    )
+    # Los informes de equipo y de jugadores se dibujan a la vez: cada uno con la mitad de procesos
+    report_workers = max(1, workers // 2)
+
+    def reports_stage():
+        # Un informe por equipo del torneo: tablas de la liga y embedding calculados una vez
+        return reports.scout_teams(
+            offensive_csv_path="files/team_total_box_score.csv",
+            defensive_csv_path="files/team_total_box_scores_defensive.csv",
+            players_csv_path="files/players_total_box_score.csv",
+            possessions_csv_path="files/possessions.csv",
+            workers=workers,
+            profile=render_profile,
+            cache=render_cache,
+            kde=kde,
+            model=embedding_model,
+            refit=refit_embedding,
+            warehouse=warehouse,
+        )
+
+    def team_report_stage():
+        return team_stats.scout_team(
+            team_name=team_name,
+            offensive_csv_path="files/team_total_box_score.csv",
+            defensive_csv_path="files/team_total_box_scores_defensive.csv",
+            possessions_csv_path="files/possessions.csv",
+            workers=report_workers,
+            profile=render_profile,
+            cache=render_cache,
+            warehouse=warehouse,
+        )
+
+    def player_report_stage():
+        return player_stats.scout_team(
+            team_name=team_name,
+            offensive_csv_path="files/team_total_box_score.csv",
+            defensive_csv_path="files/team_total_box_scores_defensive.csv",
+            players_csv_path="files/players_total_box_score.csv",
+            workers=report_workers,
+            profile=render_profile,
+            cache=render_cache,
+            kde=kde,
+            model=embedding_model,
+            refit=refit_embedding,
+            warehouse=warehouse,
+        )
+
+    if all_teams:
+        pipeline.add(
+            "reports", reports_stage,
+            inputs=box_score_outputs + ["files/team_total_box_scores_defensive.csv", "files/possessions.csv",
+                                        reports.__file__, team_stats.__file__, player_stats.__file__] + report_code,
+            params={"profile": render_profile, "kde": kde},
+        )
+    else:
+        pipeline.add(
+            "team_report", team_report_stage,
+            inputs=["files/team_total_box_score.csv", "files/team_total_box_scores_defensive.csv",
+                    "files/possessions.csv", team_stats.__file__] + report_code,
+            params={"team": team_name, "profile": render_profile},
+        )
+        pipeline.add(
+            "player_report", player_report_stage,
+            inputs=["files/players_total_box_score.csv", player_stats.__file__] + report_code,
+            params={"team": team_name, "profile": render_profile, "kde": kde},
+        )
+
+    # --refit-embedding obliga a rehacer los informes de jugadores aunque estén al día
+    if refit_embedding and force is not True:
+        force = set(force) | {"reports" if all_teams else "player_report"}
+
+    with pool:
+        pipeline.run(workers=workers, force=force, dry_run=dry_run)
+
+    if dry_run:
+        return
+
+    waits.wait_report()
+    cache.report()
+    render_cache.report()
+    warehouse.report()
 
 
     ## TESTING
@@ -67,4 +315,41 @@ def main():
     #export.save_csv_play_by_plays_clean(game_name="game_U18_Maccabi_Tel_Aviv_vs_U18_Crvena_Zvezda_Belgrade",game_plays=cleaned_play_by_plays)
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4, help="navegadores en paralelo")
+    parser.add_argument("--offline", action="store_true", help="reproducir solo desde la caché de páginas")
+    parser.add_argument("--incremental", action="store_true", help="ingerir solo partidos nuevos o modificados")
+    parser.add_argument("--stream", action="store_true", help="limpiar y guardar el jugada a jugada cuarto a cuarto")
+    parser.add_argument("--all-teams", action="store_true", help="generar los informes de todos los equipos del torneo")
+    parser.add_argument("--render-profile", choices=sorted(rendering.RENDER_PROFILES), help="formato y dpi de los gráficos (preview / print)")
+    parser.add_argument("--kde", choices=density.KDE_METHODS, default="exact", help="densidad de los contornos de clusters")
+    parser.add_argument("--refit-embedding", action="store_true", help="reajustar el embedding de jugadores aunque no haya deriva")
+    parser.add_argument("--season", nargs="*", choices=sorted(TOURNAMENT_IDENTIFIERS), metavar="TORNEO",
+                        help="ingerir varios torneos en una sola ejecución (sin torneos = todos)")
+    parser.add_argument("--dry-run", action="store_true", help="mostrar qué etapas se ejecutarían sin ejecutarlas")
+    parser.add_argument("--force", nargs="*", metavar="ETAPA",
+                        help="ejecutar estas etapas aunque estén al día (sin etapas = todas)")
+    parser.add_argument("--trace", metavar="RUTA", help="fichero del trace (por defecto files/traces/run-<fecha>.json)")
+    parser.add_argument("--profile", action="store_true", help="perfilar el hilo principal con cProfile")
+    parser.add_argument("--tracemalloc", action="store_true", help="medir la memoria reservada por cada etapa")
+    args = parser.parse_args()
+
+    # Tiempos por etapa de toda la ejecución: trace de Chrome + resumen al terminar
+    tracing.start_run(profile=args.profile, memory=args.tracemalloc)
+    try:
+        with tracing.stage("main"):
+            main(
+                workers=args.workers,
+                offline=args.offline,
+                incremental=args.incremental,
+                stream=args.stream,
+                all_teams=args.all_teams,
+                render_profile=args.render_profile,
+                kde=args.kde,
+                refit_embedding=args.refit_embedding,
+                season_keys=args.season,
+                dry_run=args.dry_run,
+                force=True if args.force == [] else (args.force or ()),
+            )
+    finally:
+        tracing.finish_run(args.trace)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+# Caché en disco de páginas/respuestas del scraper, indexada por URL + torneo.
+# Los cuerpos se guardan comprimidos y direccionados por contenido (blobs/<sha256>),
+# así dos URLs con la misma respuesta comparten fichero.
+
+
+class PageCache:
+
+    def __init__(self, cache_dir="./files/cache", max_bytes=512 * 1024 * 1024, default_ttl=6 * 3600, offline=False):
+        self.cache_dir = cache_dir
+        self.blobs_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.offline = offline
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        self._lock = threading.RLock()
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Índice de caché corrupto, se empieza de cero")
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def key(url, tournament_id=None):
+        return hashlib.sha256(f"{tournament_id or ''}|{url}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest)
+
+    def _is_fresh(self, entry):
+        if entry["pinned"] or self.offline:
+            return True
+        return time.time() - entry["fetched_at"] < entry["ttl"]
+
+    def _read_blob(self, entry):
+        try:
+            with open(self._blob_path(entry["blob"]), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def lookup(self, url, tournament_id=None):
+        # Metadatos de la entrada aunque esté caducada (para revalidar con ETag / Last-Modified)
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            return dict(entry) if entry else None
+
+    def get(self, url, tournament_id=None):
+        with self._lock:
+            key = self.key(url, tournament_id)
+            entry = self._index.get(key)
+            body = self._read_blob(entry) if entry and self._is_fresh(entry) else None
+            if body is None:
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self.hits += 1
+            return body
+
+    def has(self, url, tournament_id=None):
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            return bool(entry) and self._is_fresh(entry)
+
+    def get_stale(self, url, tournament_id=None):
+        # Cuerpo guardado sin mirar TTL (respuesta 304)
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            return self._read_blob(entry) if entry else None
+
+    def put(self, url, body, tournament_id=None, ttl=None, pinned=False, etag=None, last_modified=None):
+        digest = hashlib.sha256(body).hexdigest()
+        compressed = zlib.compress(body)
+        with self._lock:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                with open(blob_path, "wb") as f:
+                    f.write(compressed)
+
+            now = time.time()
+            self._index[self.key(url, tournament_id)] = {
+                "url": url,
+                "tournament": tournament_id,
+                "blob": digest,
+                "size": len(compressed),
+                "fetched_at": now,
+                "last_access": now,
+                "ttl": self.default_ttl if ttl is None else ttl,
+                "pinned": pinned,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self._evict()
+            self._save_index()
+
+    def refresh(self, url, tournament_id=None):
+        # El servidor confirmó (304) que la copia sigue siendo válida
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            if not entry:
+                return
+            entry["fetched_at"] = time.time()
+            entry["last_access"] = entry["fetched_at"]
+            self.revalidated += 1
+            self._save_index()
+
+    def expire(self, url, tournament_id=None):
+        # La próxima lectura va a la web aunque no haya pasado el TTL (las fijadas no se tocan)
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            if entry and not entry["pinned"]:
+                entry["fetched_at"] = 0.0
+                self._save_index()
+
+    def pin(self, url, tournament_id=None):
+        # Partido finalizado: su contenido ya no va a cambiar
+        with self._lock:
+            entry = self._index.get(self.key(url, tournament_id))
+            if entry and not entry["pinned"]:
+                entry["pinned"] = True
+                self._save_index()
+
+    def get_json(self, url, tournament_id=None):
+        body = self.get(url, tournament_id)
+        return None if body is None else json.loads(body)
+
+    def put_json(self, url, data, tournament_id=None, **kwargs):
+        self.put(url, json.dumps(data, ensure_ascii=False).encode("utf-8"), tournament_id=tournament_id, **kwargs)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for size in {e["blob"]: e["size"] for e in self._index.values()}.values())
+
+    def _evict(self):
+        # LRU por tamaño: primero las entradas no fijadas, después las fijadas
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        refs = {}
+        for entry in self._index.values():
+            refs[entry["blob"]] = refs.get(entry["blob"], 0) + 1
+
+        order = sorted(self._index.items(), key=lambda kv: (kv[1]["pinned"], kv[1]["last_access"]))
+        for key, entry in order:
+            if total <= self.max_bytes:
+                break
+            del self._index[key]
+            refs[entry["blob"]] -= 1
+            if not refs[entry["blob"]]:
+                total -= entry["size"]
+                try:
+                    os.remove(self._blob_path(entry["blob"]))
+                except OSError:
+                    pass
+
+    def report(self):
+        print(
+            f"🗄️ Caché: {len(self._index)} entradas, {self.total_bytes() / 1e6:.1f} MB, "
+            f"aciertos {self.hits}, fallos {self.misses}, revalidadas {self.revalidated}"
+            + (" (modo offline)" if self.offline else "")
+        )
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import time
+
+import joblib
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+# Modelo de embedding de jugadores (StandardScaler + KMeans + PCA) guardado en disco.
+#
+# Se ajusta una vez y se reutiliza: los jugadores nuevos o con más partidos se asignan al
+# centroide más cercano y se proyectan con la PCA guardada, sin reajustar. Se reajusta solo
+# si se pide (refit=True), si cambian las variables o el número de clusters, o si la deriva
+# de los datos supera el umbral. Deriva = cuánto ha crecido la distancia media de los
+# jugadores a su centroide respecto a la del ajuste (0.25 = un 25% más dispersos).
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "files", "models", "player_embedding.joblib")
+CLUSTERING_METHODS = ("kmeans", "minibatch")
+
+
+def data_version(X):
+    # Etiqueta de versión de los datos de entrada (jugadores y variables)
+    h = hashlib.sha256()
+    h.update(repr(list(X.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+class PlayerEmbeddingModel:
+
+    def __init__(self, path=MODEL_PATH, n_clusters=4, random_state=42, clustering="kmeans", drift_threshold=0.25,
+                 batch_size=1024):
+        if clustering not in CLUSTERING_METHODS:
+            raise ValueError(f"Clustering desconocido: {clustering} (opciones: {', '.join(CLUSTERING_METHODS)})")
+        self.path = path
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.clustering = clustering
+        self.drift_threshold = drift_threshold
+        self.batch_size = batch_size
+        self.state = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            return joblib.load(self.path)
+        except Exception:
+            print("⚠️ Modelo de embedding de jugadores ilegible, se reajustará")
+            return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        joblib.dump(self.state, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def version(self):
+        return self.state["version"] if self.state else None
+
+    def _clusterer(self):
+        if self.clustering == "minibatch":
+            return MiniBatchKMeans(n_clusters=self.n_clusters, random_state=self.random_state, batch_size=self.batch_size)
+        return KMeans(n_clusters=self.n_clusters, random_state=self.random_state)
+
+    def fit(self, X):
+        start = time.perf_counter()
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        clusterer = self._clusterer()
+        clusters = clusterer.fit_predict(X_scaled)
+        pca = PCA(n_components=2, random_state=self.random_state)
+        pca.fit(X_scaled)
+
+        self.state = {
+            "version": data_version(X),
+            "features": list(X.columns),
+            "n_clusters": self.n_clusters,
+            "clustering": self.clustering,
+            "scaler": scaler,
+            "clusterer": clusterer,
+            "pca": pca,
+            "players": len(X),
+            "spread": self._spread(X_scaled, clusterer.cluster_centers_, clusters),
+            "fitted_at": time.time(),
+        }
+        if self.path:
+            self.save()
+        print(f"🧠 Embedding de jugadores ajustado ({self.clustering}, {len(X)} jugadores) en {time.perf_counter() - start:.2f}s · versión {self.version}")
+        return clusters
+
+    @staticmethod
+    def _spread(X_scaled, centers, clusters):
+        # Distancia cuadrática media de cada jugador a su centroide
+        return float(((X_scaled - centers[clusters]) ** 2).sum(axis=1).mean())
+
+    def drift(self, X):
+        X_scaled = self.state["scaler"].transform(X)
+        centers = self.state["clusterer"].cluster_centers_
+        clusters = self.state["clusterer"].predict(X_scaled)
+        return self._spread(X_scaled, centers, clusters) / self.state["spread"] - 1
+
+    def refit_reason(self, X):
+        if self.state is None:
+            return "sin modelo guardado"
+        if self.state["features"] != list(X.columns):
+            return "cambian las variables"
+        if self.state["n_clusters"] != self.n_clusters or self.state["clustering"] != self.clustering:
+            return "cambia la configuración del clustering"
+        drift = self.drift(X)
+        if drift > self.drift_threshold:
+            return f"deriva {drift:.2f} > {self.drift_threshold}"
+        return None
+
+    def assign(self, X, refit=False):
+        # Clusters y coordenadas PCA de los jugadores; reajusta solo si hace falta
+        reason = "reajuste pedido" if refit else self.refit_reason(X)
+        if reason:
+            print(f"🧠 Reajuste del embedding de jugadores: {reason}")
+            self.fit(X)
+        elif data_version(X) != self.version:
+            print(f"🧠 Embedding {self.version}: {len(X)} jugadores (datos {data_version(X)}) asignados sin reajustar")
+
+        X_scaled = self.state["scaler"].transform(X)
+        clusters = self.state["clusterer"].predict(X_scaled)
+        X_pca = self.state["pca"].transform(X_scaled)
+        return clusters, X_pca
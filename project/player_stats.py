@@ -11,48 +11,65 @@ from pandas.plotting import table as pd_table
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
-from scipy.stats import gaussian_kde
 import numpy as np
 
+import density
+import rendering
+import tracing
+
 
 def convert_min_to_float(min_str):
     minutes, seconds = map(int, min_str.split(":"))
     return minutes + seconds / 60
 
 
-def scout_team(team_name: str, offensive_csv_path: str, defensive_csv_path: str, players_csv_path: str):
+@tracing.traced("player_stats")
+def load_player_table(players_csv_path: str, warehouse=None, tournament_id=None):
+    # Con warehouse, consulta de los jugadores del torneo; si está vacío, el CSV
+    df = warehouse.league_players(tournament_id) if warehouse is not None else None
+    if df is not None and not df.empty:
+        return df
     base_dir = os.path.dirname(__file__)
-    off_path = os.path.join(base_dir, offensive_csv_path)
-    def_path = os.path.join(base_dir, defensive_csv_path)
-    players_path = os.path.join(base_dir, players_csv_path)
-    plots_dir = os.path.join(base_dir, "files", "plots")
-    os.makedirs(plots_dir, exist_ok=True)
+    return pd.read_csv(os.path.join(base_dir, players_csv_path))
 
-    df_off = pd.read_csv(off_path)
-    df_def = pd.read_csv(def_path)
-    df_players = pd.read_csv(players_path)
 
-    df = pd.merge(df_off, df_def, on="team_name", suffixes=("", "r"))
-    df["Min_float"] = df["Min"].apply(convert_min_to_float)
+@tracing.traced("player_stats")
+def scout_team(team_name: str, offensive_csv_path: str, defensive_csv_path: str, players_csv_path: str,
+               workers=1, profile=None, profiles=None, cache=None, kde="exact", model=None,
+               refit=False, warehouse=None, tournament_id=None, plots_dir=None):
+    df_players = load_player_table(players_csv_path, warehouse=warehouse, tournament_id=tournament_id)
 
-    # (Aquí irían todos los cálculos y llamadas a tus funciones gráficas anteriores...)
+    embedding = fit_player_embedding(df_players, n_clusters=4, kde=kde, model=model, refit=refit)
+    return render_player_report(df_players, embedding, team_name, plots_dir=plots_dir, workers=workers, profile=profile,
+                                profiles=profiles, cache=cache)
 
-    # Crear tabla resumen jugadores del equipo
+
+def player_report_jobs(df_players, embedding, team_name, plots_dir):
+    # La tabla solo depende de los jugadores del equipo: una jornada nueva no la redibuja si no jugó
     df_team_players = df_players[df_players["team_name"] == team_name]
-    player_table_path = create_player_summary_table(df_team_players, team_name, plots_dir)
-    plot_path = cluster_and_plot_players_with_kde(df_players, selected_team=team_name, n_clusters=4, out_dir="files/plots")
+    return [
+        ("player_summary_table", create_player_summary_table, (df_team_players, team_name, plots_dir)),
+        ("clustering", plot_player_clusters, (embedding, team_name, plots_dir)),
+    ]
 
 
-    # Retornar paths junto con los demás gráficos (a añadir según tu código)
-    return {
-        # ... otros paths de gráficos ...
-        "player_summary_table": player_table_path,
-        "clustering": plot_path
-    }
+@tracing.traced("player_stats")
+def render_player_report(df_players, embedding, team_name, plots_dir=None, workers=1, profile=None, profiles=None, cache=None):
+    # Gráficos de jugadores de un equipo con el embedding de la liga ya ajustado
+    plots_dir = plots_dir or os.path.join(os.path.dirname(__file__), "files", "plots")
+    os.makedirs(plots_dir, exist_ok=True)
 
+    results, _ = rendering.render_jobs(
+        player_report_jobs(df_players, embedding, team_name, plots_dir), workers=workers, profile=profile, profiles=profiles,
+        cache=cache,
+    )
+    return results
 
-def cluster_and_plot_players_with_kde(df_all_players, selected_team, n_clusters=4, random_state=42, out_dir="."):
 
+@tracing.traced("player_stats")
+def fit_player_embedding(df_all_players, n_clusters=4, random_state=42, kde="exact", grid_size=100, model=None, refit=False):
+    # KMeans + PCA sobre todos los jugadores de la liga y contornos KDE de cada cluster.
+    # Nada depende del equipo destacado: se calcula una vez y sirve para todos los equipos.
     df = df_all_players.copy()
     df["Min"] = df["Min"].apply(lambda x: sum(int(t) * 60 ** i for i, t in enumerate(reversed(x.split(":")))) / 60)
     per_game_stats = [
@@ -64,53 +81,74 @@ def cluster_and_plot_players_with_kde(df_all_players, selected_team, n_clusters=
         df[stat] = df[stat] / df["GP"]
     features = per_game_stats + ["GP"]
     X = df[features].fillna(0)
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
-    clusters = kmeans.fit_predict(X_scaled)
+    if model is not None:
+        # Modelo guardado: se asigna y proyecta sin reajustar (salvo refit o deriva)
+        clusters, X_pca = model.assign(X, refit=refit)
+        n_clusters = model.n_clusters
+    else:
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
+        clusters = kmeans.fit_predict(X_scaled)
+        pca = PCA(n_components=2, random_state=random_state)
+        X_pca = pca.fit_transform(X_scaled)
     df["cluster"] = clusters
-    pca = PCA(n_components=2, random_state=random_state)
-    X_pca = pca.fit_transform(X_scaled)
     df["pca1"] = X_pca[:, 0]
     df["pca2"] = X_pca[:, 1]
 
-    plt.figure(figsize=(14, 10))
+    contours = []
+    for cluster_id in range(n_clusters):
+        cluster_points = df[df["cluster"] == cluster_id]
+        if len(cluster_points) < 3:
+            # Sin puntos suficientes para una densidad (p. ej. cluster casi vacío al asignar sin reajustar)
+            contours.append(None)
+            continue
+        # KDE contour (exacto o por binning + FFT, ver density.py)
+        contours.append(density.kde_grid(cluster_points["pca1"], cluster_points["pca2"], method=kde, grid_size=grid_size))
+
+    version = model.version if model is not None else None
+    return {"players": df, "n_clusters": n_clusters, "contours": contours, "version": version}
+
+
+def plot_player_clusters(embedding, selected_team, out_dir=".", render=None):
+    df = embedding["players"]
+
+    fig = rendering.new_figure(figsize=(14, 10))
+    ax = fig.subplots()
     colors = plt.cm.tab10.colors
 
-    for cluster_id in range(n_clusters):
+    for cluster_id, contour in enumerate(embedding["contours"]):
         cluster_points = df[df["cluster"] == cluster_id]
-        plt.scatter(cluster_points["pca1"], cluster_points["pca2"],
+        ax.scatter(cluster_points["pca1"], cluster_points["pca2"],
                     color=colors[cluster_id], alpha=0.4, label=f"Cluster {cluster_id}")
-        # KDE contour
-        xy = np.vstack([cluster_points["pca1"], cluster_points["pca2"]])
-        kde = gaussian_kde(xy)
-        xmin, xmax = cluster_points["pca1"].min() - 1, cluster_points["pca1"].max() + 1
-        ymin, ymax = cluster_points["pca2"].min() - 1, cluster_points["pca2"].max() + 1
-        xx, yy = np.mgrid[xmin:xmax:100j, ymin:ymax:100j]
-        positions = np.vstack([xx.ravel(), yy.ravel()])
-        f = np.reshape(kde(positions).T, xx.shape)
-        plt.contour(xx, yy, f, levels=3, colors=[colors[cluster_id]], alpha=0.7)
+        if contour is not None:
+            xx, yy, f = contour
+            ax.contour(xx, yy, f, levels=3, colors=[colors[cluster_id]], alpha=0.7)
 
     team_players = df[df["team_name"] == selected_team]
-    plt.scatter(team_players["pca1"], team_players["pca2"], color="black", s=80, label=f"{selected_team} players")
+    ax.scatter(team_players["pca1"], team_players["pca2"], color="black", s=80, label=f"{selected_team} players")
 
     for _, row in team_players.iterrows():
-        plt.text(row["pca1"] + 0.02, row["pca2"], row["Player"], fontsize=9, weight='bold')
+        ax.text(row["pca1"] + 0.02, row["pca2"], row["Player"], fontsize=9, weight='bold')
 
-    plt.title(f"Player Clustering with KDE Contours — Highlight: {selected_team}", fontsize=18, weight="bold")
-    plt.xlabel("PCA Dimension 1")
-    plt.ylabel("PCA Dimension 2")
-    plt.legend(loc="best")
-    plt.grid(True, linestyle='--', alpha=0.5)
-    plt.tight_layout()
+    ax.set_title(f"Player Clustering with KDE Contours — Highlight: {selected_team}", fontsize=18, weight="bold")
+    ax.set_xlabel("PCA Dimension 1")
+    ax.set_ylabel("PCA Dimension 2")
+    ax.legend(loc="best")
+    ax.grid(True, linestyle='--', alpha=0.5)
+    fig.tight_layout()
 
     os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"{selected_team}_player_clusters_kde.png")
-    plt.savefig(path, dpi=300)
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{selected_team}_player_clusters_kde", render, dpi=300)
     return path
 
-def render_player_summary_table(df, team_name, out_dir):
+
+def cluster_and_plot_players_with_kde(df_all_players, selected_team, n_clusters=4, random_state=42, out_dir=".",
+                                      kde="exact", grid_size=100):
+    embedding = fit_player_embedding(df_all_players, n_clusters=n_clusters, random_state=random_state, kde=kde, grid_size=grid_size)
+    return plot_player_clusters(embedding, selected_team, out_dir=out_dir)
+
+def render_player_summary_table(df, team_name, out_dir, render=None):
     display_cols = df.columns.tolist()
     
     # Normalizar cada columna numérica para color
@@ -118,7 +156,8 @@ def render_player_summary_table(df, team_name, out_dir):
     cmap = plt.cm.Greens
 
     # Crear figura grande
-    fig, ax = plt.subplots(figsize=(len(display_cols) * 1.5, len(df) * 0.7 + 2))
+    fig = rendering.new_figure(figsize=(len(display_cols) * 1.5, len(df) * 0.7 + 2))
+    ax = fig.subplots()
     ax.axis('off')
 
     # Crear tabla pandas con estilo
@@ -136,14 +175,12 @@ def render_player_summary_table(df, team_name, out_dir):
                 val = norm_df.iloc[i-1, j]
                 cell.set_facecolor(cmap(val))
     
-    plt.title(f"{team_name} — Player Summary (Per Game Stats & Efficiency)", fontsize=24, weight="bold", pad=30)
+    ax.set_title(f"{team_name} — Player Summary (Per Game Stats & Efficiency)", fontsize=24, weight="bold", pad=30)
     os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"{team_name}_players_summary_table.png")
-    plt.savefig(path, dpi=400, bbox_inches='tight')
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_players_summary_table", render, dpi=400, bbox_inches='tight')
     return path
 
-def create_player_summary_table(df, team_name, out_dir):
+def create_player_summary_table(df, team_name, out_dir, render=None):
     per_game_stats = [
         "PTS", "2PM", "2PA", "3PM", "3PA", "FTM", "FTA", "AST", "STL", "TO", "BLK", "BLKA", "FC", "FD", "PIR"
     ]
@@ -200,7 +237,8 @@ def create_player_summary_table(df, team_name, out_dir):
     col_widths_stats = [0.25] + [0.04] * (len(display_stats) - 1)
     col_widths_eff = [0.25] + [0.06] * (len(display_eff) - 1)
 
-    fig, axs = plt.subplots(2, 1, figsize=(sum(col_widths_stats) * 10, len(df_stats) * 1.0 + 3.5))
+    fig = rendering.new_figure(figsize=(sum(col_widths_stats) * 10, len(df_stats) * 1.0 + 3.5))
+    axs = fig.subplots(2, 1)
 
     # Reducir el espacio vertical entre tablas y acercar título a la primera tabla
     fig.subplots_adjust(hspace=0.01, top=0.43)
@@ -240,7 +278,5 @@ def create_player_summary_table(df, team_name, out_dir):
     #plt.suptitle(f"{team_name}", fontsize=20, weight="bold", y=0.97)
 
     os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"{team_name}_players_summary_table.png")
-    plt.savefig(path, dpi=800, bbox_inches='tight')
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_players_summary_table", render, dpi=800, bbox_inches='tight')
     return path
\ No newline at end of file
@@ -0,0 +1,264 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from game_index import select_games, teams_from_game_id
+
+# Segmentación en posesiones del jugada a jugada limpio (salida de clean_play_by_plays).
+#
+# A cada jugada se le asigna el equipo atacante según la acción (un tiro, pérdida o rebote
+# ofensivo los hace quien ataca; un rebote defensivo, robo o tapón, quien defiende). Las
+# jugadas neutras (faltas, tiempos muertos) heredan el atacante de la jugada anterior del
+# mismo periodo, y una posesión nueva empieza cada vez que cambia el atacante o el periodo.
+# Todo se hace por columnas sobre la temporada entera, sin recorrer las jugadas una a una.
+
+HOME_PLAYERS = [f"homeplayer{i}" for i in range(1, 6)]
+AWAY_PLAYERS = [f"awayplayer{i}" for i in range(1, 6)]
+
+OFFENSE_ACTIONS = ["2PM", "2PA", "3PM", "3PA", "FTM", "FTA", "OREB", "TOV", "AST", "BLKRec"]
+DEFENSE_ACTIONS = ["DREB", "STL", "BLK"]
+
+# Cómo termina la posesión: la última de estas acciones que aparezca en ella
+OUTCOME_ACTIONS = {
+    "2PM": "made_fg",
+    "3PM": "made_fg",
+    "FTM": "free_throws",
+    "FTA": "free_throws",
+    "TOV": "turnover",
+    "STL": "turnover",
+    "DREB": "defensive_rebound",
+}
+
+POSSESSION_COLUMNS = [
+    "game", "period", "possession", "offense", "defense", "start_time", "end_time", "duration",
+    "plays", "points", "outcome", "offense_lineup", "defense_lineup",
+]
+
+
+def plays_frame(cleaned_plays, game="game"):
+    # Salida de clean_play_by_plays → DataFrame con el mismo formato que los CSV limpios
+    rows = []
+    for play in cleaned_plays:
+        row = {key: play[key] for key in ("period", "time", "player", "action_code", "side", "score_home", "score_away")}
+        home_players = sorted(play["players_on_court_home"])[:5]
+        away_players = sorted(play["players_on_court_away"])[:5]
+        for i in range(5):
+            row[HOME_PLAYERS[i]] = home_players[i] if i < len(home_players) else None
+            row[AWAY_PLAYERS[i]] = away_players[i] if i < len(away_players) else None
+        rows.append(row)
+    return pd.DataFrame(rows).assign(game=game)
+
+
+def load_season_plays(play_by_play_folder, store=None, index=None, tournaments=None):
+    # Jugadas limpias de todos los partidos con su id de partido (columna "game")
+    # Los partidos seleccionados que ya están en el event store salen de ahí; el resto, de sus CSV
+    game_ids = select_games(play_by_play_folder, index, tournaments)
+
+    games = []
+    if store is not None:
+        covered, game_ids = store.split_coverage(game_ids, tournaments)
+        df = store.read(tournaments=tournaments, games=covered) if covered else None
+        if df is not None and not df.empty:
+            games.append(df)
+
+    for gid in game_ids:
+        path = os.path.join(play_by_play_folder, gid + ".csv")
+        if os.path.exists(path):
+            games.append(pd.read_csv(path, dtype={"period": str}).assign(game=gid))
+    if not games:
+        return None
+    return pd.concat(games, ignore_index=True)
+
+
+def _codes(values):
+    # Códigos enteros (-1 = vacío) + valores distintos: todo lo demás se hace sobre enteros
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _clock_seconds(times):
+    # Los relojes distintos son pocos: se convierten una vez y se reparten con los códigos
+    codes, uniques = _codes(times)
+    seconds = np.full(len(uniques), np.nan)
+    for i, clock in enumerate(uniques):
+        try:
+            minutes, secs = str(clock).split(":")
+            seconds[i] = int(minutes) * 60 + int(secs)
+        except ValueError:
+            pass
+    return np.where(codes >= 0, seconds[codes], np.nan)
+
+
+def _lineup_strings(lineup_codes, players):
+    # "JUGADOR 1|JUGADOR 2|..." calculado solo para cada quinteto distinto
+    lineups = pd.DataFrame(lineup_codes)
+    group = lineups.groupby(list(lineups.columns), sort=False).ngroup().to_numpy()
+    first = pd.Series(np.arange(len(group))).groupby(group).first().to_numpy()
+    strings = np.array(["|".join(players[code] for code in lineup_codes[i] if code >= 0) for i in first], dtype=object)
+    return strings[group]
+
+
+def _game_teams(game, side, player, home_players, n_games):
+    # Los dos primeros equipos que aparecen en cada partido, y cuál es el local (el equipo de
+    # las jugadas hechas por jugadores de homeplayerN)
+    pairs = pd.DataFrame({"game": game, "side": side})
+    pairs = pairs[pairs["side"] >= 0].drop_duplicates()
+    order = pairs.groupby("game", sort=False).cumcount().to_numpy()
+    team_a = np.full(n_games, -1)
+    team_b = np.full(n_games, -1)
+    team_a[pairs["game"].to_numpy()[order == 0]] = pairs["side"].to_numpy()[order == 0]
+    team_b[pairs["game"].to_numpy()[order == 1]] = pairs["side"].to_numpy()[order == 1]
+
+    is_home_player = (player >= 0) & (side >= 0) & (home_players == player[:, None]).any(axis=1)
+    votes = pd.DataFrame({"game": game[is_home_player], "side": side[is_home_player]}).value_counts().reset_index()
+    votes = votes.drop_duplicates("game")
+    home = np.full(n_games, -1)
+    home[votes["game"].to_numpy()] = votes["side"].to_numpy()
+    return team_a, team_b, home
+
+
+def encode_plays(df):
+    # Columnas de jugadores, equipos, acciones... como códigos enteros, más el atacante,
+    # la posesión y los puntos de cada jugada. Lo comparten posesiones y quintetos.
+    df = df.reset_index(drop=True)
+    if "game" not in df:
+        df = df.assign(game="game")
+
+    game, games = _codes(df["game"].astype(str))
+    period, periods = _codes(df["period"].astype(str))
+    side, teams = _codes(df["side"])
+    action, actions = _codes(df["action_code"])
+    # Jugador de la jugada y los diez en pista con los mismos códigos
+    player_codes, players = _codes(pd.concat([df[c] for c in ["player"] + HOME_PLAYERS + AWAY_PLAYERS], ignore_index=True))
+    player_codes = player_codes.reshape(11, len(df))
+    player, home_players, away_players = player_codes[0], player_codes[1:6].T, player_codes[6:].T
+
+    # Equipos que no aparecen en ninguna jugada del partido: se sacan del nombre del partido
+    team_a, team_b, home = _game_teams(game, side, player, home_players, len(games))
+    for g in np.flatnonzero(team_b < 0):
+        known = teams[team_a[g]] if team_a[g] >= 0 else None
+        missing = next((team for team in teams_from_game_id(str(games[g])) or [] if team != known), None)
+        if missing is not None:
+            teams = np.append(teams, missing)
+            team_b[g] = len(teams) - 1
+    # Visitante: el equipo del partido que no es el local
+    away = np.where(home == team_a, team_b, team_a)
+
+    row_team_a, row_team_b = team_a[game], team_b[game]
+    other = np.where(side == row_team_a, row_team_b, row_team_a)
+
+    # Atacante de cada jugada (-1 en las neutras) y relleno dentro de cada periodo
+    is_offense = np.isin(action, np.flatnonzero(np.isin(actions, OFFENSE_ACTIONS)))
+    is_defense = np.isin(action, np.flatnonzero(np.isin(actions, DEFENSE_ACTIONS)))
+    offense = np.where(is_offense & (side >= 0), side, np.where(is_defense & (side >= 0), other, -1)).astype(float)
+    offense[offense < 0] = np.nan
+    segment = game * (len(periods) + 1) + period
+    offense = pd.Series(offense).groupby(segment, sort=False).ffill()
+    offense = offense.groupby(segment, sort=False).bfill().to_numpy()
+    known = ~np.isnan(offense)
+    offense = np.where(known, offense, -1).astype(np.int64)
+
+    # Nueva posesión cuando cambia el atacante o el periodo (o el partido)
+    new_segment = np.r_[True, segment[1:] != segment[:-1]]
+    new_offense = np.r_[True, offense[1:] != offense[:-1]]
+    new_possession = new_segment | new_offense
+    possession = np.cumsum(new_possession)
+
+    # Puntos de cada jugada a partir del marcador acumulado
+    home_score = pd.to_numeric(df["score_home"], errors="coerce").fillna(0).to_numpy()
+    away_score = pd.to_numeric(df["score_away"], errors="coerce").fillna(0).to_numpy()
+    new_game = np.r_[True, game[1:] != game[:-1]]
+    home_points = np.where(new_game, home_score, np.diff(home_score, prepend=0))
+    away_points = np.where(new_game, away_score, np.diff(away_score, prepend=0))
+    offense_is_home = offense == home[game]
+
+    return {
+        "df": df,
+        "game": game, "games": games,
+        "period": period, "periods": periods,
+        "segment": segment,
+        "action": action, "actions": actions,
+        "teams": teams, "team_a": team_a, "team_b": team_b, "home": home, "away": away,
+        "player": player, "players": players,
+        "home_players": home_players, "away_players": away_players,
+        "offense": offense, "known": known,
+        "new_possession": new_possession & known, "possession": possession,
+        "home_points": home_points, "away_points": away_points,
+        "offense_is_home": offense_is_home,
+        "seconds": _clock_seconds(df["time"]),
+    }
+
+
+def segment_possessions(df):
+    # df: jugadas limpias en orden cronológico (por partido y periodo) con columna "game"
+    if df is None or df.empty:
+        return pd.DataFrame(columns=POSSESSION_COLUMNS)
+
+    plays = encode_plays(df)
+    df, game, games, period, periods = plays["df"], plays["game"], plays["games"], plays["period"], plays["periods"]
+    actions, action, teams, team_a, team_b = plays["actions"], plays["action"], plays["teams"], plays["team_a"], plays["team_b"]
+    offense, known, possession, offense_is_home = plays["offense"], plays["known"], plays["possession"], plays["offense_is_home"]
+    players, home_players, away_players = plays["players"], plays["home_players"], plays["away_players"]
+    points = np.where(offense_is_home, plays["home_points"], plays["away_points"])
+
+    outcome_codes = np.array([OUTCOME_ACTIONS.get(a) for a in actions] + [None], dtype=object)
+    outcome = outcome_codes[action]  # -1 → None (última posición)
+
+    plays = pd.DataFrame({
+        "possession": possession,
+        "offense": offense,
+        "seconds": plays["seconds"],
+        "points": points,
+        "has_outcome": pd.notna(outcome),
+        "row": np.arange(len(df)),
+    })[known]
+
+    grouped = plays.groupby("possession", sort=True)
+    table = grouped.agg(
+        first_row=("row", "first"),
+        last_row=("row", "last"),
+        start_seconds=("seconds", "first"),
+        end_seconds=("seconds", "last"),
+        plays=("row", "size"),
+        points=("points", "sum"),
+    )
+    last_outcome = plays[plays["has_outcome"]].groupby("possession")["row"].last()
+
+    first_row = table["first_row"].to_numpy()
+    possession_game = game[first_row]
+    possession_offense = offense[first_row]
+    possession_defense = np.where(possession_offense == team_a[possession_game], team_b[possession_game], team_a[possession_game])
+    outcome_row = last_outcome.reindex(table.index).to_numpy()
+
+    result = pd.DataFrame({
+        "game": games[possession_game],
+        "period": periods[period[first_row]],
+        "possession": np.arange(1, len(table) + 1),
+        "offense": teams[possession_offense],
+        "defense": np.where(possession_defense >= 0, teams[possession_defense], None),
+        "start_time": df["time"].to_numpy(dtype=object)[first_row],
+        "end_time": df["time"].to_numpy(dtype=object)[table["last_row"].to_numpy()],
+        "duration": table["start_seconds"].to_numpy() - table["end_seconds"].to_numpy(),
+        "plays": table["plays"].to_numpy(),
+        "points": table["points"].to_numpy().astype(int),
+        "outcome": np.where(np.isnan(outcome_row), "end_of_period", outcome[np.nan_to_num(outcome_row).astype(np.int64)]),
+    })
+
+    # Quintetos al empezar la posesión
+    home_lineup = _lineup_strings(home_players[first_row], players)
+    away_lineup = _lineup_strings(away_players[first_row], players)
+    is_home = offense_is_home[first_row]
+    result["offense_lineup"] = np.where(is_home, home_lineup, away_lineup)
+    result["defense_lineup"] = np.where(is_home, away_lineup, home_lineup)
+
+    return result[POSSESSION_COLUMNS]
+
+
+def count_possessions(possessions):
+    # Posesiones reales por equipo: en ataque (Poss), en defensa (Possr) y partidos (Games)
+    offense = possessions.groupby("offense").agg(Poss=("possession", "size"), Games=("game", "nunique"))
+    defense = possessions.groupby("defense").agg(Possr=("possession", "size"))
+    counts = offense.join(defense, how="outer").fillna(0)
+    counts.index.name = "team_name"
+    return counts.reset_index().astype({"Poss": int, "Possr": int, "Games": int})
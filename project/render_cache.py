@@ -0,0 +1,217 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Caché de gráficos de los informes. Cada salida se indexa por un hash de lo que la determina:
+# la función que la dibuja (y su código), los datos que recibe (solo su trozo de la tabla de la
+# liga), el equipo y el perfil de render. Si nada de eso cambia no se vuelve a dibujar: se
+# reutiliza el fichero ya generado o se restaura la copia guardada en blobs/<sha256>.
+# El código entra entero: el módulo del gráfico (sus helpers y estilos) y rendering.py (figura y
+# guardado). Lo que cambie fuera de ahí (versión de matplotlib, fuentes...) obliga a subir
+# RENDER_CACHE_VERSION.
+
+RENDER_CACHE_VERSION = 1
+RENDERING_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rendering.py")
+
+
+@lru_cache(maxsize=None)
+def _source_digest(func):
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = func.__qualname__
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def _module_digest(module_name):
+    module = sys.modules.get(module_name)
+    return _file_digest(getattr(module, "__file__", None))
+
+
+def _feed(h, value):
+    # Hash estable de los argumentos de un gráfico (DataFrames, arrays, dicts, tuplas...)
+    if isinstance(value, pd.DataFrame):
+        h.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        h.update(repr((value.name, str(value.dtype))).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.dtype.str, value.shape)).encode("utf-8"))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode("utf-8"))
+            _feed(h, value[key])
+        h.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            _feed(h, item)
+        h.update(b"]")
+    else:
+        h.update(repr(value).encode("utf-8"))
+
+
+def output_paths(result):
+    # Rutas de fichero dentro del resultado de un gráfico (str o dicts anidados)
+    if isinstance(result, str):
+        return [result]
+    if isinstance(result, dict):
+        return [path for value in result.values() for path in output_paths(value)]
+    return []
+
+
+class RenderCache:
+
+    def __init__(self, cache_dir="./files/cache/render", max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.blobs_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.restored = 0
+
+        self._lock = threading.RLock()
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Índice de la caché de gráficos corrupto, se empieza de cero")
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def key(func, args, render=None):
+        h = hashlib.sha256()
+        h.update(f"{func.__module__}.{func.__qualname__}|{_source_digest(func)}".encode("utf-8"))
+        h.update(f"{RENDER_CACHE_VERSION}|{_module_digest(func.__module__)}".encode("utf-8"))
+        h.update(f"{_file_digest(RENDERING_MODULE_PATH)}".encode("utf-8"))
+        _feed(h, args)
+        _feed(h, render)
+        return h.hexdigest()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest)
+
+    def get(self, key):
+        # Resultado del gráfico si está en caché (restaurando los ficheros que falten o hayan cambiado)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or not self._restore(entry):
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self.hits += 1
+            return entry["result"]
+
+    def _restore(self, entry):
+        for path, output in entry["outputs"].items():
+            try:
+                stat = os.stat(path)
+                if stat.st_size == output["size"] and stat.st_mtime_ns == output["mtime_ns"]:
+                    continue
+            except OSError:
+                pass
+            blob_path = self._blob_path(output["blob"])
+            if not os.path.exists(blob_path):
+                return False
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            shutil.copyfile(blob_path, path)
+            output["mtime_ns"] = os.stat(path).st_mtime_ns
+            self.restored += 1
+        return True
+
+    def put(self, key, result, chart=None):
+        outputs = {}
+        for path in output_paths(result):
+            with open(path, "rb") as f:
+                body = f.read()
+            digest = hashlib.sha256(body).hexdigest()
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                with open(blob_path, "wb") as f:
+                    f.write(body)
+            outputs[path] = {"blob": digest, "size": len(body), "mtime_ns": os.stat(path).st_mtime_ns}
+
+        with self._lock:
+            self._index[key] = {
+                "chart": chart,
+                "result": result,
+                "outputs": outputs,
+                "created_at": time.time(),
+                "last_access": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def save(self):
+        with self._lock:
+            self._save_index()
+
+    def total_bytes(self):
+        with self._lock:
+            blobs = {o["blob"]: o["size"] for e in self._index.values() for o in e["outputs"].values()}
+            return sum(blobs.values())
+
+    def _evict(self):
+        # LRU por tamaño de los blobs guardados (los ficheros en files/plots no se tocan)
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        refs = {}
+        for entry in self._index.values():
+            for output in entry["outputs"].values():
+                refs[output["blob"]] = refs.get(output["blob"], 0) + 1
+
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            del self._index[key]
+            for output in entry["outputs"].values():
+                refs[output["blob"]] -= 1
+                if not refs[output["blob"]]:
+                    total -= output["size"]
+                    try:
+                        os.remove(self._blob_path(output["blob"]))
+                    except OSError:
+                        pass
+
+    def report(self):
+        print(
+            f"🗃️ Caché de gráficos: {len(self._index)} entradas, {self.total_bytes() / 1e6:.1f} MB, "
+            f"aciertos {self.hits}, fallos {self.misses}, restaurados {self.restored}"
+        )
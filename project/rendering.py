@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import tracing
+
+# Renderizado de gráficos sin el estado global de pyplot: cada gráfico crea su propia Figure
+# con canvas Agg, así que se pueden dibujar en paralelo (en procesos) sin pisarse.
+#
+# Perfiles de salida: formato y dpi de cada fichero. dpi=None respeta el dpi propio de cada
+# gráfico (el de siempre). Se puede elegir un perfil para todo y cambiarlo por gráfico:
+#
+#   render_jobs(jobs, profile="preview", profiles={"player_summary_table": "print"})
+
+RENDER_PROFILES = {
+    "default": {"format": "png", "dpi": None},
+    "preview": {"format": "png", "dpi": 72},
+    "print": {"format": "pdf", "dpi": 300},
+}
+
+
+def new_figure(figsize=None):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def resolve_profile(profile=None):
+    if profile is None:
+        return RENDER_PROFILES["default"]
+    if isinstance(profile, str):
+        return RENDER_PROFILES[profile]
+    return {**RENDER_PROFILES["default"], **profile}
+
+
+def save_figure(fig, out_dir, name, render=None, dpi=None, **savefig_kwargs):
+    # name sin extensión: la pone el perfil. dpi: el del gráfico si el perfil no fija otro
+    profile = resolve_profile(render)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{name}.{profile['format']}")
+    fig.savefig(path, format=profile["format"], dpi=profile["dpi"] or dpi or "figure", **savefig_kwargs)
+    return path
+
+
+def _timed(func, args, render):
+    start = time.perf_counter()
+    result = func(*args, render=render)
+    return result, time.perf_counter() - start
+
+
+def _chart(name):
+    # Los nombres pueden ser (equipo, gráfico): los perfiles se eligen por el gráfico
+    return name[-1] if isinstance(name, tuple) else name
+
+
+def _process_context(jobs):
+    # forkserver y no fork: render_jobs se llama desde hilos (etapas del pipeline a la vez) y hacer
+    # fork de un proceso con varios hilos puede dejar a los hijos bloqueados en un lock copiado
+    # (matplotlib, RenderCache, tracing). El servidor se arranca una vez con los módulos de los
+    # gráficos ya importados, así cada hijo no vuelve a importar matplotlib.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(sorted({__name__} | {func.__module__ for _, func, _ in jobs}))
+    return context
+
+
+def render_jobs(jobs, workers=1, profile=None, profiles=None, cache=None):
+    # jobs: [(nombre, función, args)]; cada función dibuja y guarda un gráfico y acepta render=
+    # Con cache (RenderCache) solo se dibujan los gráficos cuyos datos, equipo o perfil cambiaron.
+    # Devuelve ({nombre: resultado}, {nombre: segundos de los dibujados})
+    profiles = profiles or {}
+    chart_profiles = {name: resolve_profile(profiles.get(_chart(name), profile)) for name, _, _ in jobs}
+
+    results, timings, keys = {}, {}, {}
+    pending = []
+    for name, func, args in jobs:
+        if cache is not None:
+            keys[name] = cache.key(func, args, chart_profiles[name])
+            cached = cache.get(keys[name])
+            if cached is not None:
+                results[name] = cached
+                continue
+        pending.append((name, func, args))
+
+    start = time.perf_counter()
+    if workers <= 1 or len(pending) <= 1:
+        for name, func, args in pending:
+            results[name], timings[name] = _timed(func, args, chart_profiles[name])
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context(pending)) as executor:
+            futures = {name: executor.submit(_timed, func, args, chart_profiles[name]) for name, func, args in pending}
+            for name, future in futures.items():
+                results[name], timings[name] = future.result()
+
+    if cache is not None:
+        for name in timings:
+            cache.put(keys[name], results[name], chart=_chart(name))
+        cache.save()
+
+    for name, seconds in timings.items():
+        tracing.record(f"render.{_chart(name)}", "render", seconds)
+    tracing.count("render.drawn", len(timings))
+    tracing.count("render.cached", len(jobs) - len(pending))
+    print_timings(timings, time.perf_counter() - start, workers, cached=len(jobs) - len(pending))
+    return results, timings
+
+
+def print_timings(timings, elapsed, workers=1, cached=0):
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        label = " · ".join(name) if isinstance(name, tuple) else name
+        print(f"   ⏱️ {label}: {seconds:.2f}s")
+    print(
+        f"🖼️ {len(timings)} gráficos en {elapsed:.2f}s ({sum(timings.values()):.2f}s de render, {workers} proceso(s))"
+        + (f", {cached} sin cambios desde la caché" if cached else "")
+    )
@@ -0,0 +1,60 @@
+import os
+import time
+
+import rendering
+import team_stats
+import player_stats
+
+# Informes de scouting de todos los equipos de un torneo.
+#
+# Lo que es común a la liga (CSV leídos y unidos, métricas por equipo, medias de la liga,
+# KMeans/PCA de todos los jugadores y sus contornos KDE) se calcula una sola vez; por
+# equipo solo se dibuja. Los gráficos de todos los equipos van a una sola cola de rendering:
+# con workers > 1 se reparten entre procesos gráfico a gráfico, así los lentos (tabla de
+# jugadores) no dejan a los demás procesos esperando.
+
+
+def load_shared_state(offensive_csv_path, defensive_csv_path, players_csv_path, possessions_csv_path=None, n_clusters=4,
+                      kde="exact", model=None, refit=False, warehouse=None, tournament_id=None):
+    start = time.perf_counter()
+    league = team_stats.load_league_table(offensive_csv_path, defensive_csv_path, possessions_csv_path, warehouse=warehouse,
+                                          tournament_id=tournament_id)
+    players = player_stats.load_player_table(players_csv_path, warehouse=warehouse, tournament_id=tournament_id)
+    embedding = player_stats.fit_player_embedding(players, n_clusters=n_clusters, kde=kde, model=model, refit=refit)
+    print(f"📊 Tablas de la liga y embedding de jugadores en {time.perf_counter() - start:.2f}s")
+    return {"league": league, "players": players, "embedding": embedding}
+
+
+def report_jobs(shared, team_name, plots_dir):
+    jobs = team_stats.team_report_jobs(shared["league"].copy(), team_name, plots_dir)
+    jobs += player_stats.player_report_jobs(shared["players"], shared["embedding"], team_name, plots_dir)
+    return jobs
+
+
+def scout_teams(offensive_csv_path, defensive_csv_path, players_csv_path, possessions_csv_path=None,
+                team_names=None, workers=1, plots_dir=None, profile=None, profiles=None, cache=None, kde="exact",
+                model=None, refit=False, warehouse=None, tournament_id=None):
+    # team_names=None: todos los equipos de la tabla ofensiva
+    shared = load_shared_state(offensive_csv_path, defensive_csv_path, players_csv_path, possessions_csv_path, kde=kde,
+                               model=model, refit=refit, warehouse=warehouse, tournament_id=tournament_id)
+    if team_names is None:
+        team_names = shared["league"]["team_name"].tolist()
+    plots_dir = plots_dir or os.path.join(os.path.dirname(__file__), "files", "plots")
+    os.makedirs(plots_dir, exist_ok=True)
+
+    jobs = []
+    for team_name in team_names:
+        jobs += [((team_name, chart), func, args) for chart, func, args in report_jobs(shared, team_name, plots_dir)]
+    results, timings = rendering.render_jobs(jobs, workers=workers, profile=profile, profiles=profiles, cache=cache)
+
+    reports = {}
+    for team_name in team_names:
+        team_results = {chart: path for (team, chart), path in results.items() if team == team_name}
+        reports[team_name] = {
+            "team": team_stats.team_report_paths(team_results),
+            "players": {chart: team_results[chart] for chart in ("player_summary_table", "clustering")},
+        }
+        team_seconds = sum(seconds for (team, _), seconds in timings.items() if team == team_name)
+        redrawn = sum(1 for team, _ in timings if team == team_name)
+        print(f"📄 {team_name}: {redrawn} gráficos redibujados en {team_seconds:.2f}s")
+    return reports
@@ -1,25 +1,56 @@
-from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import json
+import statistics
 import time
+import re
 
 from config.utils import ACTION_CODES
 
 from config.urls import ANGT_GAMES, ANGT_TEAMS, BOX_SCORE_ENDPOINT, PLAY_BY_PLAY_ENDPOINT
 
-def scrap_urls_games(tournament_id):
-    round_number = 1
+from drivers import launch_driver
+import http_backend
+import tracing
+import waits
+
+def _http_backend(backend):
+    # backend="http" usa la sesión compartida; también se puede pasar un HttpBackend (p. ej. contra un ReplayServer)
+    if backend == "http":
+        return None
+    if isinstance(backend, http_backend.HttpBackend):
+        return backend
+    raise ValueError(f"Backend desconocido: {backend!r} (opciones: 'browser', 'http' o un HttpBackend)")
+
+@tracing.traced("scrap")
+def scrap_urls_games(tournament_id, driver=None, backend="browser", cache=None, start_round=1, round_counts=None,
+                     game_rounds=None):
+    if backend != "browser":
+        return http_backend.fetch_games_urls(tournament_id, backend=_http_backend(backend))
+
+    # La lista de partidos cambia con cada jornada: se guarda con TTL, nunca fijada
+    cache_url = ANGT_GAMES.format(tournament=tournament_id, round="*" if start_round == 1 else f"{start_round}*")
+    if cache is not None:
+        cached = cache.get_json(cache_url, tournament_id)
+        if cached is not None:
+            return [tuple(game) for game in cached]
+        if cache.offline:
+            print(f"⚠️ Sin lista de partidos en caché para {tournament_id} (offline)")
+            return []
+
+    round_number = start_round
     results = []
     previous_final_url = None
 
-    service = Service("./config/chromedriver.exe")
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless")
-    driver = webdriver.Chrome(service=service, options=options)
+    # Si no nos pasan un navegador (p. ej. de un DriverPool) lanzamos uno propio
+    owns_driver = driver is None
+    if owns_driver:
+        driver = launch_driver()
 
     while True:
         url = ANGT_GAMES.format(tournament=tournament_id, round=round_number)
@@ -67,18 +98,26 @@ def scrap_urls_games(tournament_id):
             results.append((title, href))
             print((title, href))
             count += 1
+            if game_rounds is not None:
+                game_rounds[href] = round_number
 
         print(f"Scrapeados {count} partidos en round {round_number}.")
+        if round_counts is not None:
+            round_counts[round_number] = count
         round_number += 1
 
-    driver.quit()
+    if owns_driver:
+        driver.quit()
+    if cache is not None and results:
+        cache.put_json(cache_url, results, tournament_id=tournament_id)
     return results
 
-def scrap_urls_teams(tournament_id):
-    service = Service("./config/chromedriver.exe")
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless")
-    driver = webdriver.Chrome(service=service, options=options)
+@tracing.traced("scrap")
+def scrap_urls_teams(tournament_id, driver=None):
+    # Si no nos pasan un navegador (p. ej. de un DriverPool) lanzamos uno propio
+    owns_driver = driver is None
+    if owns_driver:
+        driver = launch_driver()
 
     url = ANGT_TEAMS
     driver.get(url)
@@ -115,14 +154,22 @@ def scrap_urls_teams(tournament_id):
         except Exception as e:
             print("Error leyendo equipo:", e)
 
-    driver.quit()
+    if owns_driver:
+        driver.quit()
     return results
 
-def scrap_box_scores(teams_urls):
-    service = Service("./config/chromedriver.exe")
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless")
-    driver = webdriver.Chrome(service=service, options=options)
+@tracing.traced("scrap")
+def scrap_box_scores(teams_urls, driver=None, backend="browser", tournament_id=None):
+    if backend != "browser":
+        if tournament_id is None:
+            raise ValueError("scrap_box_scores con backend HTTP necesita tournament_id")
+        teams = [team_name for team_name, _ in teams_urls] if teams_urls else None
+        return http_backend.fetch_box_scores(tournament_id, teams=teams, backend=_http_backend(backend))
+
+    # Si no nos pasan un navegador (p. ej. de un DriverPool) lanzamos uno propio
+    owns_driver = driver is None
+    if owns_driver:
+        driver = launch_driver()
 
     players_all_stats = []
     team_all_stats = []
@@ -138,7 +185,8 @@ def scrap_box_scores(teams_urls):
                 lambda d: len(d.find_elements(By.CSS_SELECTOR, "div.complex-stat-table_row__XPRhI[role='row']")) > 5
             )
 
-            time.sleep(2)  # Espera adicional para asegurar que la tabla esté completamente renderizada
+            # Espera a que la tabla deje de crecer (completamente renderizada)
+            waits.wait_for_stable_count(driver, "div.complex-stat-table_row__XPRhI[role='row']", min_count=6)
 
             rows = driver.find_elements(By.CSS_SELECTOR, "div.complex-stat-table_row__XPRhI[role='row']")
 
@@ -192,167 +240,543 @@ def scrap_box_scores(teams_urls):
         except Exception as e:
             print(f"⚠️ Error en {stats_url}: {e}")
 
-    driver.quit()
+    if owns_driver:
+        driver.quit()
     return players_all_stats, team_all_stats
 
-def scrap_play_by_plays(game_url):
-    service = Service("./config/chromedriver.exe")
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless")  # Descomenta para modo headless
-    driver = webdriver.Chrome(service=service, options=options)
+PERIOD_BUTTONS_SELECTOR = "button.play-by-play-buttons-list_button__wkQqw"
+PLAY_LIST_SELECTOR = "ul.play-by-play-content-list_list__IAELd"
+PLAY_ROWS_SELECTOR = PLAY_LIST_SELECTOR + " > li"
+EXTENSIVE_BLOCK_SELECTOR = "div.play-by-play-content-list-item-extensive_block__ZBIPh"
+SIMPLE_BLOCK_SELECTOR = "div.play-by-play-content-list-item_block__zk9Ab"
+SCORE_SELECTOR = "p.play-by-play-score-stats_statsItemText__NKUQq"
+EXTENSIVE_TIME_SELECTOR = "span.play-by-play-content-list-item-extensive_timeText__3qSiy"
+SIMPLE_TIME_SELECTOR = "span.play-by-play-content-list-item_timeText__Ye2xJ"
+PLAYER_NAME_SELECTOR = "p.play-by-play-info-text_name__dTOhQ"
+PLAYER_ACTION_SELECTOR = "p.play-by-play-info-text_stat__vapMZ"
+
+
+def _new_play(home, visitor, period):
+    return {
+        "local": home,
+        "visitor": visitor,
+        "period": period,
+        "time": None,
+        "player": None,
+        "action": None,
+        "side": None,
+        "score_home": "",
+        "score_away": ""
+    }
+
+def _soup_text(element):
+    # Equivalente a WebElement.text: espacios colapsados y sin bordes
+    return " ".join(element.get_text().split())
+
+def _parse_soup_text_block(block, play, home, visitor):
+    # Primero el bloque derecho (visitante) y si no el izquierdo (local)
+    for side_css, side_label in [("textBlock_right", visitor), ("textBlock_left", home)]:
+        text_block = block.select_one(f"[class*='{side_css}']")
+        if text_block is None:
+            continue
+        name = text_block.select_one(PLAYER_NAME_SELECTOR)
+        if name is None:
+            continue
+        play["player"] = _soup_text(name)
+        action = text_block.select_one(PLAYER_ACTION_SELECTOR)
+        if action is None:
+            continue
+        play["action"] = _soup_text(action)
+        play["side"] = side_label
+        return
+
+def parse_play_by_play_html(html, period, home, visitor):
+    # Parsea todas las filas de un cuarto desde un único snapshot de driver.page_source
+    only_list = SoupStrainer("ul", class_="play-by-play-content-list_list__IAELd")
+    soup = BeautifulSoup(html, "html.parser", parse_only=only_list)
 
     plays = []
+    for row in soup.select(PLAY_ROWS_SELECTOR):
+        play = _new_play(home, visitor, period)
+
+        # 🟥 Jugada con bloque EXTENSIVO (anota)
+        block = row.select_one(EXTENSIVE_BLOCK_SELECTOR)
+        if block is not None:
+            scores = block.select(SCORE_SELECTOR)
+            time_text = block.select_one(EXTENSIVE_TIME_SELECTOR)
+            if scores:
+                play["score_home"] = _soup_text(scores[0])
+            if len(scores) >= 2:
+                play["score_away"] = _soup_text(scores[1])
+                if time_text is not None:
+                    play["time"] = _soup_text(time_text)
+                    _parse_soup_text_block(block, play, home, visitor)
+                    plays.append(play)
+                    continue
 
-    driver.get(game_url + "/#" + PLAY_BY_PLAY_ENDPOINT )
+        # 🟨 Jugada SIMPLE sin anotación
+        block = row.select_one(SIMPLE_BLOCK_SELECTOR)
+        if block is None:
+            continue
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "button.play-by-play-buttons-list_button__wkQqw"))
-        )
+        time_text = block.select_one(SIMPLE_TIME_SELECTOR)
+        if time_text is not None:
+            play["time"] = _soup_text(time_text)
+        _parse_soup_text_block(block, play, home, visitor)
+        plays.append(play)
 
-        # Cerrar cookies si aparece
+    return plays
+
+def parse_play_by_play_elements(rows, period, home, visitor):
+    # Camino antiguo: varias llamadas a chromedriver por fila (se mantiene para comparar en benchmarks)
+    plays = []
+    score_home, score_away = "", ""
+
+    for row in rows:
+        play = {
+            "local": home,
+            "visitor": visitor,
+            "period": period,
+            "time": None,
+            "player": None,
+            "action": None,
+            "side": None,
+            "score_home": score_home,
+            "score_away": score_away
+        }
+
+        # 🟥 Jugada con bloque EXTENSIVO (anota)
         try:
-            WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-            ).click()
+            block = row.find_element(By.CSS_SELECTOR, "div.play-by-play-content-list-item-extensive_block__ZBIPh")
+
+            play["score_home"] = block.find_elements(By.CSS_SELECTOR, "p.play-by-play-score-stats_statsItemText__NKUQq")[0].text.strip()
+            play["score_away"] = block.find_elements(By.CSS_SELECTOR, "p.play-by-play-score-stats_statsItemText__NKUQq")[1].text.strip()
+            play["time"] = block.find_element(By.CSS_SELECTOR, "span.play-by-play-content-list-item-extensive_timeText__3qSiy").text.strip()
+
+            for side_css, side_label in [("right", visitor), ("left", home)]:
+                try:
+                    text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_right']")
+                    play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
+                    play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
+                    play["side"] = visitor
+                except NoSuchElementException:
+                    try:
+                        text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_left']")
+                        play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
+                        play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
+                        play["side"] = home
+                    except NoSuchElementException:
+                        pass
+            plays.append(play)
+            continue
         except:
             pass
 
-        time.sleep(2)
-
-        # Obtener nombres de equipos
+        # 🟨 Jugada SIMPLE sin anotación
         try:
-            home = driver.find_element(By.CSS_SELECTOR, ".play-by-play-final-score_team__gIR7R:nth-child(1) img").get_attribute("alt").strip()
-            visitor = driver.find_element(By.CSS_SELECTOR, ".play-by-play-final-score_team__gIR7R:nth-child(3) img").get_attribute("alt").strip()
+            block = row.find_element(By.CSS_SELECTOR, "div.play-by-play-content-list-item_block__zk9Ab")
+
+            # Tiempo
+            try:
+                play["time"] = block.find_element(By.CSS_SELECTOR, "span.play-by-play-content-list-item_timeText__Ye2xJ").text.strip()
+            except:
+                pass
+
+            try:
+                # Intentar RIGHT
+                text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_right']")
+                play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
+                play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
+                play["side"] = visitor
+            except NoSuchElementException:
+                try:
+                    # Intentar LEFT
+                    text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_left']")
+                    play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
+                    play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
+                    play["side"] = home
+                except NoSuchElementException:
+                    pass
+            plays.append(play)
         except:
-            home, visitor = "home", "visitor"
+            continue
 
-        
-        buttons = [
-            btn for btn in driver.find_elements(By.CSS_SELECTOR, "button.play-by-play-buttons-list_button__wkQqw")
-            if btn.is_enabled()
-        ]
+    return plays
 
-        for btn in buttons:
-            period = btn.text.strip()
-            driver.execute_script("arguments[0].click();", btn)
-            time.sleep(2)
+def game_is_final(plays):
+    # Partido con pinta de terminado: la jugada más reciente del último periodo (4º cuarto o
+    # prórroga) está en el último minuto y el marcador no está empatado. La web no publica
+    # una jugada de fin de partido, así que esto solo no basta: un partido en su último minuto
+    # también cumple. Se da por terminado cuando además dos lecturas seguidas coinciden
+    # (iter_play_by_plays al fijar en caché, sync con el hash del manifiesto).
+    if not plays:
+        return False
+    last_period = plays[-1]["period"]
+    if last_period not in ("4º Cuarto", "Prórroga"):
+        return False
+    period_plays = [p for p in plays if p["period"] == last_period]
+    scores = next(((p["score_home"], p["score_away"]) for p in period_plays if p["score_home"] or p["score_away"]), None)
+    try:
+        minutes, seconds = map(int, (period_plays[0]["time"] or "").split(":"))
+    except ValueError:
+        return False
+    return minutes * 60 + seconds < 60 and scores is not None and scores[0] != scores[1]
+
+def _play_by_play_cache_key(game_url):
+    return game_url + "/#" + PLAY_BY_PLAY_ENDPOINT, http_backend.parse_game_url(game_url)[0]
+
+def _periods_from_snapshots(snapshots):
+    for period, html in snapshots["periods"]:
+        yield period, parse_play_by_play_html(html, period, snapshots["home"], snapshots["visitor"])
+
+def _periods_from_plays(plays):
+    periods = {}
+    for play in plays:
+        periods.setdefault(play["period"], []).append(play)
+    return periods.items()
+
+def _same_as_previous(cache, page_url, tournament_id, plays):
+    # La lectura anterior (aunque haya caducado) tenía exactamente las mismas jugadas
+    body = cache.get_stale(page_url, tournament_id)
+    if body is None:
+        return False
+    previous = [play for _, period_plays in _periods_from_snapshots(json.loads(body)) for play in period_plays]
+    return previous == plays
+
+def play_by_plays_entry(game_url, cache):
+    # Metadatos de la copia en caché del jugada a jugada (fetched_at, pinned...) o None
+    return cache.lookup(*_play_by_play_cache_key(game_url)) if cache is not None else None
+
+def expire_play_by_plays(game_url, cache):
+    # La próxima lectura del partido va a la web (los fijados ya están confirmados como terminados)
+    if cache is not None:
+        cache.expire(*_play_by_play_cache_key(game_url))
+
+def play_by_plays_cached(game_url, cache):
+    # True si el jugada a jugada se puede servir sin abrir un navegador
+    return cache is not None and (cache.offline or cache.has(*_play_by_play_cache_key(game_url)))
+
+def iter_play_by_plays(game_url, driver=None, engine="soup", backend="browser", cache=None):
+    # Igual que scrap_play_by_plays pero devuelve (cuarto, jugadas) según se van leyendo,
+    # así quien consume puede limpiar y guardar cada cuarto sin esperar al partido entero
+    if backend != "browser":
+        yield from _periods_from_plays(http_backend.fetch_play_by_plays(game_url, backend=_http_backend(backend)))
+        return
+
+    # Con caché guardamos los snapshots de cada cuarto: un partido finalizado no se vuelve a abrir
+    page_url, tournament_id = _play_by_play_cache_key(game_url)
+    if cache is not None:
+        snapshots = cache.get_json(page_url, tournament_id)
+        if snapshots is not None:
+            yield from _periods_from_snapshots(snapshots)
+            return
+        if cache.offline:
+            print(f"⚠️ Sin jugada a jugada en caché para {game_url} (offline)")
+            return
+
+    # Si no nos pasan un navegador (p. ej. de un DriverPool) lanzamos uno propio
+    owns_driver = driver is None
+    if owns_driver:
+        driver = launch_driver()
+
+    snapshots = {"home": None, "visitor": None, "periods": []}
+    all_periods_read = False
+    last_plays = []
+    plays_read = []
 
-            rows = driver.find_elements(By.CSS_SELECTOR, "ul.play-by-play-content-list_list__IAELd > li")
-            score_home, score_away = "", ""
+    try:
+        with tracing.stage("scrap.page_load", "scrap"):
+            driver.get(page_url)
 
-            for row in rows:
-                play = {
-                    "local": home,
-                    "visitor": visitor,
-                    "period": period,
-                    "time": None,
-                    "player": None,
-                    "action": None,
-                    "side": None,
-                    "score_home": score_home,
-                    "score_away": score_away
-                }
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "button.play-by-play-buttons-list_button__wkQqw"))
+            )
 
-                # 🟥 Jugada con bloque EXTENSIVO (anota)
-                try:
-                    block = row.find_element(By.CSS_SELECTOR, "div.play-by-play-content-list-item-extensive_block__ZBIPh")
-
-                    play["score_home"] = block.find_elements(By.CSS_SELECTOR, "p.play-by-play-score-stats_statsItemText__NKUQq")[0].text.strip()
-                    play["score_away"] = block.find_elements(By.CSS_SELECTOR, "p.play-by-play-score-stats_statsItemText__NKUQq")[1].text.strip()
-                    play["time"] = block.find_element(By.CSS_SELECTOR, "span.play-by-play-content-list-item-extensive_timeText__3qSiy").text.strip()
-
-                    for side_css, side_label in [("right", visitor), ("left", home)]:
-                        try:
-                            text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_right']")
-                            play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
-                            play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
-                            play["side"] = visitor
-                        except NoSuchElementException:
-                            try:
-                                text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_left']")
-                                play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
-                                play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
-                                play["side"] = home
-                            except NoSuchElementException:
-                                pass
+            # Cerrar cookies si aparece
+            try:
+                WebDriverWait(driver, 3).until(
+                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
+                ).click()
+            except:
+                pass
+
+            waits.wait_for_stable_count(driver, PLAY_ROWS_SELECTOR)
+
+            # Obtener nombres de equipos
+            try:
+                home = driver.find_element(By.CSS_SELECTOR, ".play-by-play-final-score_team__gIR7R:nth-child(1) img").get_attribute("alt").strip()
+                visitor = driver.find_element(By.CSS_SELECTOR, ".play-by-play-final-score_team__gIR7R:nth-child(3) img").get_attribute("alt").strip()
+            except:
+                home, visitor = "home", "visitor"
+            snapshots["home"], snapshots["visitor"] = home, visitor
+
+            buttons = [
+                btn for btn in driver.find_elements(By.CSS_SELECTOR, "button.play-by-play-buttons-list_button__wkQqw")
+                if btn.is_enabled()
+            ]
+
+            for btn in buttons:
+                period = btn.text.strip()
+                driver.execute_script("arguments[0].click();", btn)
+                waits.wait_for_active_period(driver, PERIOD_BUTTONS_SELECTOR, period)
+                waits.wait_for_dom_settled(driver, PLAY_LIST_SELECTOR)
+
+                if engine == "selenium":
+                    with tracing.stage("scrap.dom_read", "scrap"):
+                        rows = driver.find_elements(By.CSS_SELECTOR, "ul.play-by-play-content-list_list__IAELd > li")
+                        period_plays = parse_play_by_play_elements(rows, period, home, visitor)
+                else:
+                    # Una sola lectura del DOM por cuarto; el parseo se hace en local
+                    with tracing.stage("scrap.dom_read", "scrap"):
+                        page_source = driver.page_source
+                    with tracing.stage("scrap.parse", "scrap"):
+                        period_plays = parse_play_by_play_html(page_source, period, home, visitor)
+                    snapshots["periods"].append((period, page_source))
+
+                for play in period_plays:
                     print(play)
-                    plays.append(play)
-                    continue
-                except:
-                    pass
+                if period_plays:
+                    last_plays = period_plays
+                plays_read.extend(period_plays)
+                yield period, period_plays
 
-                # 🟨 Jugada SIMPLE sin anotación
-                try:
-                    block = row.find_element(By.CSS_SELECTOR, "div.play-by-play-content-list-item_block__zk9Ab")
+            all_periods_read = True
 
-                    # Tiempo
-                    try:
-                        play["time"] = block.find_element(By.CSS_SELECTOR, "span.play-by-play-content-list-item_timeText__Ye2xJ").text.strip()
-                    except:
-                        pass
+        except Exception as e:
+            print(f"❌ Error al procesar {game_url}: {e}")
 
-                    try:
-                        # Intentar RIGHT
-                        text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_right']")
-                        play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
-                        play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
-                        play["side"] = visitor
-                    except NoSuchElementException:
-                        try:
-                            # Intentar LEFT
-                            text_block = block.find_element(By.CSS_SELECTOR, "[class*='textBlock_left']")
-                            play["player"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_name__dTOhQ").text.strip()
-                            play["action"] = text_block.find_element(By.CSS_SELECTOR, "p.play-by-play-info-text_stat__vapMZ").text.strip()
-                            play["side"] = home
-                        except NoSuchElementException:
-                            pass
-                    print(play)
-                    plays.append(play)
-                except:
-                    continue
+    finally:
+        if owns_driver:
+            driver.quit()
 
-    except Exception as e:
-        print(f"❌ Error al procesar {game_url}: {e}")
+    # Solo se guarda en caché un partido leído entero. Se fija (ya no caduca) si parece terminado
+    # y la lectura anterior, ya caducada, tenía las mismas jugadas
+    if cache is not None and all_periods_read and last_plays and snapshots["periods"]:
+        final = game_is_final(last_plays) and _same_as_previous(cache, page_url, tournament_id, plays_read)
+        cache.put_json(page_url, snapshots, tournament_id=tournament_id, pinned=final)
 
-    driver.quit()
+@tracing.traced("scrap")
+def scrap_play_by_plays(game_url, driver=None, engine="soup", backend="browser", cache=None):
+    plays = []
+    for _, period_plays in iter_play_by_plays(game_url, driver=driver, engine=engine, backend=backend, cache=cache):
+        plays.extend(period_plays)
     return plays
 
-def clean_play_by_plays(play_by_plays):
-    cleaned = []
-    quarters = {}
-    last_known_score = {"home": "0", "away": "0"}
-    players_on_court = {"home": [], "away": []}
+@tracing.traced("scrap")
+def scrap_play_by_plays_parallel(games_urls, pool, workers=None, retries=2, cache=None):
+    # Reparte los partidos entre varios navegadores del pool; el resultado mantiene el orden de games_urls
+    workers = workers or pool.size
+    latencies = [None] * len(games_urls)
+    attempts = [0] * len(games_urls)
+
+    def scrap_game(index):
+        game_name, game_url = games_urls[index]
+        start = time.perf_counter()
+        plays = []
+
+        if play_by_plays_cached(game_url, cache):
+            # Copia en caché (o modo offline): no hace falta ocupar un navegador
+            attempts[index] = 1
+            plays = scrap_play_by_plays(game_url=game_url, cache=cache)
+            latencies[index] = time.perf_counter() - start
+            return game_name, plays
+
+        for attempt in range(1, retries + 2):
+            attempts[index] = attempt
+            try:
+                with pool.driver() as driver:
+                    plays = scrap_play_by_plays(game_url=game_url, driver=driver, cache=cache)
+            except Exception as e:
+                print(f"⚠️ Intento {attempt} fallido en {game_name}: {e}")
+                plays = []
+            if plays:
+                break
+            if attempt <= retries:
+                print(f"🔁 Reintentando {game_name} ({attempt}/{retries})")
+        latencies[index] = time.perf_counter() - start
+        return game_name, plays
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(scrap_game, range(len(games_urls))))
+    elapsed = time.perf_counter() - start
+
+    done = [lat for lat in latencies if lat is not None]
+    stats = {
+        "games": len(games_urls),
+        "failed": sum(1 for _, plays in results if not plays),
+        "retries": sum(a - 1 for a in attempts),
+        "workers": workers,
+        "elapsed": elapsed,
+        "games_per_minute": len(games_urls) / elapsed * 60 if elapsed else 0.0,
+        "latency_mean": statistics.mean(done) if done else 0.0,
+        "latency_p50": statistics.median(done) if done else 0.0,
+        "latency_max": max(done) if done else 0.0,
+    }
+    print(
+        f"⏱️ {stats['games']} partidos en {elapsed:.1f}s con {workers} navegadores "
+        f"({stats['games_per_minute']:.1f} partidos/min, latencia media {stats['latency_mean']:.1f}s, "
+        f"p50 {stats['latency_p50']:.1f}s, máx {stats['latency_max']:.1f}s, "
+        f"reintentos {stats['retries']}, fallidos {stats['failed']})"
+    )
+    return results, stats
+
+# Claves de ACTION_CODES de más larga a más corta, compiladas una sola vez al importar.
+# En cada posición la alternancia prueba primero la clave más larga y al final gana la de
+# mayor prioridad de todo el texto, igual que recorrer la lista ordenada con `in`.
+ACTION_KEYS_BY_LENGTH = sorted(ACTION_CODES.keys(), key=len, reverse=True)
+_ACTION_KEY_RANKS = {key: rank for rank, key in enumerate(ACTION_KEYS_BY_LENGTH)}
+
+def _action_keys_overlap():
+    # ¿Puede una clave prioritaria empezar dentro de otra que ya ha consumido texto?
+    for rank, key in enumerate(ACTION_KEYS_BY_LENGTH):
+        for better in ACTION_KEYS_BY_LENGTH[:rank]:
+            if any(key.endswith(better[:i]) for i in range(1, min(len(key), len(better)))):
+                return True
+    return False
+
+_ACTION_ALTERNATION = "|".join(re.escape(key) for key in ACTION_KEYS_BY_LENGTH)
+# Sin solapamientos basta con una búsqueda normal; si no, lookahead para encontrarlas todas
+ACTION_PATTERN = re.compile(f"(?=({_ACTION_ALTERNATION}))" if _action_keys_overlap() else f"({_ACTION_ALTERNATION})")
+
+@lru_cache(maxsize=8192)
+def classify_action(action):
+    # Coincidencia exacta (p. ej. "Def Rebound") sin pasar por la expresión regular
+    code = ACTION_CODES.get(action)
+    if code is not None:
+        return code
+
+    found = ACTION_PATTERN.findall(action)
+    if not found:
+        return "UNKNOWN"
+    return ACTION_CODES[min(found, key=_ACTION_KEY_RANKS.__getitem__)]
+
+class LineupTracker:
+    # Quintetos en pista de cada lado durante la limpieza del jugada a jugada.
+    #
+    # Un jugador que aparece sin evento "IN" se da por en pista desde el principio del
+    # periodo: en vez de recorrer hacia atrás todas las filas ya limpias cada vez, se
+    # apunta el evento y al cerrar el periodo se rellena todo en una sola pasada inversa.
+    # Los quintetos se guardan como tuplas internadas compartidas entre filas.
+
+    SIDES = ("home", "away")
+
+    def __init__(self):
+        self._interned = {}
+        self.stints = []
+        self.reset()
+        self.start_period(None)
+
+    def reset(self):
+        self.on_court = {side: [] for side in self.SIDES}
+        self._on_court_set = {side: set() for side in self.SIDES}
+
+    def start_period(self, period):
+        self.period = period
+        self._snapshots = {side: [] for side in self.SIDES}
+        self._backfills = {side: [] for side in self.SIDES}
+        self._rows = 0
+
+    def sub_in(self, side, player):
+        if player not in self._on_court_set[side]:
+            self.on_court[side].append(player)
+            self._on_court_set[side].add(player)
+
+    def sub_out(self, side, player):
+        if player in self._on_court_set[side]:
+            self.on_court[side].remove(player)
+            self._on_court_set[side].discard(player)
+
+    def saw_player(self, side, player):
+        # Acción normal → considerar jugador como en pista (y en las filas anteriores del periodo)
+        if player not in self._on_court_set[side] and len(self.on_court[side]) < 5:
+            self.on_court[side].append(player)
+            self._on_court_set[side].add(player)
+            self._backfills[side].append((self._rows, player))
+
+    def snapshot(self):
+        for side in self.SIDES:
+            self._snapshots[side].append(tuple(self.on_court[side]))
+        self._rows += 1
+
+    def _intern(self, lineup):
+        return self._interned.setdefault(lineup, lineup)
+
+    def finish_period(self, first_row=0):
+        # Devuelve el quinteto final de cada fila del periodo y registra los stints
+        lineups = {}
+        for side in self.SIDES:
+            snapshots = self._snapshots[side]
+            events = self._backfills[side]
+            result = [None] * len(snapshots)
+
+            # tail = primeros jugadores (máx. 5, en orden) que aparecen después de la fila r
+            tail = []
+            e = len(events) - 1
+            for r in range(len(snapshots) - 1, -1, -1):
+                while e >= 0 and events[e][0] > r:
+                    tail.insert(0, events[e][1])
+                    del tail[5:]
+                    e -= 1
+                snapshot = snapshots[r]
+                missing = 5 - len(snapshot)
+                lineup = snapshot + tuple(tail[:missing]) if missing > 0 and tail else snapshot
+                result[r] = self._intern(lineup)
+
+            # Stints: filas consecutivas que comparten el mismo quinteto
+            for r, lineup in enumerate(result):
+                if r and lineup is result[r - 1]:
+                    self.stints[-1]["end"] = first_row + r
+                else:
+                    self.stints.append({"period": self.period, "side": side, "lineup": lineup, "start": first_row + r, "end": first_row + r})
 
-    # Agrupar por cuarto
-    for play in play_by_plays:
-        quarters.setdefault(play["period"], []).append(play)
+            lineups[side] = result
+        return lineups["home"], lineups["away"]
 
-    period_map = {
-        "1er Cuarto": 1,
-        "2º Cuarto": 2,
-        "3er Cuarto": 3,
-        "4º Cuarto": 4,
-        "Prórroga": 5,
-    }
 
-    for period_name in sorted(quarters.keys(), key=lambda x: period_map.get(x, 99)):
-        period_number = period_map.get(period_name, period_name)
-        period_plays = list(reversed(quarters[period_name]))
+PERIOD_NUMBERS = {
+    "1er Cuarto": 1,
+    "2º Cuarto": 2,
+    "3er Cuarto": 3,
+    "4º Cuarto": 4,
+    "Prórroga": 5,
+}
+
+
+class PlayByPlayCleaner:
+    # Limpieza incremental, cuarto a cuarto: el marcador y los quintetos pasan de un
+    # cuarto al siguiente, así se puede limpiar a medida que llega cada cuarto del scraper.
+
+    def __init__(self):
+        self.last_known_score = {"home": "0", "away": "0"}
+        self.lineups = LineupTracker()
+        self.rows = 0
+
+    @tracing.traced("scrap", name="scrap.clean_period")
+    def feed_period(self, period_name, period_plays):
+        # period_plays en el orden de la web (la jugada más reciente primero)
+        if not period_plays:
+            return []
+
+        cleaned = []
+        period_number = PERIOD_NUMBERS.get(period_name, period_name)
+        period_plays = list(reversed(period_plays))
+        last_known_score = self.last_known_score
+        lineups = self.lineups
 
         local_team = period_plays[0]["local"]
-        visitor_team = period_plays[0]["visitor"]
 
         # Reiniciar score y quintetos solo en primer cuarto
         if period_number == 1:
-            last_known_score = {"home": "0", "away": "0"}
-            players_on_court = {"home": [], "away": []}
+            last_known_score["home"], last_known_score["away"] = "0", "0"
+            lineups.reset()
+        lineups.start_period(period_number)
 
         i = 0
         while i < len(period_plays):
             play = period_plays[i]
             side = "home" if play["side"] == local_team else "away"
-            opponent = "away" if side == "home" else "home"
 
             player = play["player"]
             action = play["action"] or ""
@@ -366,13 +790,7 @@ def clean_play_by_plays(play_by_plays):
                 last_known_score["away"] = score_away_play
 
             # Mapear acción a código (preferencia por coincidencias más largas)
-            action_code = None
-            for key in sorted(ACTION_CODES.keys(), key=len, reverse=True):
-                if key in action:
-                    action_code = ACTION_CODES[key]
-                    break
-            if not action_code:
-                action_code = "UNKNOWN"
+            action_code = classify_action(action)
 
             # Si no hay jugador pero hay acción, poner TEAM
             if not player:
@@ -380,13 +798,11 @@ def clean_play_by_plays(play_by_plays):
 
             # Manejar sustituciones (no se añaden al cleaned)
             if action_code == "IN":
-                if player not in players_on_court[side]:
-                    players_on_court[side].append(player)
+                lineups.sub_in(side, player)
                 i += 1
                 continue
             elif action_code == "OUT":
-                if player in players_on_court[side]:
-                    players_on_court[side].remove(player)
+                lineups.sub_out(side, player)
                 i += 1
                 continue
 
@@ -396,31 +812,21 @@ def clean_play_by_plays(play_by_plays):
                 next_action = next_play["action"] or ""
                 next_player = next_play["player"]
 
-                for key in sorted(ACTION_CODES.keys(), key=len, reverse=True):
-                    if key in next_action:
-                        next_code = ACTION_CODES[key]
-                        break
-                else:
-                    next_code = "UNKNOWN"
+                next_code = classify_action(next_action)
 
                 if next_code in {"FTM", "FTA"} and next_player == player:
                     action_code = "PFRecShot"
 
-            # Acción normal → considerar jugador como en pista
-            if player and player not in players_on_court[side] and player != "TEAM":
-                if len(players_on_court[side]) < 5:
-                    players_on_court[side].append(player)
-                    # Añadir retroactivamente
-                    for prev_play in reversed(cleaned):
-                        if prev_play["period"] == period_number and len(prev_play[f"players_on_court_{side}"]) < 5:
-                            prev_play[f"players_on_court_{side}"].append(player)
+            # Acción normal → considerar jugador como en pista (relleno retroactivo al cerrar el periodo)
+            if player != "TEAM":
+                lineups.saw_player(side, player)
 
             # Omitir jugadas TEAM + UNKNOWN
             if player == "TEAM" and action_code == "UNKNOWN":
                 i += 1
                 continue
 
-            cleaned_play = {
+            cleaned.append({
                 "period": period_number,
                 "time": play["time"],
                 "player": player,
@@ -428,11 +834,39 @@ def clean_play_by_plays(play_by_plays):
                 "side": play["side"],
                 "score_home": last_known_score["home"],
                 "score_away": last_known_score["away"],
-                "players_on_court_home": list(players_on_court["home"]),
-                "players_on_court_away": list(players_on_court["away"]),
-            }
-
-            cleaned.append(cleaned_play)
+                "players_on_court_home": None,
+                "players_on_court_away": None,
+            })
+            lineups.snapshot()
             i += 1
 
+        home_lineups, away_lineups = lineups.finish_period(first_row=self.rows)
+        for cleaned_play, home_lineup, away_lineup in zip(cleaned, home_lineups, away_lineups):
+            cleaned_play["players_on_court_home"] = home_lineup
+            cleaned_play["players_on_court_away"] = away_lineup
+
+        self.rows += len(cleaned)
+        return cleaned
+
+
+@tracing.traced("scrap")
+def clean_play_by_plays(play_by_plays):
+    cleaned = []
+    quarters = {}
+
+    # Agrupar por cuarto
+    for play in play_by_plays:
+        quarters.setdefault(play["period"], []).append(play)
+
+    cleaner = PlayByPlayCleaner()
+    for period_name in sorted(quarters.keys(), key=lambda x: PERIOD_NUMBERS.get(x, 99)):
+        cleaned.extend(cleaner.feed_period(period_name, quarters[period_name]))
+
     return cleaned
+
+
+def stream_play_by_plays(game_url, driver=None, engine="soup", backend="browser", cache=None):
+    # Pipeline en streaming: (cuarto, jugadas en bruto, jugadas limpias) cuarto a cuarto
+    cleaner = PlayByPlayCleaner()
+    for period, period_plays in iter_play_by_plays(game_url, driver=driver, engine=engine, backend=backend, cache=cache):
+        yield period, period_plays, cleaner.feed_period(period, period_plays)
@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import threading
+import time
+
+import export
+import scrap
+import team_stats
+from config.utils import TOURNAMENT_IDENTIFIERS
+
+# Ingesta de una temporada completa (varios torneos) en una sola ejecución.
+#
+# En vez de recorrer los torneos uno detrás de otro, todo el trabajo va a una única cola de
+# prioridad que comparten los navegadores del DriverPool:
+#
+#   teams     → lista de equipos del torneo; genera un trabajo box_score por equipo
+#   games     → calendario del torneo; genera un trabajo game por partido
+#   box_score → estadísticas acumuladas de un equipo
+#   game      → jugada a jugada de un partido (sin navegador si está en caché)
+#
+# Primero se descubren los calendarios y equipos de todos los torneos (así la cola se llena
+# cuanto antes) y después se reparten los trabajos por prioridad de torneo. Los navegadores no
+# se quedan esperando a que acabe un torneo, de modo que la temporada tarda lo que el torneo
+# más largo y no la suma. Las salidas se escriben por torneo en files/tournaments/<torneo>/.
+
+DISCOVERY_JOBS = ("teams", "games")
+
+
+class SeasonScheduler:
+
+    def __init__(self, tournaments, pool, cache=None, store=None, index=None, workers=None, retries=2, warehouse=None):
+        # tournaments: {tournament_id: prioridad} (menor = antes)
+        self.tournaments = tournaments
+        self.pool = pool
+        self.cache = cache
+        self.store = store
+        self.index = index
+        self.warehouse = warehouse
+        self.workers = workers or pool.size
+        self.retries = retries
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._pending = 0
+        self._cond = threading.Condition()
+
+        self.players_box_scores = {t: [] for t in tournaments}
+        self.team_box_scores = {t: [] for t in tournaments}
+        self.team_order = {t: [] for t in tournaments}
+        self.games = {t: 0 for t in tournaments}
+        self.failed = {t: [] for t in tournaments}
+        self.jobs = {t: 0 for t in tournaments}
+        self.busy = {t: 0.0 for t in tournaments}
+        self.spans = {}
+        self.retried = 0
+
+    def submit(self, kind, tournament_id, payload=None, attempt=1):
+        stage = 0 if kind in DISCOVERY_JOBS else 1
+        with self._cond:
+            heapq.heappush(
+                self._queue,
+                ((stage, self.tournaments[tournament_id], next(self._seq)), kind, tournament_id, payload, attempt),
+            )
+            self._pending += 1
+            self._cond.notify()
+
+    def _next(self):
+        with self._cond:
+            while not self._queue and self._pending:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            return heapq.heappop(self._queue)
+
+    def _done(self):
+        with self._cond:
+            self._pending -= 1
+            if not self._pending:
+                self._cond.notify_all()
+
+    def _run(self, kind, tournament_id, payload):
+        # Devuelve False si el trabajo no produjo nada y merece reintento
+        if kind == "teams":
+            with self.pool.driver() as driver:
+                teams_urls = scrap.scrap_urls_teams(tournament_id, driver=driver)
+            self.team_order[tournament_id] = [team_name for team_name, _ in teams_urls]
+            for team in teams_urls:
+                self.submit("box_score", tournament_id, team)
+            return bool(teams_urls)
+
+        if kind == "games":
+            with self.pool.driver() as driver:
+                games_urls = scrap.scrap_urls_games(tournament_id, driver=driver, cache=self.cache)
+            for game in games_urls:
+                self.submit("game", tournament_id, game)
+            return bool(games_urls)
+
+        if kind == "box_score":
+            with self.pool.driver() as driver:
+                players, teams = scrap.scrap_box_scores([payload], driver=driver)
+            with self._cond:
+                self.players_box_scores[tournament_id] += players
+                self.team_box_scores[tournament_id] += teams
+            return bool(teams)
+
+        game_name, game_url = payload
+        if scrap.play_by_plays_cached(game_url, self.cache):
+            play_by_plays = scrap.scrap_play_by_plays(game_url=game_url, cache=self.cache)
+        else:
+            with self.pool.driver() as driver:
+                play_by_plays = scrap.scrap_play_by_plays(game_url=game_url, driver=driver, cache=self.cache)
+        if not play_by_plays:
+            return False
+
+        # El mismo cruce de equipos puede estar en dos torneos: no se pisan sus ficheros ni su id
+        if self.index is not None:
+            game_name = self.index.claim(game_name, tournament_id)
+        export.save_csv_play_by_plays_raw(game_name=game_name, game_plays=play_by_plays)
+        cleaned_play_by_plays = scrap.clean_play_by_plays(play_by_plays)
+        export.save_csv_play_by_plays_clean(
+            game_name=game_name,
+            game_plays=cleaned_play_by_plays,
+            tournament_id=tournament_id,
+            store=self.store,
+            index=self.index,
+            home=play_by_plays[0]["local"],
+            visitor=play_by_plays[0]["visitor"],
+            warehouse=self.warehouse,
+        )
+        with self._cond:
+            self.games[tournament_id] += 1
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            _, kind, tournament_id, payload, attempt = job
+
+            start = time.perf_counter()
+            try:
+                ok = self._run(kind, tournament_id, payload)
+            except Exception as e:
+                print(f"⚠️ {tournament_id} · {kind} {payload[0] if payload else ''}: intento {attempt} fallido: {e}")
+                ok = False
+            end = time.perf_counter()
+
+            with self._cond:
+                self.jobs[tournament_id] += 1
+                self.busy[tournament_id] += end - start
+                first, last = self.spans.get(tournament_id, (start, end))
+                self.spans[tournament_id] = (min(first, start), max(last, end))
+
+            if not ok:
+                if attempt <= self.retries:
+                    with self._cond:
+                        self.retried += 1
+                    print(f"🔁 Reintentando {tournament_id} · {kind} {payload[0] if payload else ''} ({attempt}/{self.retries})")
+                    self.submit(kind, tournament_id, payload, attempt + 1)
+                else:
+                    with self._cond:
+                        self.failed[tournament_id].append((kind, payload[0] if payload else None))
+            self._done()
+
+    def run(self):
+        for tournament_id in sorted(self.tournaments, key=self.tournaments.get):
+            self.submit("games", tournament_id)
+            self.submit("teams", tournament_id)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+        return self
+
+    def box_scores(self, tournament_id):
+        # Box scores en el orden de la página de equipos (los trabajos terminan en cualquier orden)
+        order = {team: i for i, team in enumerate(self.team_order[tournament_id])}
+        by_team = lambda item: order.get(item["team_name"], len(order))
+        return (
+            sorted(self.players_box_scores[tournament_id], key=by_team),
+            sorted(self.team_box_scores[tournament_id], key=by_team),
+        )
+
+    def report(self):
+        spans = {t: last - first for t, (first, last) in self.spans.items()}
+        for tournament_id in sorted(self.tournaments, key=self.tournaments.get):
+            print(
+                f"🏆 {tournament_id}: {self.jobs[tournament_id]} trabajos, {self.games[tournament_id]} partidos, "
+                f"{len(self.team_box_scores[tournament_id])} equipos en {spans.get(tournament_id, 0.0):.1f}s "
+                f"(ocupado {self.busy[tournament_id]:.1f}s, fallidos {len(self.failed[tournament_id])})"
+            )
+        longest = max(spans.values(), default=0.0)
+        print(
+            f"⏱️ Temporada en {self.elapsed:.1f}s con {self.workers} navegadores · torneo más largo {longest:.1f}s, "
+            f"trabajo acumulado {sum(self.busy.values()):.1f}s, reintentos {self.retried}"
+        )
+
+
+def season_tournaments(keys=None, priorities=None):
+    # keys: claves de TOURNAMENT_IDENTIFIERS (None = todas); priorities: {clave: prioridad}
+    keys = list(keys or TOURNAMENT_IDENTIFIERS)
+    unknown = [key for key in keys if key not in TOURNAMENT_IDENTIFIERS]
+    if unknown:
+        raise ValueError(f"Torneos desconocidos: {', '.join(unknown)} (opciones: {', '.join(TOURNAMENT_IDENTIFIERS)})")
+    priorities = priorities or {}
+    return {TOURNAMENT_IDENTIFIERS[key]: priorities.get(key, i) for i, key in enumerate(keys)}
+
+
+def refresh_season(keys, pool, cache=None, store=None, index=None, workers=None, priorities=None, retries=2, warehouse=None):
+    tournaments = season_tournaments(keys, priorities)
+    print(f"🗓️ Temporada: {', '.join(tournaments)} con {workers or pool.size} navegadores")
+    scheduler = SeasonScheduler(
+        tournaments, pool, cache=cache, store=store, index=index, workers=workers, retries=retries,
+        warehouse=warehouse,
+    ).run()
+
+    # Box scores y box score defensivo de cada torneo en files/tournaments/<torneo>/
+    for tournament_id in tournaments:
+        if not scheduler.team_box_scores[tournament_id]:
+            print(f"⚠️ Sin box scores para {tournament_id}")
+            continue
+        players_box_scores, team_box_scores = scheduler.box_scores(tournament_id)
+        export.save_csv_players_total_box_score(players_box_scores, tournament_id=tournament_id, warehouse=warehouse)
+        export.save_csv_team_total_box_score(team_box_scores, tournament_id=tournament_id, warehouse=warehouse)
+        team_box_scores_defensive = team_stats.get_team_defensive_stats_from_play_by_plays(
+            play_by_play_folder="files/play_by_plays",
+            team_list_csv=f"files/tournaments/{tournament_id}/team_total_box_score.csv",
+            store=store,
+            tournaments=[tournament_id],
+            index=index,
+        )
+        export.save_csv_team_defensive_box_score(team_box_scores_defensive, tournament_id=tournament_id, warehouse=warehouse)
+
+    scheduler.report()
+    return scheduler
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+import pandas as pd
+
+import export
+import scrap
+import team_stats
+
+# Sincronización incremental de un torneo: solo se scrapean, limpian y exportan
+# los partidos nuevos o que han cambiado desde la última ejecución.
+#
+# El manifiesto (files/games_manifest.json) guarda por partido su URL, jornada, número de
+# periodos, marcador final, hash del contenido y su aportación a los box scores
+# defensivos, de modo que los agregados se actualizan restando la aportación vieja
+# y sumando la nueva.
+#
+# Un partido solo se marca como terminado (y deja de revisarse) cuando tiene pinta de
+# terminado y dos lecturas de la web (no de la caché de páginas), separadas al menos
+# FINAL_CONFIRM_SECONDS, devuelven el mismo contenido. Cada sincronización empieza en la
+# jornada más antigua que aún tiene algún partido sin terminar.
+
+MANIFEST_PATH = "./files/games_manifest.json"
+FINAL_CONFIRM_SECONDS = 15 * 60
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"tournaments": {}, "games": {}, "defensive_totals": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def hash_plays(plays):
+    return hashlib.sha256(json.dumps(plays, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _apply_defensive_delta(totals, counts, sign):
+    for team, stats in counts.items():
+        team_totals = Counter(totals.get(team, {}))
+        for field, value in stats.items():
+            team_totals[field] += sign * value
+        totals[team] = {field: value for field, value in team_totals.items() if value}
+
+
+def sync_tournament(tournament_id, pool, cache=None, workers=4, manifest_path=MANIFEST_PATH, store=None, index=None,
+                    warehouse=None):
+    manifest = load_manifest(manifest_path)
+    tournament_state = manifest["tournaments"].setdefault(tournament_id, {"last_round": 1})
+    games = manifest["games"]
+
+    # Solo se recorren las jornadas desde la más antigua con partidos sin terminar
+    start_round = tournament_state["last_round"]
+    round_counts = {}
+    game_rounds = {}
+    with pool.driver() as driver:
+        games_urls = scrap.scrap_urls_games(
+            tournament_id,
+            driver=driver,
+            cache=cache,
+            start_round=start_round,
+            round_counts=round_counts,
+            game_rounds=game_rounds,
+        )
+
+    pending = [
+        (game_name, game_url) for game_name, game_url in games_urls
+        if not (game_name in games and games[game_name]["url"] == game_url and games[game_name]["final"])
+    ]
+    print(f"🔄 {len(games_urls)} partidos en el calendario, {len(pending)} por revisar")
+
+    # Los partidos sin terminar se leen de la web: una copia en caché de hace menos de TTL no es
+    # una segunda lectura y no puede confirmar que el partido haya terminado
+    for _, game_url in pending:
+        scrap.expire_play_by_plays(game_url, cache)
+    games_play_by_plays, _ = scrap.scrap_play_by_plays_parallel(pending, pool, workers=workers, cache=cache)
+
+    changed_teams = set()
+    changed_games = 0
+    for (game_name, game_url), (_, play_by_plays) in zip(pending, games_play_by_plays):
+        if not play_by_plays:
+            continue
+
+        content_hash = hash_plays(play_by_plays)
+        previous = games.get(game_name)
+        entry = scrap.play_by_plays_entry(game_url, cache)
+        fetched_at = entry["fetched_at"] if entry else time.time()
+        if previous and previous["hash"] == content_hash:
+            # Mismo contenido que la primera lectura que lo trajo (fetched_at se guarda solo al
+            # cambiar) y con pinta de terminado, o la caché ya lo fijó: ya no se vuelve a revisar
+            new_read = fetched_at - previous.get("fetched_at", fetched_at) >= FINAL_CONFIRM_SECONDS
+            if (entry and entry["pinned"]) or (new_read and scrap.game_is_final(play_by_plays)):
+                previous["final"] = True
+            continue
+
+        # Nombre de exportación: distinto del de la lista si el cruce ya es de otro torneo
+        export_name = index.claim(game_name, tournament_id) if index is not None else game_name
+        export.save_csv_play_by_plays_raw(game_name=export_name, game_plays=play_by_plays)
+        cleaned_play_by_plays = scrap.clean_play_by_plays(play_by_plays)
+        home, visitor = play_by_plays[0]["local"], play_by_plays[0]["visitor"]
+        export.save_csv_play_by_plays_clean(
+            game_name=export_name,
+            game_plays=cleaned_play_by_plays,
+            tournament_id=tournament_id,
+            store=store,
+            index=index,
+            home=home,
+            visitor=visitor,
+            warehouse=warehouse,
+        )
+
+        df_game = pd.DataFrame(cleaned_play_by_plays, columns=["side", "action_code"])
+        counts = team_stats.get_game_defensive_counts(df_game, [home, visitor])
+
+        if previous:
+            _apply_defensive_delta(manifest["defensive_totals"], previous["defensive"], -1)
+        _apply_defensive_delta(manifest["defensive_totals"], counts, +1)
+
+        last = cleaned_play_by_plays[-1] if cleaned_play_by_plays else {"score_home": "0", "score_away": "0"}
+        games[game_name] = {
+            "url": game_url,
+            "tournament": tournament_id,
+            "home": home,
+            "visitor": visitor,
+            "periods": len({play["period"] for play in play_by_plays}),
+            "final_score": [last["score_home"], last["score_away"]],
+            "round": game_rounds.get(game_url, previous.get("round", start_round) if previous else start_round),
+            "final": False,
+            "hash": content_hash,
+            "fetched_at": fetched_at,
+            "rows": len(cleaned_play_by_plays),
+            "defensive": {team: dict(stats) for team, stats in counts.items()},
+        }
+        changed_teams.update([home, visitor])
+        changed_games += 1
+
+    # La próxima sincronización empieza en la jornada más antigua con algún partido sin terminar
+    # (si están todos terminados, en la última jornada con partidos)
+    unfinished_rounds = [
+        game_rounds.get(game_url, games.get(game_name, {}).get("round", start_round))
+        for game_name, game_url in games_urls
+        if not games.get(game_name, {}).get("final")
+    ]
+    played_rounds = [round_number for round_number, count in round_counts.items() if count]
+    if unfinished_rounds:
+        tournament_state["last_round"] = min(unfinished_rounds)
+    elif played_rounds:
+        tournament_state["last_round"] = max(played_rounds)
+
+    if changed_teams:
+        # Box scores acumulados: solo se vuelven a leer las páginas de los equipos afectados
+        with pool.driver() as driver:
+            teams_urls = [t for t in scrap.scrap_urls_teams(tournament_id, driver=driver) if t[0] in changed_teams]
+        with pool.driver() as driver:
+            players_box_scores, team_box_scores = scrap.scrap_box_scores(teams_urls, driver=driver)
+        export.update_csv_players_total_box_score(players_box_scores, warehouse=warehouse)
+        export.update_csv_team_total_box_score(team_box_scores, warehouse=warehouse)
+
+        update_defensive_box_score(manifest, warehouse=warehouse)
+
+    save_manifest(manifest, manifest_path)
+    print(f"✅ Sincronización de {tournament_id}: {changed_games} partidos nuevos o modificados, {len(changed_teams)} equipos actualizados")
+    return manifest
+
+
+def update_defensive_box_score(manifest, team_list_csv="./files/team_total_box_score.csv", warehouse=None):
+    # Reconstruye el CSV defensivo desde los acumulados del manifiesto, sin releer los partidos
+    team_names = pd.read_csv(team_list_csv, encoding="utf-8-sig")["team_name"].tolist()
+    df_def = team_stats.build_team_defensive_stats(manifest["defensive_totals"], team_names)
+    export.save_csv_team_defensive_box_score(df_def, warehouse=warehouse)
+    return df_def
@@ -0,0 +1,352 @@
+import random
+import re
+from collections import defaultdict
+
+import http_backend
+
+# Torneos sintéticos para ejercitar el pipeline sin la web (benchmarks, pruebas a escala).
+#
+# Cada partido se simula posesión a posesión (tiros, tiros libres, rebotes, pérdidas, robos,
+# tapones, faltas, tiempos muertos y cambios) y se devuelve igual que scrap_play_by_plays:
+# dicts local/visitor/period/time/player/action/side/score_home/score_away, cada cuarto con la
+# jugada más reciente primero y el reloj en tiempo restante. Los box scores acumulados tienen
+# el mismo formato que scrap_box_scores (lista "stats" en el orden de la tabla de la web) y
+# cuadran con el jugada a jugada generado.
+#
+# Los partidos se generan de uno en uno y cada uno con su propia semilla: se pueden recorrer
+# miles sin tenerlos todos en memoria y el partido i es siempre el mismo.
+
+SYNTHETIC_TOURNAMENT = "SYN24"
+PERIODS = ["1er Cuarto", "2º Cuarto", "3er Cuarto", "4º Cuarto"]
+OVERTIME = "Prórroga"
+PERIOD_SECONDS = 600
+OVERTIME_SECONDS = 300
+
+CITIES = [
+    "Belgrade", "Milan", "Trento", "Tel Aviv", "Madrid", "Barcelona", "Munich", "Ulm", "Istanbul", "Kaunas",
+    "Athens", "Paris", "Vitoria", "Valencia", "Zagreb", "Lyon", "Berlin", "Bologna", "Malaga", "Ljubljana",
+]
+FIRST_NAMES = [
+    "LUKA", "NIKOLA", "MARKO", "ANDREJ", "STEFAN", "LUIGI", "DIEGO", "OMAR", "HUGO", "PABLO", "MATEO", "JONAS",
+    "NOAH", "ELIJAH", "TOMAS", "ARDA", "EMRE", "YANIS", "THEO", "MILAN", "FILIP", "DAVID", "ALEX", "SAVA",
+]
+SURNAMES = [
+    "JOVIC", "PETROVIC", "ROSSI", "GARCIA", "MULLER", "YILMAZ", "PAPADOPOULOS", "MARTIN", "KOVAC", "NOVAK",
+    "HORVAT", "LOPEZ", "BIANCHI", "SCHMIDT", "DEMIR", "DUBOIS", "FERNANDEZ", "MARKOVIC", "LEHMANN", "COHEN",
+    "LEVI", "SILVA", "MORENO", "WEBER", "KAYA", "BERNARD", "RICCI", "STOJANOVIC", "VIDAL", "NIKOLIC",
+]
+
+
+def _clock(seconds):
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def _box_name(name):
+    # "PETROVIC, LUKA" (jugada a jugada) → "LUKA PETROVIC" (tabla de estadísticas)
+    surname, first = name.split(", ", 1)
+    return f"{first} {surname}"
+
+
+class _Side:
+
+    def __init__(self, team_name, roster, rng):
+        self.team_name = team_name
+        self.roster = roster
+        self.on_court = list(roster[:5])
+        self.lines = defaultdict(lambda: defaultdict(int))
+        self.timeouts = 0
+        self.rng = rng
+
+    def pick(self):
+        # Los primeros del quinteto (más "titulares") participan un poco más
+        return self.rng.choices(self.on_court, weights=[5, 4, 4, 3, 3])[0]
+
+    def bench(self):
+        return [player for player in self.roster if player not in self.on_court]
+
+
+class _Game:
+
+    def __init__(self, home, visitor, home_roster, visitor_roster, rng):
+        self.rng = rng
+        self.home = _Side(home, home_roster, rng)
+        self.visitor = _Side(visitor, visitor_roster, rng)
+        self.score = {home: 0, visitor: 0}
+        self.period = None
+        self.clock = 0
+        self.period_plays = []
+
+    # JUGADAS
+
+    def _emit(self, side, player, action, scored=False):
+        self.period_plays.append({
+            "local": self.home.team_name,
+            "visitor": self.visitor.team_name,
+            "period": self.period,
+            "time": _clock(self.clock),
+            "player": player,
+            "action": action,
+            "side": side.team_name,
+            "score_home": str(self.score[self.home.team_name]) if scored else "",
+            "score_away": str(self.score[self.visitor.team_name]) if scored else "",
+        })
+
+    def _count(self, side, player, field, label):
+        line = side.lines[player]
+        line[field] += 1
+        self._emit(side, player, f"{label} ({line[field]})")
+
+    def _shot(self, side, player, kind, made):
+        # kind: 2, 3 o 1 (tiro libre); el texto lleva aciertos/intentos del tipo y puntos del jugador
+        made_field, attempted_field, label, missed_label = {
+            2: ("FieldGoalsMade2", "FieldGoalsAttempted2", "Two Pointer", "Missed Two Pointer"),
+            3: ("FieldGoalsMade3", "FieldGoalsAttempted3", "Three Pointer", "Missed Three Pointer"),
+            1: ("FreeThrowsMade", "FreeThrowsAttempted", "Free Throw In", "Missed Free Throw"),
+        }[kind]
+        line = side.lines[player]
+        line[attempted_field] += 1
+        if made:
+            line[made_field] += 1
+            line["Points"] += kind
+            self.score[side.team_name] += kind
+        text = f"({line[made_field]}/{line[attempted_field]} - {line['Points']} pt)"
+        self._emit(side, player, f"{label if made else missed_label} {text}", scored=made)
+
+    def _rebound(self, offense, defense):
+        # True si la posesión sigue (rebote ofensivo)
+        if self.rng.random() < 0.28:
+            if self.rng.random() < 0.06:
+                offense.lines[None]["OffensiveRebounds"] += 1
+                self._emit(offense, "", "Off Rebound (1)")
+            else:
+                self._count(offense, offense.pick(), "OffensiveRebounds", "Off Rebound")
+            return True
+        self._count(defense, defense.pick(), "DefensiveRebounds", "Def Rebound")
+        return False
+
+    def _substitutions(self, side):
+        for _ in range(self.rng.choice((1, 1, 2))):
+            bench = side.bench()
+            if not bench:
+                return
+            player_out = self.rng.choice(side.on_court)
+            player_in = self.rng.choice(bench)
+            self._emit(side, player_out, "Out")
+            self._emit(side, player_in, "In")
+            side.on_court[side.on_court.index(player_out)] = player_in
+
+    def _possession(self, offense, defense):
+        # Devuelve True si el balón cambia de equipo
+        rng = self.rng
+        r = rng.random()
+        shooter = offense.pick()
+
+        if r < 0.13:
+            self._count(offense, shooter, "Turnovers", "Turnover")
+            if rng.random() < 0.5:
+                self._count(defense, defense.pick(), "Steals", "Steal")
+            return True
+
+        if r < 0.21:
+            # Falta en el tiro: falta, falta recibida y dos tiros libres
+            self._count(defense, defense.pick(), "FoulsCommited", "Foul")
+            self._count(offense, shooter, "FoulsReceived", "Foul Drawn")
+            self._shot(offense, shooter, 1, rng.random() < 0.7)
+            made = rng.random() < 0.7
+            self._shot(offense, shooter, 1, made)
+            return made or not self._rebound(offense, defense)
+
+        if r < 0.24:
+            self._count(offense, shooter, "FoulsCommited", "Offensive Foul")
+            self._count(defense, defense.pick(), "FoulsReceived", "Foul Drawn")
+            return True
+
+        if r < 0.29:
+            # Falta sin tiros: la posesión sigue
+            self._count(defense, defense.pick(), "FoulsCommited", "Foul")
+            self._count(offense, shooter, "FoulsReceived", "Foul Drawn")
+            return False
+
+        kind = 3 if rng.random() < 0.38 else 2
+        made = rng.random() < (0.34 if kind == 3 else 0.51)
+        self._shot(offense, shooter, kind, made)
+        if made:
+            if rng.random() < 0.55:
+                passer = rng.choice([p for p in offense.on_court if p != shooter])
+                self._count(offense, passer, "Assistances", "Assist")
+            return True
+        if kind == 2 and rng.random() < 0.08:
+            self._count(offense, shooter, "BlocksAgainst", "Shot Rejected")
+            self._count(defense, defense.pick(), "BlocksFavour", "Block")
+        return not self._rebound(offense, defense)
+
+    def _play_period(self, period, seconds, offense, defense):
+        self.period = period
+        self.clock = seconds
+        self.period_plays = []
+        while self.clock > 0:
+            for side in (offense, defense):
+                if self.rng.random() < 0.07:
+                    self._substitutions(side)
+            if self.rng.random() < 0.012:
+                side = self.rng.choice((offense, defense))
+                side.timeouts += 1
+                self._emit(side, "", f"Time Out ({side.timeouts})")
+
+            elapsed = min(self.clock, self.rng.randint(5, 22))
+            self.clock -= elapsed
+            for side in (offense, defense):
+                for player in side.on_court:
+                    side.lines[player]["seconds"] += elapsed
+
+            if self._possession(offense, defense):
+                offense, defense = defense, offense
+
+        # La web lista cada cuarto con la jugada más reciente primero
+        return list(reversed(self.period_plays))
+
+    def play(self):
+        plays = []
+        offense, defense = (self.home, self.visitor) if self.rng.random() < 0.5 else (self.visitor, self.home)
+        for i, period in enumerate(PERIODS):
+            first, second = (offense, defense) if i % 2 == 0 else (defense, offense)
+            plays.extend(self._play_period(period, PERIOD_SECONDS, first, second))
+        while self.score[self.home.team_name] == self.score[self.visitor.team_name]:
+            plays.extend(self._play_period(OVERTIME, OVERTIME_SECONDS, offense, defense))
+        return plays
+
+
+def _round_robin(teams):
+    # Liga a doble vuelta por el método del círculo: en cada jornada cada equipo juega una vez
+    teams = list(teams) + ([None] if len(teams) % 2 else [])
+    n = len(teams)
+    first_leg = []
+    for round_number in range(n - 1):
+        for i in range(n // 2):
+            home, visitor = teams[i], teams[n - 1 - i]
+            if home is not None and visitor is not None:
+                first_leg.append((home, visitor) if round_number % 2 == 0 else (visitor, home))
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return first_leg + [(visitor, home) for home, visitor in first_leg]
+
+
+def _valuation(line):
+    missed = (
+        line["FieldGoalsAttempted2"] - line["FieldGoalsMade2"]
+        + line["FieldGoalsAttempted3"] - line["FieldGoalsMade3"]
+        + line["FreeThrowsAttempted"] - line["FreeThrowsMade"]
+    )
+    return (
+        line["Points"] + line["TotalRebounds"] + line["Assistances"] + line["Steals"] + line["BlocksFavour"]
+        + line["FoulsReceived"] - missed - line["Turnovers"] - line["BlocksAgainst"] - line["FoulsCommited"]
+    )
+
+
+class SyntheticTournament:
+    # tournament = SyntheticTournament(games=280, seed=1)
+    # for game_name, game_url, plays in tournament.games(): ...
+    # players_box_scores, team_box_scores = tournament.box_scores()
+
+    def __init__(self, games=28, teams=None, seed=0, tournament_id=SYNTHETIC_TOURNAMENT, roster_size=12):
+        # Cada emparejamiento (local, visitante) se juega una vez: hacen falta equipos suficientes
+        needed = 2
+        while needed * (needed - 1) < games:
+            needed += 1
+        self.n_games = games
+        self.n_teams = max(teams or 8, needed)
+        self.seed = seed
+        self.tournament_id = tournament_id
+        rng = random.Random(seed)
+
+        self.team_names = [
+            f"U18 {CITIES[i % len(CITIES)]}" + (f" {i // len(CITIES) + 1}" if i >= len(CITIES) else "")
+            for i in range(self.n_teams)
+        ]
+        self.rosters = {team: self._roster(rng, roster_size) for team in self.team_names}
+        self.dorsals = {
+            (team, player): number
+            for team, roster in self.rosters.items()
+            for player, number in zip(roster, rng.sample(range(0, 100), len(roster)))
+        }
+
+        self.schedule = _round_robin(self.team_names)[:games]
+
+        self._totals = defaultdict(lambda: defaultdict(int))
+        self._team_totals = defaultdict(lambda: defaultdict(int))
+        self._accumulated = set()
+
+    @staticmethod
+    def _roster(rng, size):
+        names = set()
+        while len(names) < size:
+            names.add(f"{rng.choice(SURNAMES)}, {rng.choice(FIRST_NAMES)}")
+        return sorted(names, key=lambda _: rng.random())
+
+    def teams(self):
+        # Mismo formato que scrap_urls_teams: (nombre, url de la plantilla)
+        return [
+            (team, f"https://www.euroleaguebasketball.net/es/ngt/teams/{re.sub(r'[^a-z0-9]+', '-', team.lower())}/roster/?season=SYN2024")
+            for team in self.team_names
+        ]
+
+    def game_name(self, i):
+        home, visitor = self.schedule[i]
+        return f"game {home} vs {visitor}"
+
+    def game_url(self, i):
+        home, visitor = self.schedule[i]
+        slug = re.sub(r"[^a-z0-9]+", "-", f"{home} {visitor}".lower()).strip("-")
+        return f"https://www.euroleaguebasketball.net/es/ngt/game-center/2024-2025-synthetic/{slug}/{self.tournament_id}/{i + 1}/"
+
+    def game(self, i):
+        # Jugada a jugada del partido i (siempre el mismo para la misma semilla)
+        home, visitor = self.schedule[i]
+        game = _Game(home, visitor, self.rosters[home], self.rosters[visitor], random.Random(f"{self.seed}-{i}"))
+        plays = game.play()
+        if i not in self._accumulated:
+            self._accumulated.add(i)
+            for side in (game.home, game.visitor):
+                self._accumulate(side)
+        return plays
+
+    def _accumulate(self, side):
+        team_line = self._team_totals[side.team_name]
+        team_line["GP"] += 1
+        starters = set(side.roster[:5])
+        for player, line in side.lines.items():
+            for field, value in line.items():
+                team_line[field] += value
+            if player is None:
+                continue
+            totals = self._totals[(side.team_name, player)]
+            totals["GP"] += 1
+            totals["GS"] += 1 if player in starters else 0
+            for field, value in line.items():
+                totals[field] += value
+
+    def games(self):
+        for i in range(self.n_games):
+            yield self.game_name(i), self.game_url(i), self.game(i)
+
+    def box_scores(self):
+        # Box scores acumulados (formato de scrap_box_scores); simula los partidos que falten
+        for i in range(self.n_games):
+            if i not in self._accumulated:
+                self.game(i)
+
+        def stats(dorsal, totals):
+            totals = defaultdict(int, totals)
+            totals["TotalRebounds"] = totals["OffensiveRebounds"] + totals["DefensiveRebounds"]
+            totals["Valuation"] = _valuation(totals)
+            return http_backend._stats_list(dorsal, totals)
+
+        players_all_stats = [
+            {"team_name": team, "player_name": _box_name(player), "stats": stats(self.dorsals[(team, player)], totals)}
+            for (team, player), totals in self._totals.items()
+        ]
+        team_all_stats = [
+            {"team_name": team, "player_name": "TOTALS", "stats": stats("", self._team_totals[team])}
+            for team in self.team_names
+            if team in self._team_totals
+        ]
+        return players_all_stats, team_all_stats
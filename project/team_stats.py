@@ -1,25 +1,33 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-from collections import defaultdict, Counter
+from collections import Counter
 from matplotlib.table import Table
 
+from game_index import select_games, teams_from_game_id
+import possessions
+import rendering
+import tracing
+
 
 def convert_min_to_float(min_str):
     minutes, seconds = map(int, min_str.split(":"))
     return minutes + seconds / 60
 
-def scout_team(team_name: str, offensive_csv_path: str, defensive_csv_path: str):
+@tracing.traced("team_stats")
+def load_league_table(offensive_csv_path: str, defensive_csv_path: str, possessions_csv_path: str = None, warehouse=None,
+                      tournament_id=None):
+    # Tabla de la liga con todas las métricas: no depende del equipo que se analiza
     base_dir = os.path.dirname(__file__)
-    off_path = os.path.join(base_dir, offensive_csv_path)
-    def_path = os.path.join(base_dir, defensive_csv_path)
-    plots_dir = os.path.join(base_dir, "files", "plots")
-    os.makedirs(plots_dir, exist_ok=True)
 
-    df_off = pd.read_csv(off_path)
-    df_def = pd.read_csv(def_path)
-    df = pd.merge(df_off, df_def, on="team_name", suffixes=("", "r"))
+    # Con warehouse, ofensivo y defensivo llegan ya unidos en una consulta; si está vacío, los CSV
+    df = warehouse.league_table(tournament_id) if warehouse is not None else None
+    if df is None or df.empty:
+        df_off = pd.read_csv(os.path.join(base_dir, offensive_csv_path))
+        df_def = pd.read_csv(os.path.join(base_dir, defensive_csv_path))
+        df = pd.merge(df_off, df_def, on="team_name", suffixes=("", "r"))
 
     df["Min_float"] = df["Min"].apply(convert_min_to_float)
 
@@ -35,31 +43,85 @@ def scout_team(team_name: str, offensive_csv_path: str, defensive_csv_path: str)
 
     df["OER"] = df["PTS"] / df["Poss"]
     df["DER"] = df["PTSr"] / df["Poss"]
+
+    # Con la tabla de posesiones del jugada a jugada se usan posesiones reales en vez de la estimación
+    poss_path = os.path.join(base_dir, possessions_csv_path) if possessions_csv_path else None
+    if poss_path and os.path.exists(poss_path):
+        df = apply_real_possessions(df, possessions.count_possessions(pd.read_csv(poss_path)))
+
     df["Net"] = df["OER"] - df["DER"]
+    return df
+
+
+@tracing.traced("team_stats")
+def scout_team(team_name: str, offensive_csv_path: str, defensive_csv_path: str, possessions_csv_path: str = None,
+               workers=1, profile=None, profiles=None, cache=None, warehouse=None, tournament_id=None, plots_dir=None):
+    df = load_league_table(offensive_csv_path, defensive_csv_path, possessions_csv_path, warehouse=warehouse,
+                           tournament_id=tournament_id)
+    return render_team_report(df, team_name, plots_dir=plots_dir, workers=workers, profile=profile, profiles=profiles,
+                              cache=cache)
+
 
+# Columnas de la tabla de la liga que lee cada gráfico: cada uno recibe solo su trozo, así la
+# caché de gráficos solo los vuelve a dibujar cuando cambian esas columnas
+TEAM_CHART_COLUMNS = {
+    "table": ["team_name", "Net", "OER", "DER"],
+    "scatter": ["team_name", "OER", "DER"],
+    "possessions": ["team_name", "Pace"],
+    "usage": ["team_name", "2PA", "3PA", "FTA"],
+    "def_usage": ["team_name", "2PAr", "3PAr", "FTAr"],
+    "four_factors_off": ["team_name", "eFG%", "FTA_rate", "ORB%", "TOV%"],
+    "four_factors_def": ["team_name", "2PMr", "3PMr", "2PAr", "3PAr", "FTAr", "ORr", "DR", "TOr", "Poss"],
+}
+
+
+def team_report_jobs(df, team_name, plots_dir):
+    # Gráficos independientes del informe de un equipo: (nombre, función, args) para rendering
     df_sorted = df.sort_values(by="Net", ascending=False).reset_index(drop=True)
-    table_path = render_table_as_image(df_sorted, team_name, plots_dir)
 
-    scatter_path = create_oer_der_plot(df_sorted, team_name, plots_dir)
-    bar_path = create_possessions_bar_chart(df, plots_dir, team_name)
-    usage_paths = create_offensive_usage_charts(df, team_name, plots_dir)
-    usage_paths["def_pie"] = create_defensive_usage_charts(df, team_name, plots_dir)
-    ff_off_path = create_offensive_four_factors_chart(df, team_name, plots_dir)
-    ff_def_path = create_defensive_four_factors_chart(df, team_name, plots_dir)
+    def columns(chart, source=df):
+        return source[TEAM_CHART_COLUMNS[chart]].copy()
+
+    return [
+        ("table", render_table_as_image, (columns("table", df_sorted), team_name, plots_dir)),
+        ("scatter", create_oer_der_plot, (columns("scatter", df_sorted), team_name, plots_dir)),
+        ("possessions", create_possessions_bar_chart, (columns("possessions"), plots_dir, team_name)),
+        ("usage", create_offensive_usage_charts, (columns("usage"), team_name, plots_dir)),
+        ("def_usage", create_defensive_usage_charts, (columns("def_usage"), team_name, plots_dir)),
+        ("four_factors_off", create_offensive_four_factors_chart, (columns("four_factors_off"), team_name, plots_dir)),
+        ("four_factors_def", create_defensive_four_factors_chart, (columns("four_factors_def"), team_name, plots_dir)),
+    ]
 
 
+def team_report_paths(results):
+    usage_paths = dict(results["usage"])
+    usage_paths["def_pie"] = results["def_usage"]
     return {
-        "table": table_path,
-        "scatter": scatter_path,
-        "possessions": bar_path,
+        "table": results["table"],
+        "scatter": results["scatter"],
+        "possessions": results["possessions"],
         "usage": usage_paths,
         "four_factors": {
-            "off": ff_off_path,
-            "def": ff_def_path,
+            "off": results["four_factors_off"],
+            "def": results["four_factors_def"],
         },
     }
 
-def render_table_as_image(df, team_name, out_dir):
+
+@tracing.traced("team_stats")
+def render_team_report(df, team_name, plots_dir=None, workers=1, profile=None, profiles=None, cache=None):
+    # Gráficos de un equipo sobre la tabla de la liga ya calculada (se trabaja sobre una copia:
+    # los gráficos añaden columnas y la tabla puede ser compartida entre varios equipos)
+    plots_dir = plots_dir or os.path.join(os.path.dirname(__file__), "files", "plots")
+    os.makedirs(plots_dir, exist_ok=True)
+    df = df.copy()
+
+    results, _ = rendering.render_jobs(
+        team_report_jobs(df, team_name, plots_dir), workers=workers, profile=profile, profiles=profiles, cache=cache
+    )
+    return team_report_paths(results)
+
+def render_table_as_image(df, team_name, out_dir, render=None):
     cols = ["team_name", "Net", "OER", "DER"]
     df_table = df[cols].copy()
 
@@ -69,7 +131,8 @@ def render_table_as_image(df, team_name, out_dir):
     green_cmap = plt.cm.Greens
     red_cmap = plt.cm.Reds_r  # Rojo más intenso = peor defensa
 
-    fig, ax = plt.subplots(figsize=(10, len(df_table) * 0.45 + 1))
+    fig = rendering.new_figure(figsize=(10, len(df_table) * 0.45 + 1))
+    ax = fig.subplots()
     ax.axis('off')
     table = Table(ax, bbox=[0, 0, 1, 1])
 
@@ -101,20 +164,20 @@ def render_table_as_image(df, team_name, out_dir):
                            fontproperties={'weight': 'bold', 'size': 10})
 
     ax.add_table(table)
-    path = os.path.join(out_dir, f"{team_name}_efficiency_table.png")
-    plt.savefig(path, bbox_inches='tight', dpi=150)
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_efficiency_table", render, bbox_inches='tight', dpi=150)
     return path
 
-def create_oer_der_plot(df, team_name, out_dir):
+def create_oer_der_plot(df, team_name, out_dir, render=None):
 
-    plt.figure(figsize=(10, 6))
+    fig = rendering.new_figure(figsize=(10, 6))
+    ax = fig.subplots()
 
     # Crear columna temporal para saber si es el equipo que queremos
     df["_highlight"] = df["team_name"] == team_name
 
     # Dibujar puntos
     sns.scatterplot(
+        ax=ax,
         data=df,
         x="OER",
         y="DER",
@@ -126,24 +189,41 @@ def create_oer_der_plot(df, team_name, out_dir):
 
     # Añadir etiquetas de texto
     for _, row in df.iterrows():
-        plt.text(row["OER"] + 0.01, row["DER"], row["team_name"], fontsize=8)
+        ax.text(row["OER"] + 0.01, row["DER"], row["team_name"], fontsize=8)
 
-    plt.xlabel("Offensive Efficiency (OER)")
-    plt.ylabel("Defensive Efficiency (DER)")
-    plt.title("OER vs DER (Team Comparison)")
-    plt.grid(True)
-    plt.tight_layout()
+    ax.set_xlabel("Offensive Efficiency (OER)")
+    ax.set_ylabel("Defensive Efficiency (DER)")
+    ax.set_title("OER vs DER (Team Comparison)")
+    ax.grid(True)
+    fig.tight_layout()
 
-    path = os.path.join(out_dir, f"{team_name}_oer_der_comparison_plot.png")
-    plt.savefig(path)
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_oer_der_comparison_plot", render)
 
     # Eliminar columna temporal
     df.drop(columns=["_highlight"], inplace=True)
 
     return path
 
-def create_possessions_bar_chart(df, out_dir, team_name=None):
+def apply_real_possessions(df, counts):
+    # Poss / Pace / OER / DER a partir de las posesiones contadas (equipos sin datos: estimación).
+    # PTS y TO salen del box score de todos los partidos (GP): solo se usan las posesiones reales
+    # si el jugada a jugada tiene todos esos partidos; si falta alguno se mantiene la estimación.
+    df = df.merge(counts.rename(columns={"Poss": "Poss_real"}), on="team_name", how="left")
+    counted = df["Poss_real"].notna() & (df["Poss_real"] > 0) & df["Possr"].notna() & (df["Possr"] > 0)
+    real = counted & (df["Games"] == df["GP"])
+    incomplete = df.loc[counted & ~real]
+    for _, row in incomplete.iterrows():
+        print(f"⚠️ {row['team_name']}: jugada a jugada de {int(row['Games'])} de {int(row['GP'])} partidos, se usa la estimación de posesiones")
+    df.loc[real, "Poss"] = df.loc[real, "Poss_real"]
+    df.loc[real, "Pace"] = df.loc[real, "Poss_real"] / df.loc[real, "Games"]
+    df.loc[real, "TOV%"] = df.loc[real, "TO"] / df.loc[real, "Poss_real"]
+    df.loc[real, "OER"] = df.loc[real, "PTS"] / df.loc[real, "Poss_real"]
+    df.loc[real, "DER"] = df.loc[real, "PTSr"] / df.loc[real, "Possr"]
+    print(f"🏀 Posesiones reales para {int(real.sum())} de {len(df)} equipos")
+    return df.drop(columns=["Poss_real", "Possr", "Games"])
+
+
+def create_possessions_bar_chart(df, out_dir, team_name=None, render=None):
 
     df_sorted = df.sort_values("Pace", ascending=False).reset_index(drop=True)
 
@@ -153,26 +233,25 @@ def create_possessions_bar_chart(df, out_dir, team_name=None):
         team_index = df_sorted[df_sorted["team_name"] == team_name].index[0]
         colors[team_index] = "#1f77b4"  # azul para el equipo objetivo
 
-    plt.figure(figsize=(12, 6))
-    bars = sns.barplot(x="team_name", y="Pace", data=df_sorted, palette=colors)
+    fig = rendering.new_figure(figsize=(12, 6))
+    ax = fig.subplots()
+    bars = sns.barplot(x="team_name", y="Pace", data=df_sorted, palette=colors, ax=ax)
 
     # Mostrar valor de posesiones encima de cada barra
     for i, row in df_sorted.iterrows():
         bars.text(i, row["Pace"] + 0.5, f"{row['Pace']:.1f}", ha="center", fontsize=9)
 
-    plt.ylim(70, df_sorted["Pace"].max() + 5)
-    plt.xticks(rotation=90)
-    plt.ylabel("Possessions per game")
-    plt.xlabel("Team")
-    plt.title("Possessions per Game")
-    plt.tight_layout()
+    ax.set_ylim(70, df_sorted["Pace"].max() + 5)
+    ax.tick_params(axis="x", labelrotation=90)
+    ax.set_ylabel("Possessions per game")
+    ax.set_xlabel("Team")
+    ax.set_title("Possessions per Game")
+    fig.tight_layout()
 
-    path = os.path.join(out_dir, f"{team_name}_posessions_per_game.png")
-    plt.savefig(path)
-    plt.close()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_posessions_per_game", render)
     return path
 
-def create_offensive_usage_charts(df, team_name, out_dir):
+def create_offensive_usage_charts(df, team_name, out_dir, render=None):
     # Cálculos
     df["Uso2P"] = df["2PA"] / (df["2PA"] + df["3PA"] + df["FTA"])
     df["Uso3P"] = df["3PA"] / (df["2PA"] + df["3PA"] + df["FTA"])
@@ -184,40 +263,38 @@ def create_offensive_usage_charts(df, team_name, out_dir):
     labels = ["Usg% 2-Points", "Usg% 3-Points", "Usg% Free Throws"]
 
     # Pie chart
-    plt.figure(figsize=(6, 6))
-    plt.pie(team_row, labels=labels, autopct="%1.1f%%", startangle=140)
-    plt.title(f"Offensive Shot Usage: {team_name}")
-    usage_pie_path = os.path.join(out_dir, f"{team_name}_offensive_usage.png")
-    plt.savefig(usage_pie_path)
-    plt.close()
+    fig = rendering.new_figure(figsize=(6, 6))
+    ax = fig.subplots()
+    ax.pie(team_row, labels=labels, autopct="%1.1f%%", startangle=140)
+    ax.set_title(f"Offensive Shot Usage: {team_name}")
+    usage_pie_path = rendering.save_figure(fig, out_dir, f"{team_name}_offensive_usage", render)
 
     # Bar chart
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(labels, diff_percent, color="skyblue")
-    plt.axhline(0, color="gray", linestyle="--")
-    plt.title(f"Offensive Usage Difference vs League Average: {team_name}")
-    plt.ylabel("Difference (%)")
+    fig = rendering.new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(labels, diff_percent, color="skyblue")
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(f"Offensive Usage Difference vs League Average: {team_name}")
+    ax.set_ylabel("Difference (%)")
 
     for bar in bars:
         yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
+        ax.text(bar.get_x() + bar.get_width()/2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
 
     # Leyenda comparativa fuera del gráfico
     lines = [
-        f"{label}: Team {team_row[i]*100:.1f}%, League {mean_uso[i]*100:.1f}%"
+        f"{label}: Team {team_row.iloc[i]*100:.1f}%, League {mean_uso.iloc[i]*100:.1f}%"
         for i, label in enumerate(labels)
     ]
     legend_text = "\n".join(lines)
-    plt.gcf().text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
+    fig.text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
 
-    plt.tight_layout()
-    usage_diff_path = os.path.join(out_dir, f"{team_name}_offensive_usage_diff.png")
-    plt.savefig(usage_diff_path, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    usage_diff_path = rendering.save_figure(fig, out_dir, f"{team_name}_offensive_usage_diff", render, bbox_inches='tight')
 
     return {"pie": usage_pie_path, "diff": usage_diff_path}
 
-def create_defensive_usage_charts(df, team_name, out_dir):
+def create_defensive_usage_charts(df, team_name, out_dir, render=None):
     # Cálculos defensivos (uso que los rivales hacen)
     df["Uso2Pr"] = df["2PAr"] / (df["2PAr"] + df["3PAr"] + df["FTAr"])
     df["Uso3Pr"] = df["3PAr"] / (df["2PAr"] + df["3PAr"] + df["FTAr"])
@@ -229,40 +306,38 @@ def create_defensive_usage_charts(df, team_name, out_dir):
     labels = ["Usg% 2-Points", "Usg% 3-Points", "Usg% Free Throws"]
 
     # Pie chart
-    plt.figure(figsize=(6, 6))
-    plt.pie(team_row, labels=labels, autopct="%1.1f%%", startangle=140)
-    plt.title(f"Defensive Shot Usage: {team_name}")
-    usage_pie_path = os.path.join(out_dir, f"{team_name}_defensive_usage.png")
-    plt.savefig(usage_pie_path)
-    plt.close()
+    fig = rendering.new_figure(figsize=(6, 6))
+    ax = fig.subplots()
+    ax.pie(team_row, labels=labels, autopct="%1.1f%%", startangle=140)
+    ax.set_title(f"Defensive Shot Usage: {team_name}")
+    usage_pie_path = rendering.save_figure(fig, out_dir, f"{team_name}_defensive_usage", render)
 
     # Bar chart (diferencia relativa)
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(labels, diff_percent, color="indianred")
-    plt.axhline(0, color="gray", linestyle="--")
-    plt.title(f"Defensive Usage Difference vs League Average: {team_name}")
-    plt.ylabel("Difference (%)")
+    fig = rendering.new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(labels, diff_percent, color="indianred")
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(f"Defensive Usage Difference vs League Average: {team_name}")
+    ax.set_ylabel("Difference (%)")
 
     for bar in bars:
         yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
+        ax.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
 
     # Leyenda comparativa
     lines = [
-        f"{label}: Team {team_row[i]*100:.1f}%, League {mean_uso[i]*100:.1f}%"
+        f"{label}: Team {team_row.iloc[i]*100:.1f}%, League {mean_uso.iloc[i]*100:.1f}%"
         for i, label in enumerate(labels)
     ]
     legend_text = "\n".join(lines)
-    plt.gcf().text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
+    fig.text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
 
-    plt.tight_layout()
-    usage_diff_path = os.path.join(out_dir, f"{team_name}_defensive_usage_diff.png")
-    plt.savefig(usage_diff_path, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    usage_diff_path = rendering.save_figure(fig, out_dir, f"{team_name}_defensive_usage_diff", render, bbox_inches='tight')
 
     return {"pie": usage_pie_path, "diff": usage_diff_path}
 
-def create_offensive_four_factors_chart(df, team_name, out_dir):
+def create_offensive_four_factors_chart(df, team_name, out_dir, render=None):
     ff_keys = ["eFG%", "FTA_rate", "ORB%", "TOV%"]
     team_ff = df[df["team_name"] == team_name][ff_keys].iloc[0]
     league_ff = df[ff_keys].mean()
@@ -271,32 +346,31 @@ def create_offensive_four_factors_chart(df, team_name, out_dir):
 
     labels = ["eFG%", "FTA Rate", "ORB%", "TOV%"]
 
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(labels, diff_percent, color="skyblue")
-    plt.axhline(0, color="gray", linestyle="--")
-    plt.title(f"Offensive Four Factors Difference vs League: {team_name}")
-    plt.ylabel("Difference (%)")
+    fig = rendering.new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(labels, diff_percent, color="skyblue")
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(f"Offensive Four Factors Difference vs League: {team_name}")
+    ax.set_ylabel("Difference (%)")
 
     for bar in bars:
         yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
+        ax.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
 
     # Leyenda comparativa debajo
     lines = [
-        f"{label}: Team {team_ff[i]*100:.1f}%, League {league_ff[i]*100:.1f}%"
+        f"{label}: Team {team_ff.iloc[i]*100:.1f}%, League {league_ff.iloc[i]*100:.1f}%"
         for i, label in enumerate(labels)
     ]
     legend_text = "\n".join(lines)
-    plt.gcf().text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
+    fig.text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
 
-    plt.tight_layout()
-    path = os.path.join(out_dir, f"{team_name}_four_factors_off.png")
-    plt.savefig(path, bbox_inches="tight")
-    plt.close()
+    fig.tight_layout()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_four_factors_off", render, bbox_inches="tight")
     return path
 
 
-def create_defensive_four_factors_chart(df, team_name, out_dir):
+def create_defensive_four_factors_chart(df, team_name, out_dir, render=None):
     # Añadir columnas defensivas si no existen
     df["eFG%r"] = (df["2PMr"] + df["3PMr"] + 0.5 * df["3PMr"]) / (df["2PAr"] + df["3PAr"])
     df["FTA_r_rate"] = df["FTAr"] / (df["2PAr"] + df["3PAr"])
@@ -310,115 +384,97 @@ def create_defensive_four_factors_chart(df, team_name, out_dir):
     league_ff_def = df[ff_keys_r].mean()
     diff_percent = ((team_ff_def - league_ff_def) / league_ff_def) * 100
 
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(labels, diff_percent, color="indianred")
-    plt.axhline(0, color="gray", linestyle="--")
-    plt.title(f"Defensive Four Factors Difference vs League: {team_name}")
-    plt.ylabel("Difference (%)")
+    fig = rendering.new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(labels, diff_percent, color="indianred")
+    ax.axhline(0, color="gray", linestyle="--")
+    ax.set_title(f"Defensive Four Factors Difference vs League: {team_name}")
+    ax.set_ylabel("Difference (%)")
 
     for bar in bars:
         yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
+        ax.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.5, f"{yval:.1f}%", ha='center', fontsize=10, fontweight='bold')
 
     # Leyenda comparativa debajo
     lines = [
-        f"{label}: Team {team_ff_def[i]*100:.1f}%, League {league_ff_def[i]*100:.1f}%"
+        f"{label}: Team {team_ff_def.iloc[i]*100:.1f}%, League {league_ff_def.iloc[i]*100:.1f}%"
         for i, label in enumerate(labels)
     ]
     legend_text = "\n".join(lines)
-    plt.gcf().text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
+    fig.text(0.02, -0.05, legend_text, fontsize=9, va='top', bbox=dict(facecolor='white', edgecolor='black'))
 
-    plt.tight_layout()
-    path = os.path.join(out_dir, f"{team_name}_four_factors_def.png")
-    plt.savefig(path, bbox_inches="tight")
-    plt.close()
+    fig.tight_layout()
+    path = rendering.save_figure(fig, out_dir, f"{team_name}_four_factors_def", render, bbox_inches="tight")
     return path
 
 
-def get_team_defensive_stats_from_play_by_plays(play_by_play_folder: str, team_list_csv: str):
-    base_dir = os.path.dirname(__file__)
-    play_by_play_path = os.path.join(base_dir, play_by_play_folder)
-    team_csv_path = os.path.join(base_dir, team_list_csv)
-
-    # Leemos el CSV ofensivo para mantener el orden y nombres
-    df_teams = pd.read_csv(team_csv_path)
-    team_names = df_teams["team_name"].tolist()
+DEFENSIVE_STAT_FIELDS = ['PTS','2PM','2PA','3PM','3PA','FTM','FTA','OR','DR','TR','AST','STL','TO','BLK','BLKA','FC','FD','PIR']
+
+
+# Lo que suma cada action_code del rival a las estadísticas defensivas del equipo.
+# TR y PIR no están: se calculan sobre los acumulados en build_team_defensive_stats
+DEFENSIVE_ACTION_DELTAS = pd.DataFrame.from_dict({
+    "2PM": {"2PM": 1, "PTS": 2, "2PA": 1},
+    "2PA": {"2PA": 1},
+    "3PM": {"3PM": 1, "PTS": 3, "3PA": 1},
+    "3PA": {"3PA": 1},
+    "FTM": {"FTM": 1, "PTS": 1, "FTA": 1},
+    "FTA": {"FTA": 1},
+    "OREB": {"OR": 1},
+    "DREB": {"DR": 1},
+    "TOV": {"TO": 1},
+    "AST": {"AST": 1},
+    "STL": {"STL": 1},
+    "BLK": {"BLK": 1},
+    "BLKRec": {"BLKA": 1},
+    "PF": {"FC": 1},
+    "PFRec": {"FD": 1},
+    "PFRecShot": {"FD": 1},
+}, orient="index").reindex(columns=[f for f in DEFENSIVE_STAT_FIELDS if f not in ("TR", "PIR")]).fillna(0).astype(int)
+
+
+@tracing.traced("team_stats")
+def count_defensive_stats(df, team_names):
+    # df: una fila por jugada con side, action_code y los dos equipos del partido (team_a, team_b).
+    # Cada jugada cuenta contra los equipos del partido que no la hacen; se cuentan pares
+    # (equipo, acción) con bincount y se pasan a estadísticas con la tabla de deltas.
+    team_index = {team: i for i, team in enumerate(team_names)}
+    n_actions = len(DEFENSIVE_ACTION_DELTAS)
+
+    action_idx = pd.Categorical(df["action_code"], categories=DEFENSIVE_ACTION_DELTAS.index).codes
+    known = action_idx >= 0
+    side = df["side"].to_numpy()
+
+    pair_counts = np.zeros(len(team_names) * n_actions, dtype=np.int64)
+    for column in ("team_a", "team_b"):
+        defender = df[column].map(team_index).to_numpy(dtype=float, na_value=np.nan)
+        mask = known & ~np.isnan(defender) & (side != df[column].to_numpy())
+        pair_counts += np.bincount(
+            defender[mask].astype(np.int64) * n_actions + action_idx[mask],
+            minlength=len(pair_counts),
+        )
 
-    # Este es el orden y columnas que queremos replicar con sufijo "r"
-    stat_fields = ['PTS','2PM','2PA','3PM','3PA','FTM','FTA','OR','DR','TR','AST','STL','TO','BLK','BLKA','FC','FD','PIR']
+    totals = pair_counts.reshape(len(team_names), n_actions) @ DEFENSIVE_ACTION_DELTAS.to_numpy()
+    return {
+        team: Counter({field: int(value) for field, value in zip(DEFENSIVE_ACTION_DELTAS.columns, row) if value})
+        for team, row in zip(team_names, totals)
+    }
 
-    team_stats = defaultdict(Counter)
 
-    for filename in os.listdir(play_by_play_path):
-        if not filename.endswith(".csv"):
-            continue
+def get_game_defensive_counts(df, teams_in_game, team_names=None):
+    # Acciones que hace el rival contra cada equipo en un partido
+    teams = [team for team in dict.fromkeys(teams_in_game) if team_names is None or team in team_names]
+    df = df[["side", "action_code"]].assign(team_a=teams_in_game[0], team_b=teams_in_game[1])
+    return count_defensive_stats(df, teams)
 
-        # Parsear nombre de equipos del archivo
-        try:
-            team1_raw = filename.split("game_")[1].split("_vs_")[0].replace("_", " ")
-            team2_raw = filename.split("_vs_")[1].replace(".csv", "").replace("_", " ")
-        except IndexError:
-            continue
-
-        teams_in_game = [team1_raw, team2_raw]
-        file_path = os.path.join(play_by_play_path, filename)
-        df = pd.read_csv(file_path)
-
-        for team in teams_in_game:
-            if team not in team_names:
-                continue
-
-            # Acciones que hace el rival contra este equipo
-            for _, row in df.iterrows():
-                if row["side"] == team:
-                    continue  # Solo acciones del rival (contra este equipo)
-
-                action = row["action_code"]
-                stats = team_stats[team]
-
-                if action == "2PM":
-                    stats["2PM"] += 1
-                    stats["PTS"] += 2
-                    stats["2PA"] += 1
-                elif action == "2PA":
-                    stats["2PA"] += 1
-                elif action == "3PM":
-                    stats["3PM"] += 1
-                    stats["PTS"] += 3
-                    stats["3PA"] += 1
-                elif action == "3PA":
-                    stats["3PA"] += 1
-                elif action == "FTM":
-                    stats["FTM"] += 1
-                    stats["PTS"] += 1
-                    stats["FTA"] += 1
-                elif action == "FTA":
-                    stats["FTA"] += 1
-                elif action == "OREB":
-                    stats["OR"] += 1
-                elif action == "DREB":
-                    stats["DR"] += 1
-                elif action == "TOV":
-                    stats["TO"] += 1
-                elif action == "AST":
-                    stats["AST"] += 1
-                elif action == "STL":
-                    stats["STL"] += 1
-                elif action == "BLK":
-                    stats["BLK"] += 1
-                elif action == "BLKRec":
-                    stats["BLKA"] += 1
-                elif action == "PF":
-                    stats["FC"] += 1
-                elif action in ("PFRec", "PFRecShot"):
-                    stats["FD"] += 1
-                # PIR lo puedes calcular si quieres luego desde el boxscore ofensivo del rival
-
-            # Al final del partido actual, puedes calcular el TR (total rebotes)
-            stats["TR"] = stats["OR"] + stats["DR"]
 
+def build_team_defensive_stats(team_stats, team_names):
+    # TR y PIR se calculan sobre los acumulados de toda la competición
+    rows = []
     for team in team_names:
-        stats = team_stats[team]
+        stats = Counter(team_stats.get(team, {}))
+        stats["TR"] = stats["OR"] + stats["DR"]
+
         FGM = stats["2PM"] + stats["3PM"]
         FGA = stats["2PA"] + stats["3PA"]
         missed_FG = FGA - FGM
@@ -441,14 +497,82 @@ def get_team_defensive_stats_from_play_by_plays(play_by_play_folder: str, team_l
         )
         stats["PIR"] = PIR
 
-    # Construimos el DataFrame
-    rows = []
-    for team in team_names:
-        stats = team_stats[team]
         row = {"team_name": team}
-        for field in stat_fields:
+        for field in DEFENSIVE_STAT_FIELDS:
             row[f"{field}r"] = stats[field] if field in stats else 0
         rows.append(row)
 
-    df_def = pd.DataFrame(rows)
-    return df_def
\ No newline at end of file
+    return pd.DataFrame(rows)
+
+
+def _game_teams(gid, index=None):
+    # Equipos del partido: del índice si está dado de alta; si no, del nombre del fichero
+    teams = index.teams(gid) if index is not None else None
+    return teams or teams_from_game_id(gid)
+
+
+def _load_defensive_events_from_store(store, game_ids, tournaments=None, index=None):
+    # Solo side, action_code y la partición del partido; los equipos se sacan una vez por partido
+    df = store.read(columns=["side", "action_code", "game"], tournaments=tournaments, games=game_ids)
+    if df is None or df.empty:
+        return None
+
+    games = df["game"].astype("category").cat
+    teams = [_game_teams(game, index) or [None, None] for game in games.categories]
+    df["team_a"] = np.array([t[0] for t in teams], dtype=object)[games.codes]
+    df["team_b"] = np.array([t[1] for t in teams], dtype=object)[games.codes]
+    return df.drop(columns="game")
+
+
+def _load_defensive_events_from_csv(play_by_play_path, game_ids, index=None):
+    # Todas las jugadas de todos los partidos en un solo DataFrame
+    games = []
+    for gid in game_ids:
+        teams_in_game = _game_teams(gid, index)
+        if teams_in_game is None:
+            print(f"⚠️ No se pueden deducir los equipos de {gid}, se omite")
+            continue
+
+        file_path = os.path.join(play_by_play_path, gid + ".csv")
+        if not os.path.exists(file_path):
+            print(f"⚠️ {gid} está en el índice pero falta su CSV, se omite")
+            continue
+        games.append((teams_in_game, pd.read_csv(file_path, usecols=["side", "action_code"])))
+
+    if not games:
+        return None
+    df = pd.concat([df for _, df in games], ignore_index=True)
+    rows_per_game = [len(df) for _, df in games]
+    df["team_a"] = np.repeat([teams[0] for teams, _ in games], rows_per_game)
+    df["team_b"] = np.repeat([teams[1] for teams, _ in games], rows_per_game)
+    return df
+
+
+@tracing.traced("team_stats")
+def get_team_defensive_stats_from_play_by_plays(play_by_play_folder: str, team_list_csv: str, store=None, tournaments=None, index=None):
+    base_dir = os.path.dirname(__file__)
+    play_by_play_path = os.path.join(base_dir, play_by_play_folder)
+    team_csv_path = os.path.join(base_dir, team_list_csv)
+
+    # Leemos el CSV ofensivo para mantener el orden y nombres
+    df_teams = pd.read_csv(team_csv_path)
+    team_names = df_teams["team_name"].tolist()
+
+    # Con índice se abren directamente los partidos seleccionados; sin él se lista la carpeta.
+    # Los que ya están en el event store se leen de ahí (solo las columnas necesarias) y el
+    # resto de sus CSV, así un store a medias no deja partidos fuera
+    game_ids = select_games(play_by_play_path, index, tournaments)
+    frames = []
+    if store is not None:
+        covered, game_ids = store.split_coverage(game_ids, tournaments)
+        if covered:
+            frames.append(_load_defensive_events_from_store(store, covered, tournaments, index))
+    if game_ids:
+        frames.append(_load_defensive_events_from_csv(play_by_play_path, game_ids, index))
+    frames = [frame for frame in frames if frame is not None]
+    df = pd.concat(frames, ignore_index=True) if frames else None
+
+    team_stats = count_defensive_stats(df, team_names) if df is not None else {}
+
+    df_def = build_team_defensive_stats(team_stats, team_names)
+    return df_def
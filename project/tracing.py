@@ -0,0 +1,216 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Instrumentación del pipeline: cuánto tarda cada etapa de una ejecución de main().
+#
+#   with tracing.stage("export.csv_write", "export"):     # bloque cronometrado
+#   @tracing.traced("scrap")                               # función cronometrada (scrap.<nombre>)
+#   tracing.record("render.table", "render", seconds)      # duración medida en otro sitio
+#   tracing.count("browser.pages")                         # contador
+#
+# Cada etapa queda como evento de Chrome trace (abrir en chrome://tracing o ui.perfetto.dev) y
+# se acumula en un resumen por nombre: llamadas, total, media, máximo y % de la ejecución.
+# Las etapas anidadas se cuentan en las dos (el total de "main" incluye a las demás).
+#
+# Opcionales: cProfile del hilo principal (profile=True → .prof junto al trace y top de
+# funciones) y tracemalloc (memory=True → memoria reservada por cada etapa y pico).
+
+TRACES_DIR = os.path.join(os.path.dirname(__file__), "files", "traces")
+
+
+class Tracer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, profile=False, memory=False):
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.started_at = time.time()
+            self.events = []
+            self.stats = defaultdict(lambda: {"calls": 0, "total": 0.0, "max": 0.0, "memory": 0})
+            self.counters = defaultdict(int)
+            self.threads = {}
+            self.memory = memory
+            self.profiler = cProfile.Profile() if profile else None
+
+    def add(self, name, category, start, seconds, args=None):
+        thread = threading.current_thread()
+        with self._lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round(seconds * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args or {},
+            })
+            stats = self.stats[name]
+            stats["calls"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["memory"] += (args or {}).get("memory", 0)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+
+TRACER = Tracer()
+
+
+@contextmanager
+def stage(name, category="main", **args):
+    memory = tracemalloc.get_traced_memory()[0] if TRACER.memory and tracemalloc.is_tracing() else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if memory is not None:
+            args["memory"] = tracemalloc.get_traced_memory()[0] - memory
+        TRACER.add(name, category, start, seconds, args)
+
+
+def traced(category, name=None):
+    # Decorador: cronometra cada llamada como etapa "<categoría>.<función>"
+    def decorator(func):
+        stage_name = name or f"{category}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, category, seconds, **args):
+    # Etapa ya medida (p. ej. en otro proceso o dentro de waits): termina ahora y dura `seconds`
+    TRACER.add(name, category, time.perf_counter() - seconds, seconds, args)
+
+
+def count(name, value=1):
+    TRACER.count(name, value)
+
+
+def start_run(profile=False, memory=False):
+    TRACER.reset(profile=profile, memory=memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if TRACER.profiler is not None:
+        TRACER.profiler.enable()
+
+
+def finish_run(trace_path=None, top=20):
+    # Cierra la ejecución: guarda el trace (y el .prof), imprime el resumen y devuelve la ruta
+    elapsed = time.perf_counter() - TRACER.origin
+    peak = None
+    if TRACER.memory and tracemalloc.is_tracing():
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if trace_path is None:
+        os.makedirs(TRACES_DIR, exist_ok=True)
+        trace_path = os.path.join(TRACES_DIR, time.strftime("run-%Y%m%d-%H%M%S.json", time.localtime(TRACER.started_at)))
+    else:
+        os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+
+    profile_path = None
+    if TRACER.profiler is not None:
+        TRACER.profiler.disable()
+        profile_path = os.path.splitext(trace_path)[0] + ".prof"
+        TRACER.profiler.dump_stats(profile_path)
+
+    write_trace(trace_path, elapsed, peak)
+    print_summary(elapsed, peak)
+    if profile_path:
+        print_profile(profile_path, top)
+        print(f"🔬 Perfil cProfile guardado: {profile_path}")
+    print(f"🧭 Trace guardado: {trace_path}")
+    return trace_path
+
+
+def summary(elapsed=None):
+    elapsed = elapsed or (time.perf_counter() - TRACER.origin)
+    with TRACER._lock:
+        stats = {name: dict(values) for name, values in TRACER.stats.items()}
+    return {
+        name: {
+            **values,
+            "mean": values["total"] / values["calls"],
+            "share": values["total"] / elapsed if elapsed else 0.0,
+        }
+        for name, values in sorted(stats.items(), key=lambda kv: -kv[1]["total"])
+    }
+
+
+def write_trace(path, elapsed, peak=None):
+    # Formato JSON de Chrome trace; resumen y contadores van en otherData
+    with TRACER._lock:
+        events = list(TRACER.events)
+        threads = dict(TRACER.threads)
+        counters = dict(TRACER.counters)
+    pid = os.getpid()
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in threads.items()
+    ]
+    if counters:
+        metadata.append({"name": "counters", "ph": "C", "ts": round(elapsed * 1e6, 1), "pid": pid, "tid": 0, "args": counters})
+
+    trace = {
+        "traceEvents": metadata + events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "started_at": TRACER.started_at,
+            "elapsed": elapsed,
+            "peak_memory": peak,
+            "counters": counters,
+            "summary": summary(elapsed),
+        },
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def print_summary(elapsed=None, peak=None, limit=30):
+    elapsed = elapsed or (time.perf_counter() - TRACER.origin)
+    rows = summary(elapsed)
+    print(f"\n🧭 Etapas de la ejecución ({elapsed:.2f}s en total)")
+    print(f"   {'etapa':<44} {'llamadas':>8} {'total':>9} {'media':>9} {'máx':>9} {'%':>6}" + (f" {'memoria':>10}" if TRACER.memory else ""))
+    for name, values in list(rows.items())[:limit]:
+        line = (
+            f"   {name[:44]:<44} {values['calls']:>8} {values['total']:>8.2f}s {values['mean'] * 1000:>7.1f}ms "
+            f"{values['max']:>8.2f}s {values['share'] * 100:>5.1f}%"
+        )
+        if TRACER.memory:
+            line += f" {values['memory'] / 1e6:>8.1f}MB"
+        print(line)
+    if len(rows) > limit:
+        print(f"   … {len(rows) - limit} etapas más en el trace")
+    if TRACER.counters:
+        print("   " + ", ".join(f"{name}: {value}" for name, value in sorted(TRACER.counters.items())))
+    if peak is not None:
+        print(f"   pico de memoria (tracemalloc): {peak / 1e6:.1f}MB")
+
+
+def print_profile(profile_path, top=20):
+    out = io.StringIO()
+    pstats.Stats(profile_path, stream=out).sort_stats("cumulative").print_stats(top)
+    print(out.getvalue())
@@ -0,0 +1,183 @@
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from collections import defaultdict
+import threading
+import time
+
+import tracing
+
+# Esperas por condición para sustituir los time.sleep fijos del scraper.
+# Cada tipo de espera ajusta su timeout según lo que han tardado las anteriores
+# y deja registrado cuánto ha esperado realmente.
+
+WAIT_STATS = defaultdict(list)
+_stats_lock = threading.Lock()
+
+
+class AdaptiveTimeout:
+
+    def __init__(self, initial=10.0, minimum=1.0, maximum=20.0, factor=3.0, history=20):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.history = history
+        self._recent = []
+        self._lock = threading.Lock()
+
+    def timeout(self):
+        with self._lock:
+            if not self._recent:
+                return self.initial
+            return min(self.maximum, max(self.minimum, self.factor * max(self._recent)))
+
+    def record(self, waited, timed_out):
+        # Las esperas agotadas no dicen cuánto tarda de verdad la condición (puede que nunca se
+        # cumpla): no entran en la estimación, que solo usa las que terminaron a tiempo
+        if timed_out:
+            return
+        with self._lock:
+            self._recent.append(waited)
+            del self._recent[:-self.history]
+
+
+TIMEOUTS = {
+    "stable_count": AdaptiveTimeout(initial=10.0, maximum=15.0),
+    "active_period": AdaptiveTimeout(initial=5.0, maximum=10.0),
+    "dom_settled": AdaptiveTimeout(initial=5.0, maximum=10.0),
+}
+
+
+def _record(kind, waited, timed_out, estimate=True):
+    # estimate=False: la espera no midió la condición (p. ej. se abandonó) y no ajusta el timeout
+    if estimate:
+        TIMEOUTS[kind].record(waited, timed_out)
+    tracing.record(f"wait.{kind}", "wait", waited, timed_out=timed_out)
+    if timed_out:
+        tracing.count(f"wait.{kind}.timeouts")
+    with _stats_lock:
+        WAIT_STATS[kind].append(waited)
+    if timed_out:
+        print(f"⌛ Espera '{kind}' agotada tras {waited:.2f}s")
+    return waited
+
+
+def wait_for_stable_count(driver, css_selector, min_count=1, quiet=0.3, poll=0.1, timeout=None):
+    # Espera a que el número de elementos deje de cambiar durante `quiet` segundos
+    timeout = timeout or TIMEOUTS["stable_count"].timeout()
+    start = time.perf_counter()
+    last_count, last_change = -1, start
+
+    while True:
+        now = time.perf_counter()
+        count = len(driver.find_elements(By.CSS_SELECTOR, css_selector))
+        if count != last_count:
+            last_count, last_change = count, now
+        elif count >= min_count and now - last_change >= quiet:
+            return _record("stable_count", now - start, False)
+        if now - start >= timeout:
+            return _record("stable_count", now - start, True)
+        time.sleep(poll)
+
+
+def _active_button_text(driver, buttons_selector):
+    return driver.execute_script(
+        """
+        const buttons = document.querySelectorAll(arguments[0]);
+        for (const b of buttons) {
+            if ((b.className || '').toLowerCase().includes('active')
+                || b.getAttribute('aria-selected') === 'true'
+                || b.getAttribute('aria-pressed') === 'true') {
+                return b.textContent.trim();
+            }
+        }
+        return null;
+        """,
+        buttons_selector,
+    )
+
+
+# Si la web no marca ningún botón como activo (clase "active", aria-selected/aria-pressed) esta
+# espera no sirve: tras `unmarked_grace` sin botón marcado se deja de usar en todo el proceso y
+# el cambio de cuarto queda a cargo de wait_for_dom_settled, que se llama justo después.
+_PERIOD_MARKER = {"unmarked": False}
+
+
+def wait_for_active_period(driver, buttons_selector, period, poll=0.05, timeout=None, unmarked_grace=0.5):
+    # Espera a que el botón activo del selector de cuartos sea el que acabamos de pulsar
+    if _PERIOD_MARKER["unmarked"]:
+        return 0.0
+    timeout = timeout or TIMEOUTS["active_period"].timeout()
+    start = time.perf_counter()
+    marked_seen = False
+
+    while True:
+        now = time.perf_counter()
+        try:
+            active = _active_button_text(driver, buttons_selector)
+        except WebDriverException:
+            active = None
+        if active == period:
+            return _record("active_period", now - start, False)
+        marked_seen = marked_seen or active is not None
+        if not marked_seen and now - start >= unmarked_grace:
+            _PERIOD_MARKER["unmarked"] = True
+            print("ℹ️ La web no marca el cuarto activo: se espera solo a que la lista se estabilice")
+            return _record("active_period", now - start, False, estimate=False)
+        if now - start >= timeout:
+            return _record("active_period", now - start, True)
+        time.sleep(poll)
+
+
+_DOM_SETTLED_SCRIPT = """
+const [selector, quietMs, timeoutMs, done] = arguments;
+const target = document.querySelector(selector);
+if (!target) { done(-1); return; }
+const start = performance.now();
+let quietTimer = null;
+let hardTimer = null;
+const observer = new MutationObserver(() => {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(finish, quietMs);
+});
+function finish() {
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(hardTimer);
+    done(performance.now() - start);
+}
+observer.observe(target, {childList: true, subtree: true, characterData: true, attributes: true});
+quietTimer = setTimeout(finish, quietMs);
+hardTimer = setTimeout(finish, timeoutMs);
+"""
+
+
+def wait_for_dom_settled(driver, css_selector, quiet=0.25, timeout=None):
+    # Espera en el navegador (MutationObserver) a que la lista deje de mutar durante `quiet` segundos
+    timeout = timeout or TIMEOUTS["dom_settled"].timeout()
+    start = time.perf_counter()
+    driver.set_script_timeout(timeout + 5)
+
+    try:
+        elapsed_ms = driver.execute_async_script(_DOM_SETTLED_SCRIPT, css_selector, int(quiet * 1000), int(timeout * 1000))
+    except WebDriverException as e:
+        print(f"⚠️ No se pudo observar {css_selector}: {e}")
+        return _record("dom_settled", time.perf_counter() - start, True)
+
+    waited = time.perf_counter() - start
+    if elapsed_ms is None or elapsed_ms < 0:
+        # El contenedor aún no existe: esperamos a que aparezca y se estabilice
+        return _record("dom_settled", waited, False) + wait_for_stable_count(driver, css_selector)
+    return _record("dom_settled", waited, elapsed_ms >= timeout * 1000)
+
+
+def wait_report():
+    with _stats_lock:
+        stats = {kind: list(values) for kind, values in WAIT_STATS.items()}
+    for kind, values in stats.items():
+        print(
+            f"⏳ {kind}: {len(values)} esperas, total {sum(values):.1f}s, "
+            f"media {sum(values) / len(values):.2f}s, máx {max(values):.2f}s, "
+            f"timeout actual {TIMEOUTS[kind].timeout():.1f}s"
+        )
+    return stats
@@ -0,0 +1,299 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+# Almacén SQL embebido (SQLite, files/warehouse.sqlite) que alimentan las funciones de export:
+#
+#   teams                      un equipo por torneo
+#   players                    un jugador por equipo
+#   team_box_scores            box score acumulado de cada equipo
+#   team_defensive_box_scores  box score del rival (columnas con sufijo r)
+#   player_box_scores          box score acumulado de cada jugador
+#   games                      un partido: torneo, local, visitante, marcador, filas
+#   events                     jugada a jugada limpio (una fila por jugada)
+#
+# Todas las escrituras son upserts: volver a exportar un equipo, jugador o partido sustituye
+# sus filas sin duplicarlas. Las lecturas son consultas fijas (sqlite3 guarda compiladas las
+# sentencias de cada conexión) con índices para lo que piden los informes: la tabla de la liga
+# de un torneo, los jugadores de un equipo y los partidos o jugadas de un equipo/jugador.
+
+WAREHOUSE_PATH = os.path.join(os.path.dirname(__file__), "files", "warehouse.sqlite")
+UNKNOWN_TOURNAMENT = "unknown"
+
+TEAM_BOX_SCORE_COLUMNS = [
+    "GP", "Min", "PTS", "2PM", "2PA", "3PM", "3PA", "FTM", "FTA",
+    "OR", "DR", "TR", "AST", "STL", "TO", "BLK", "BLKA", "FC", "FD", "PIR",
+]
+PLAYER_BOX_SCORE_COLUMNS = ["GP", "GS"] + TEAM_BOX_SCORE_COLUMNS[1:]
+DEFENSIVE_BOX_SCORE_COLUMNS = [f"{field}r" for field in TEAM_BOX_SCORE_COLUMNS[2:]]
+EVENT_COLUMNS = [
+    "period", "time", "player", "action_code", "side", "score_home", "score_away",
+] + [f"homeplayer{i}" for i in range(1, 6)] + [f"awayplayer{i}" for i in range(1, 6)]
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _stat_columns(columns):
+    return ",\n    ".join(f"{_quote(c)} {'TEXT' if c == 'Min' else 'INTEGER'}" for c in columns)
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS teams (
+    team_id INTEGER PRIMARY KEY,
+    tournament TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (tournament, name)
+);
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER PRIMARY KEY,
+    team_id INTEGER NOT NULL REFERENCES teams (team_id),
+    name TEXT NOT NULL,
+    UNIQUE (team_id, name)
+);
+CREATE TABLE IF NOT EXISTS team_box_scores (
+    team_id INTEGER PRIMARY KEY REFERENCES teams (team_id),
+    {_stat_columns(TEAM_BOX_SCORE_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS team_defensive_box_scores (
+    team_id INTEGER PRIMARY KEY REFERENCES teams (team_id),
+    {_stat_columns(DEFENSIVE_BOX_SCORE_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS player_box_scores (
+    player_id INTEGER PRIMARY KEY REFERENCES players (player_id),
+    {_stat_columns(PLAYER_BOX_SCORE_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    tournament TEXT NOT NULL,
+    home_team_id INTEGER REFERENCES teams (team_id),
+    visitor_team_id INTEGER REFERENCES teams (team_id),
+    score_home INTEGER,
+    score_away INTEGER,
+    rows INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    game_id TEXT NOT NULL REFERENCES games (game_id),
+    seq INTEGER NOT NULL,
+    period TEXT,
+    time TEXT,
+    player TEXT,
+    action_code TEXT,
+    side TEXT,
+    score_home INTEGER,
+    score_away INTEGER,
+    {", ".join(f"{c} TEXT" for c in EVENT_COLUMNS[7:])},
+    PRIMARY KEY (game_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS players_team ON players (team_id);
+CREATE INDEX IF NOT EXISTS games_tournament ON games (tournament);
+CREATE INDEX IF NOT EXISTS games_home ON games (home_team_id);
+CREATE INDEX IF NOT EXISTS games_visitor ON games (visitor_team_id);
+CREATE INDEX IF NOT EXISTS events_player ON events (player);
+"""
+
+
+def _select(alias, columns):
+    return ", ".join(f"{alias}.{_quote(c)}" for c in columns)
+
+
+# Tabla de la liga: lo mismo que pd.merge(ofensivo, defensivo, on="team_name") sobre los CSV
+LEAGUE_TABLE_SQL = f"""
+SELECT t.name AS team_name, {_select("o", TEAM_BOX_SCORE_COLUMNS)}, {_select("d", DEFENSIVE_BOX_SCORE_COLUMNS)}
+FROM teams t
+JOIN team_box_scores o ON o.team_id = t.team_id
+JOIN team_defensive_box_scores d ON d.team_id = t.team_id
+WHERE t.tournament = ?
+ORDER BY t.team_id
+"""
+
+# Jugadores (mismas columnas que players_total_box_score.csv): de la liga o de un equipo
+_PLAYERS_SQL = f"""
+SELECT t.name AS team_name, p.name AS Player, {_select("b", PLAYER_BOX_SCORE_COLUMNS)}
+FROM teams t
+JOIN players p ON p.team_id = t.team_id
+JOIN player_box_scores b ON b.player_id = p.player_id
+WHERE t.tournament = ?{{team}}
+ORDER BY p.player_id
+"""
+LEAGUE_PLAYERS_SQL = _PLAYERS_SQL.format(team="")
+TEAM_PLAYERS_SQL = _PLAYERS_SQL.format(team=" AND t.name = ?")
+
+TEAM_GAMES_SQL = """
+SELECT g.game_id, g.tournament, h.name AS home, v.name AS visitor, g.score_home, g.score_away, g.rows
+FROM teams t
+JOIN games g ON g.home_team_id = t.team_id OR g.visitor_team_id = t.team_id
+JOIN teams h ON h.team_id = g.home_team_id
+JOIN teams v ON v.team_id = g.visitor_team_id
+WHERE t.tournament = ? AND t.name = ?
+ORDER BY g.game_id
+"""
+
+GAME_EVENTS_SQL = f"""
+SELECT {", ".join(EVENT_COLUMNS)} FROM events WHERE game_id = ? ORDER BY seq
+"""
+
+PLAYER_EVENTS_SQL = f"""
+SELECT e.game_id, {_select("e", EVENT_COLUMNS)}
+FROM events e
+JOIN games g ON g.game_id = e.game_id
+WHERE e.player = ? AND g.tournament = ?
+ORDER BY e.game_id, e.seq
+"""
+
+
+def _upsert_sql(table, key, columns):
+    names = [key] + columns
+    return (
+        f"INSERT INTO {table} ({', '.join(map(_quote, names))}) VALUES ({', '.join('?' * len(names))}) "
+        f"ON CONFLICT ({key}) DO UPDATE SET {', '.join(f'{_quote(c)} = excluded.{_quote(c)}' for c in columns)}"
+    )
+
+
+def _value(value):
+    # numpy → tipos de Python (sqlite3 no acepta np.int64); NaN → NULL
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class Warehouse:
+
+    def __init__(self, path=WAREHOUSE_PATH, default_tournament=None):
+        # default_tournament: torneo de lo que se exporta sin tournament_id (modo de un solo torneo)
+        self.path = path
+        self.default_tournament = default_tournament
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def tournament(self, tournament_id=None):
+        return tournament_id or self.default_tournament or UNKNOWN_TOURNAMENT
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ESCRITURA
+
+    def _team_id(self, tournament, name):
+        self._conn.execute("INSERT OR IGNORE INTO teams (tournament, name) VALUES (?, ?)", (tournament, name))
+        return self._conn.execute(
+            "SELECT team_id FROM teams WHERE tournament = ? AND name = ?", (tournament, name)
+        ).fetchone()[0]
+
+    def _player_id(self, team_id, name):
+        self._conn.execute("INSERT OR IGNORE INTO players (team_id, name) VALUES (?, ?)", (team_id, name))
+        return self._conn.execute(
+            "SELECT player_id FROM players WHERE team_id = ? AND name = ?", (team_id, name)
+        ).fetchone()[0]
+
+    def _upsert_teams(self, table, columns, df, tournament_id):
+        tournament = self.tournament(tournament_id)
+        sql = _upsert_sql(table, "team_id", columns)
+        with self._lock, self._conn:
+            rows = [
+                [self._team_id(tournament, row[0])] + [_value(v) for v in row[1:]]
+                for row in df[["team_name"] + columns].itertuples(index=False)
+            ]
+            self._conn.executemany(sql, rows)
+        return len(rows)
+
+    def upsert_team_box_scores(self, df, tournament_id=None):
+        return self._upsert_teams("team_box_scores", TEAM_BOX_SCORE_COLUMNS, df, tournament_id)
+
+    def upsert_defensive_box_scores(self, df, tournament_id=None):
+        return self._upsert_teams("team_defensive_box_scores", DEFENSIVE_BOX_SCORE_COLUMNS, df, tournament_id)
+
+    def upsert_player_box_scores(self, df, tournament_id=None):
+        tournament = self.tournament(tournament_id)
+        sql = _upsert_sql("player_box_scores", "player_id", PLAYER_BOX_SCORE_COLUMNS)
+        with self._lock, self._conn:
+            rows = [
+                [self._player_id(self._team_id(tournament, row[0]), row[1])] + [_value(v) for v in row[2:]]
+                for row in df[["team_name", "Player"] + PLAYER_BOX_SCORE_COLUMNS].itertuples(index=False)
+            ]
+            self._conn.executemany(sql, rows)
+        return len(rows)
+
+    def upsert_game(self, gid, tournament_id=None, home=None, visitor=None, score_home=None, score_away=None, rows=0):
+        tournament = self.tournament(tournament_id)
+        with self._lock, self._conn:
+            home_id = self._team_id(tournament, home) if home else None
+            visitor_id = self._team_id(tournament, visitor) if visitor else None
+            self._conn.execute(
+                "INSERT INTO games (game_id, tournament, home_team_id, visitor_team_id, score_home, score_away, rows, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (game_id) DO UPDATE SET tournament = excluded.tournament, "
+                "home_team_id = COALESCE(excluded.home_team_id, home_team_id), "
+                "visitor_team_id = COALESCE(excluded.visitor_team_id, visitor_team_id), "
+                "score_home = excluded.score_home, score_away = excluded.score_away, "
+                "rows = excluded.rows, updated_at = excluded.updated_at",
+                (gid, tournament, home_id, visitor_id, _value(score_home), _value(score_away), rows, time.time()),
+            )
+
+    def clear_events(self, gid):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE game_id = ?", (gid,))
+
+    def append_events(self, gid, rows, first_seq=0):
+        # rows: filas limpias (dicts con EVENT_COLUMNS, como las del CSV)
+        sql = f"INSERT OR REPLACE INTO events (game_id, seq, {', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * (len(EVENT_COLUMNS) + 2))})"
+        with self._lock, self._conn:
+            self._conn.executemany(
+                sql,
+                (
+                    [gid, first_seq + i] + [_value(row.get(c)) if row.get(c) != "" else None for c in EVENT_COLUMNS]
+                    for i, row in enumerate(rows)
+                ),
+            )
+
+    # LECTURA
+
+    def _query(self, sql, params):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def league_table(self, tournament_id=None):
+        return self._query(LEAGUE_TABLE_SQL, (self.tournament(tournament_id),))
+
+    def league_players(self, tournament_id=None):
+        return self._query(LEAGUE_PLAYERS_SQL, (self.tournament(tournament_id),))
+
+    def team_players(self, team_name, tournament_id=None):
+        return self._query(TEAM_PLAYERS_SQL, (self.tournament(tournament_id), team_name))
+
+    def team_games(self, team_name, tournament_id=None):
+        return self._query(TEAM_GAMES_SQL, (self.tournament(tournament_id), team_name))
+
+    def game_events(self, gid):
+        return self._query(GAME_EVENTS_SQL, (gid,))
+
+    def player_events(self, player, tournament_id=None):
+        return self._query(PLAYER_EVENTS_SQL, (player, self.tournament(tournament_id)))
+
+    def report(self):
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("teams", "players", "games", "events")
+            }
+        print(
+            f"🗄️ Warehouse: {counts['teams']} equipos, {counts['players']} jugadores, "
+            f"{counts['games']} partidos, {counts['events']} jugadas"
+        )